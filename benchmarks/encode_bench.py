@@ -0,0 +1,71 @@
+"""
+Cost of building the request URL, with and without pre-encoded options.
+
+Validation of the parameters and their encoding into the URL are timed
+separately. Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/encode_bench.py
+"""
+import timeit
+
+from requests import Request, Session
+
+from screenshotapi import CaptureOptions, Client, ConnectionPool, ImageFormat
+
+API_KEY = 'at_' + 'a' * 29
+BASE_URL = 'https://website-screenshot.whoisxmlapi.com/api/v1'
+URL = 'https://example.com/path?query=value&other=1'
+PARAMS = {
+    'type': ImageFormat.PNG,
+    'width': 1280,
+    'height': 800,
+    'thumb_width': 320,
+    'full_page': True,
+    'delay': 250,
+    'cookies': {'session': 'abc', 'lang': 'en'},
+    'ua': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+          '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+}
+
+
+def main(number: int = 20000):
+    client = Client(API_KEY)
+    session = Session()
+    pool = ConnectionPool()
+    options = CaptureOptions(**PARAMS)
+    plain = dict(url=URL, **PARAMS)
+    reused = {'url': URL, 'options': options}
+    plain_payload = client._prepare_payload(dict(plain))
+    encoded_payload = client._prepare_payload(dict(reused))
+
+    def encode_plain():
+        return session.prepare_request(
+            Request('GET', BASE_URL, params=plain_payload)).url
+
+    def encode_pre_encoded():
+        return pool.prepare_encoded(
+            'GET', BASE_URL + '?' + encoded_payload.query).url
+
+    cases = [
+        ('validate kwargs',
+         lambda: client._prepare_payload(dict(plain))),
+        ('validate options',
+         lambda: client._prepare_payload(dict(reused))),
+        ('encode per call',
+         encode_plain),
+        ('encode pre-encoded query',
+         encode_pre_encoded),
+    ]
+
+    # Unknown keys are dropped silently: make sure every one is sent
+    assert 'ua' in plain_payload
+    assert encode_plain() == encode_pre_encoded()
+
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        print('{:<30} {:8.2f} us/call'.format(name, best / number * 1e6))
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Offline benchmarks of the capture paths against a local stub API.
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/run.py --captures 500 --latency 0.02 \\
+        --output results.json
+
+Scenarios:
+    sync     sequential `get_raw`, a new connection per call
+    pooled   sequential `get_raw` over keep-alive connections
+    batched  `get_many` on a thread pool
+    async    `AsyncClient.get_raw` with `asyncio.gather`
+    http2    `get_many` over `Http2Transport`, against an HTTP/2 stub
+
+Every scenario runs in its own process, so peak RSS and CPU time are
+those of the client alone; the stub server runs in another process.
+Latencies are measured from sending a request to receiving its body;
+`sockets` is the number of connections opened by the client.
+Pass `--compare` with a previous JSON output to print the changes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import stub_server
+
+from screenshotapi import Client, Hooks, Metrics, ScreenshotApiError
+from screenshotapi.version import VERSION
+
+API_KEY = 'at_' + 'a' * 29
+SCENARIOS = ('sync', 'pooled', 'batched', 'async', 'http2')
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Latencies:
+    """Request latencies collected by lifecycle hooks"""
+
+    def __init__(self):
+        self.values = []
+        self.errors = 0
+
+    def complete(self, event):
+        self.values.append(event.elapsed)
+
+    def error(self, event):
+        self.errors += 1
+
+    def hooks(self) -> Hooks:
+        return Hooks(on_complete=self.complete, on_error=self.error)
+
+
+def capture_params(args) -> dict:
+    params = {}
+    if args.base64:
+        params['image_output_format'] = Client.BASE64_FORMAT
+    if args.xml:
+        params['output_format'] = Client.XML_FORMAT
+    return params
+
+
+def run_sequential(url: str, args, latencies: Latencies, metrics: Metrics,
+                   keep_alive: bool):
+    params = capture_params(args)
+    with Client(API_KEY, base_url=url, keep_alive=keep_alive,
+                hooks=latencies.hooks(), metrics=metrics) as client:
+        for i in range(args.captures):
+            try:
+                client.get_raw(url='example.com/{}'.format(i), **params)
+            except ScreenshotApiError:
+                pass
+
+
+def run_batched(url: str, args, latencies: Latencies, metrics: Metrics,
+                http2: bool = False):
+    params = capture_params(args)
+    specs = (dict(url='example.com/{}'.format(i), **params)
+             for i in range(args.captures))
+    transport = None
+    if http2:
+        from screenshotapi import Http2Transport
+        transport = Http2Transport()
+
+    with Client(API_KEY, base_url=url, pool_size=args.concurrency,
+                transport=transport, hooks=latencies.hooks(),
+                metrics=metrics) as client:
+        for _ in client.get_many(specs, workers=args.concurrency):
+            pass
+    if transport is not None:
+        transport.close()
+
+
+def run_async(url: str, args, latencies: Latencies, metrics: Metrics):
+    from screenshotapi import AsyncClient
+
+    params = capture_params(args)
+
+    async def main():
+        async with AsyncClient(API_KEY, base_url=url,
+                               max_concurrency=args.concurrency,
+                               hooks=latencies.hooks(),
+                               metrics=metrics) as client:
+            await asyncio.gather(*[
+                client.get_raw(url='example.com/{}'.format(i), **params)
+                for i in range(args.captures)
+            ], return_exceptions=True)
+
+    # asyncio.run is not available on Python 3.6
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def percentile(values: list, share: float) -> float or None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss() -> int or None:
+    """Peak resident set size of this process, bytes"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_scenario(scenario: str, url: str, args) -> dict:
+    latencies = Latencies()
+    metrics = Metrics()
+    cpu_start = os.times()
+    start = time.perf_counter()
+
+    if scenario in ('sync', 'pooled'):
+        run_sequential(url, args, latencies, metrics, scenario == 'pooled')
+    elif scenario in ('batched', 'http2'):
+        run_batched(url, args, latencies, metrics, scenario == 'http2')
+    else:
+        run_async(url, args, latencies, metrics)
+
+    wall = time.perf_counter() - start
+    cpu_end = os.times()
+    cpu = (cpu_end.user - cpu_start.user) + \
+        (cpu_end.system - cpu_start.system)
+
+    return {
+        'captures': args.captures,
+        'errors': latencies.errors,
+        'seconds': wall,
+        'throughput': args.captures / wall,
+        'p50': percentile(latencies.values, 0.5),
+        'p99': percentile(latencies.values, 0.99),
+        'cpu_per_capture': cpu / args.captures,
+        'peak_rss': peak_rss(),
+        'sockets': metrics.phase_seconds.count('connect'),
+    }
+
+
+def start_server(args, http2: bool = False) -> tuple:
+    command = [sys.executable, os.path.join(HERE, 'stub_server.py'),
+               '--latency', str(args.latency),
+               '--distribution', args.distribution,
+               '--spread', str(args.spread),
+               '--size', str(args.size),
+               '--error-rate', str(args.error_rate)]
+    if args.seed is not None:
+        command += ['--seed', str(args.seed)]
+    if http2:
+        command.append('--http2')
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               universal_newlines=True)
+    return process, process.stdout.readline().strip()
+
+
+def child_command(scenario: str, url: str, argv: list) -> list:
+    return [sys.executable, os.path.abspath(__file__),
+            '--child', scenario, '--url', url] + argv
+
+
+def compare(results: dict, baseline: dict):
+    print('\nChange from baseline:')
+    for scenario, result in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(scenario)
+        if not old:
+            continue
+        changes = []
+        for name in ('throughput', 'p50', 'p99', 'cpu_per_capture',
+                     'peak_rss'):
+            if result.get(name) and old.get(name):
+                changes.append('{} {:+.1%}'.format(
+                    name, result[name] / old[name] - 1))
+        print('{:<8} {}'.format(scenario, ', '.join(changes)))
+
+
+def print_result(scenario: str, result: dict):
+    def ms(value):
+        return '-' if value is None else '{:.2f}'.format(value * 1000)
+
+    print('{:<8} {:>9.1f}/s  p50 {:>8} ms  p99 {:>8} ms  '
+          'cpu {:>7} ms/capture  rss {:>6} MiB  sockets {:>4}  '
+          'errors {}'.format(
+              scenario, result['throughput'], ms(result['p50']),
+              ms(result['p99']), ms(result['cpu_per_capture']),
+              '-' if result['peak_rss'] is None
+              else result['peak_rss'] >> 20,
+              result.get('sockets', '-'), result['errors']))
+
+
+def parse_arguments(argv: list):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n')[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('\n\n', 2)[2])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='comma-separated list, all by default')
+    parser.add_argument('--captures', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='workers of batched and async scenarios')
+    parser.add_argument('--base64', action='store_true',
+                        help='request base64-encoded images')
+    parser.add_argument('--xml', action='store_true',
+                        help='request XML errors')
+    parser.add_argument('--output', help='JSON results file')
+    parser.add_argument('--compare', help='previous JSON results file')
+    parser.add_argument('--child', choices=SCENARIOS,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    stub_server.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list):
+    args = parse_arguments(argv)
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.url, args)))
+        return
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise SystemExit('Unknown scenario: ' + scenario)
+
+    results = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {k: v for k, v in vars(args).items()
+                   if k not in ('child', 'url', 'output', 'compare')},
+        'scenarios': {},
+    }
+
+    servers = {}
+    try:
+        for scenario in scenarios:
+            http2 = scenario == 'http2'
+            if http2 not in servers:
+                servers[http2] = start_server(args, http2)
+            url = servers[http2][1]
+            output = subprocess.run(child_command(scenario, url, argv),
+                                    check=True, stdout=subprocess.PIPE,
+                                    universal_newlines=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results['scenarios'][scenario] = result
+            print_result(scenario, result)
+    finally:
+        for server, _ in servers.values():
+            server.stdin.close()
+            server.wait(5)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,271 @@
+"""
+Local stub of the Screenshot API `/api/v1` endpoint for benchmarks.
+
+Run from the repository root:
+
+    python benchmarks/stub_server.py --latency 0.05 --size 200000
+
+The first line printed is the endpoint URL. With `--http2`, the server
+speaks HTTP/2 with prior knowledge (h2c, requires the h2 package).
+"""
+import argparse
+import base64
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+PATH = '/api/v1'
+DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+
+class StubApi:
+    """
+    Emulates the API with configurable latency, payload size and errors.
+
+    Latencies are drawn from a `fixed`, `uniform` (latency +- spread) or
+    `lognormal` (median latency, sigma spread) distribution. Failed calls
+    answer 503 with a JSON or XML error depending on `errorsOutputFormat`.
+    Images are base64-encoded when `imageOutputFormat=BASE64`.
+    """
+
+    def __init__(self, latency: float = 0.0, distribution: str = 'fixed',
+                 spread: float = 0.0, size: int = 100 * 1024,
+                 error_rate: float = 0.0, seed: int = None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError('Unknown distribution: ' + distribution)
+        if not 0 <= error_rate <= 1:
+            raise ValueError('Error rate should be in [0, 1]')
+
+        self.latency = latency
+        self.distribution = distribution
+        self.spread = spread
+        self.image = b'\xff\xd8\xff\xe0' + bytes(max(0, size - 4))
+        self.encoded = b'data:image/jpeg;base64,' + \
+            base64.b64encode(self.image)
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            if self.distribution == 'uniform':
+                value = self._random.uniform(self.latency - self.spread,
+                                             self.latency + self.spread)
+            elif self.distribution == 'lognormal' and self.latency > 0:
+                value = self._random.lognormvariate(0, self.spread) \
+                    * self.latency
+            else:
+                value = self.latency
+        return max(0.0, value)
+
+    def failed(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def respond(self, path: str) -> tuple:
+        """:return: (status, content type, body)"""
+        url = urlsplit(path)
+        if url.path.rstrip('/') != PATH:
+            return 404, 'text/plain', b'Not found'
+
+        query = dict(parse_qsl(url.query))
+        time.sleep(self.delay())
+
+        if self.failed():
+            if query.get('errorsOutputFormat') == 'xml':
+                return 503, 'application/xml', \
+                    b'<error><code>503</code>' \
+                    b'<message>Service unavailable</message></error>'
+            return 503, 'application/json', \
+                b'{"code":503,"messages":"Service unavailable"}'
+
+        if query.get('imageOutputFormat') == 'BASE64':
+            return 200, 'text/plain', self.encoded
+        return 200, 'image/jpeg', self.image
+
+
+def serve(api: StubApi, host: str = '127.0.0.1', port: int = 0):
+    """Start a keep-alive server in a thread and return it"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes, avoid delayed ACK stalls
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            status, content_type, body = api.respond(self.path)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class H2Server:
+    """
+    HTTP/2 server with prior knowledge, each stream answered by a thread.
+
+    Bodies are sent as the client opens its flow control windows.
+    """
+
+    def __init__(self, api: StubApi, host: str = '127.0.0.1', port: int = 0):
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+
+        self._h2 = h2
+        self.api = api
+        # socket.create_server is not available before Python 3.8
+        self.socket = socket.socket()
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.socket.listen(1024)
+        self.server_address = self.socket.getsockname()
+
+    def serve_forever(self):
+        while True:
+            try:
+                sock, _ = self.socket.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(sock,),
+                             daemon=True).start()
+
+    def shutdown(self):
+        self.socket.shutdown(socket.SHUT_RDWR)
+        self.socket.close()
+
+    def _serve(self, sock):
+        h2 = self._h2
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(
+            client_side=False, header_encoding='utf-8'))
+        lock = threading.Condition()
+        connection.initiate_connection()
+        sock.sendall(connection.data_to_send())
+
+        while True:
+            try:
+                data = sock.recv(256 * 1024)
+            except OSError:
+                data = b''
+            with lock:
+                if not data:
+                    lock.notify_all()
+                    sock.close()
+                    return
+                try:
+                    events = connection.receive_data(data)
+                    sock.sendall(connection.data_to_send())
+                except (OSError, h2.exceptions.ProtocolError):
+                    sock.close()
+                    return
+                lock.notify_all()
+
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    threading.Thread(
+                        target=self._respond, daemon=True,
+                        args=(sock, connection, lock, event)).start()
+
+    def _respond(self, sock, connection, lock, event):
+        status, content_type, body = self.api.respond(
+            dict(event.headers)[':path'])
+        body = memoryview(body)
+        stream_id = event.stream_id
+
+        try:
+            with lock:
+                connection.send_headers(stream_id, [
+                    (':status', str(status)),
+                    ('content-type', content_type),
+                    ('content-length', str(len(body)))],
+                    end_stream=not body)
+                sock.sendall(connection.data_to_send())
+            while body:
+                # One frame at a time, so that streams are interleaved
+                with lock:
+                    size = min(
+                        len(body), connection.max_outbound_frame_size,
+                        connection.local_flow_control_window(stream_id))
+                    if size <= 0:
+                        lock.wait(1)
+                        continue
+                    connection.send_data(stream_id, body[:size].tobytes(),
+                                         end_stream=size == len(body))
+                    sock.sendall(connection.data_to_send())
+                body = body[size:]
+        except (OSError, self._h2.exceptions.ProtocolError):
+            return
+
+
+def serve_h2(api: StubApi, host: str = '127.0.0.1', port: int = 0):
+    """Start an HTTP/2 server in a thread and return it"""
+    server = H2Server(api, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def endpoint(server) -> str:
+    host, port = server.server_address[:2]
+    return 'http://{}:{}{}'.format(host, port, PATH)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='median response delay, seconds')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS,
+                        default='fixed')
+    parser.add_argument('--spread', type=float, default=0.0,
+                        help='uniform half-width or lognormal sigma')
+    parser.add_argument('--size', type=int, default=100 * 1024,
+                        help='image size, bytes')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of 503 responses')
+    parser.add_argument('--seed', type=int)
+
+
+def api_from_arguments(args) -> StubApi:
+    return StubApi(args.latency, args.distribution, args.spread, args.size,
+                   args.error_rate, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    add_arguments(parser)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--http2', action='store_true',
+                        help='HTTP/2 with prior knowledge')
+    args = parser.parse_args()
+
+    server = (serve_h2 if args.http2 else serve)(
+        api_from_arguments(args), args.host, args.port)
+    print(endpoint(server), flush=True)
+    try:
+        # Until killed or stdin is closed by the parent process
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
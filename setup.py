@@ -66,7 +66,18 @@ setup(
     install_requires=[
         'requests',
     ],
+    entry_points={
+        'console_scripts': [
+            'screenshotapi = screenshotapi.cli:main',
+        ]
+    },
     extras_require={
+        'async': [
+            'aiohttp',
+        ],
+        'http2': [
+            'h2',
+        ],
         'dev': [
             'tox',
             'flake8',
@@ -1,13 +1,39 @@
-__all__ = ['ApiAuthError', 'ApiRequester', 'BadRequestError', 'Client',
-           'EmptyApiKeyError', 'ErrorMessage', 'FileError', 'HttpApiError',
-           'ImageFormat', 'ParameterError', 'ResponseError',
-           'ScreenshotApiError']
+__all__ = ['AdaptiveLimiter', 'ApiAuthError', 'ApiRequester',
+           'AsyncApiRequester', 'AsyncClient', 'BadRequestError',
+           'BatchJournal', 'BatchResult', 'BlobStore', 'Cache', 'CacheStats',
+           'CaptureOptions', 'Client', 'ConnectionPool', 'Deadline',
+           'DeadlineExceededError', 'DedupIndex', 'DiskCache',
+           'DiskDedupIndex', 'EmptyApiKeyError', 'ErrorMessage', 'Exporter',
+           'FakeTransport', 'FileError', 'HedgePolicy', 'HookEvent', 'Hooks',
+           'Http2Transport', 'HttpApiError', 'ImageFormat', 'JobScheduler',
+           'JournalEntry', 'MemoryCache', 'Metrics', 'ParameterError',
+           'PrometheusExporter', 'RateLimiter', 'RequestsTransport',
+           'ResponseError', 'RetryBudget', 'RetryPolicy', 'ScreenshotApiError',
+           'Transport']
 
-from .client import Client
+from .async_client import AsyncClient
+from .batch import BatchResult
+from .cache import Cache, CacheStats, DiskCache, MemoryCache
+from .client import CaptureOptions, Client
+from .dedup import DedupIndex, DiskDedupIndex
+from .hooks import HookEvent, Hooks
+from .journal import BatchJournal, JournalEntry
+from .metrics import Exporter, Metrics, PrometheusExporter
 from .models.request import ImageFormat
 from .models.response import ErrorMessage
+from .net.async_http import AsyncApiRequester
+from .net.concurrency import AdaptiveLimiter
+from .net.deadline import Deadline
+from .net.hedge import HedgePolicy
 from .net.http import ApiRequester
+from .net.http2 import Http2Transport
+from .net.pool import ConnectionPool
+from .net.ratelimit import RateLimiter
+from .net.retry import RetryBudget, RetryPolicy
+from .net.transport import FakeTransport, RequestsTransport, Transport
+from .scheduler import JobScheduler
+from .store import BlobStore
 
 from .exceptions.error import ApiAuthError, BadRequestError, \
-    EmptyApiKeyError, FileError, HttpApiError, ParameterError, \
-    ResponseError, ScreenshotApiError
+    DeadlineExceededError, EmptyApiKeyError, FileError, HttpApiError, \
+    ParameterError, ResponseError, ScreenshotApiError
@@ -0,0 +1,207 @@
+import asyncio
+
+from .batch import run_batch_async
+from .client import Client
+from .decoder import Base64StreamDecoder
+from .dedup import DedupIndex
+from .net.deadline import Deadline
+from .scheduler import JobScheduler
+from .net.async_http import AsyncApiRequester
+from .exceptions.error import FileError
+
+
+class AsyncClient(Client):
+    """
+    Asyncio counterpart of `Client`.
+
+    Accepts the same parameters and performs the same validation, but
+    `get` and `get_raw` are coroutines. The number of captures in flight
+    is bounded by `max_concurrency`.
+    """
+
+    _api_requester: AsyncApiRequester or None
+
+    _REQUESTER = AsyncApiRequester
+
+    DEFAULT_MAX_CONCURRENCY = 100
+
+    def __init__(self, api_key: str, **kwargs):
+        """
+        Parameters of `Client`, except `transport` and `pool`, and:
+        :key max_concurrency: int: (optional) Max number of concurrent
+                API calls, waited for within the `deadline`. 100 by default
+        :key connector: aiohttp.BaseConnector: (optional) Connector shared
+                with other clients. `pool_size`, `keep_alive` and
+                `idle_timeout` are ignored if it is given
+        """
+
+        self._semaphore = None
+        self.max_concurrency = kwargs.pop(
+            'max_concurrency', AsyncClient.DEFAULT_MAX_CONCURRENCY)
+        super().__init__(api_key, **kwargs)
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    @max_concurrency.setter
+    def max_concurrency(self, value: int):
+        if type(value) is int and value > 0:
+            self._max_concurrency = value
+            self._semaphore = None
+        else:
+            raise ValueError('Max concurrency should be a positive integer')
+
+    async def get(self, **kwargs):
+        """
+        Capture screenshot and save to file.
+
+        Accepts the same parameters as `Client.get`.
+        :raises FileError: cannot open/write file
+        """
+
+        deadline = self._start_deadline(kwargs)
+        decode = Client._set_file_formats(kwargs)
+        filename = Client._validate_filename(kwargs.get('filename'))
+        payload = self._prepare_payload(kwargs)
+
+        image_file = await self._run_in_executor(
+            self._open_output, filename)
+
+        try:
+            await self._stream(payload, image_file, decode, deadline)
+        except BaseException:
+            await self._run_in_executor(image_file.discard)
+            raise
+
+        try:
+            await self._run_in_executor(image_file.commit)
+        except Exception:
+            raise FileError('Cannot write result to file')
+
+    async def get_to_stream(self, fileobj, **kwargs) -> int:
+        """
+        Capture screenshot and write it to a binary file-like object
+        as the response arrives.
+
+        Accepts the same parameters as `Client.get_to_stream`.
+        :return: int: Number of bytes written
+        :raises FileError: cannot write to `fileobj`
+        """
+
+        deadline = self._start_deadline(kwargs)
+        decode = Client._set_file_formats(kwargs)
+
+        return await self._stream(
+            self._prepare_payload(kwargs), fileobj, decode, deadline)
+
+    async def get_raw(self, **kwargs) -> bytes:
+        """
+        Get raw API response.
+
+        Accepts the same parameters as `Client.get_raw`.
+        :return: bytes
+        """
+
+        deadline = self._start_deadline(kwargs)
+        payload = self._prepare_payload(kwargs)
+
+        async with self._slot(deadline):
+            return await self._api_requester.get(payload, deadline)
+
+    def get_many(self, specs, workers: int = None, queue_size: int = None,
+                 scheduler: JobScheduler = None,
+                 dedupe: bool or DedupIndex = False):
+        """
+        Capture many screenshots concurrently.
+
+        Accepts the same specs as `Client.get_many`, without a journal.
+        :param workers: int: Max captures in flight. `max_concurrency`
+                by default
+        :param queue_size: int: Max number of specs taken ahead of consumed
+                results. Twice the `workers` by default
+        :param scheduler: JobScheduler: (optional) Order of the specs taken
+                ahead, see `Client.get_many`
+        :param dedupe: bool or DedupIndex: (optional) Capture equivalent
+                specs once, see `Client.get_many`
+        :return: async generator of `BatchResult` in completion order
+        :raises ValueError: invalid workers or queue size
+        """
+
+        if workers is None:
+            workers = self.max_concurrency
+        if queue_size is None and type(workers) is int:
+            queue_size = workers * 2
+
+        return run_batch_async(
+            self, specs, workers, queue_size, scheduler, dedupe)
+
+    async def close(self):
+        """Release pooled connections (unless the connector is shared)"""
+        await self._api_requester.close()
+
+    def __enter__(self):
+        raise TypeError('Use "async with" with AsyncClient')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _stream(self, payload: dict, fileobj, decode: bool,
+                      deadline: Deadline = None) -> int:
+        write = Client._file_writer(fileobj)
+        decoder = Base64StreamDecoder() if decode else None
+
+        async def write_async(chunk: bytes):
+            if decoder is not None:
+                chunk = decoder.decode(chunk)
+            if chunk:
+                await self._run_in_executor(write, chunk)
+
+        async with self._slot(deadline):
+            size = await self._api_requester.stream(
+                payload, write_async, deadline)
+
+        if decoder is None:
+            return size
+
+        decoder.finish()
+        return decoder.size
+
+    def _slot(self, deadline: Deadline or None) -> '_Slot':
+        return _Slot(self._get_semaphore(), deadline)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so that it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    async def _run_in_executor(func, *args):
+        return await asyncio.get_event_loop().run_in_executor(
+            None, func, *args)
+
+
+class _Slot:
+    """Concurrency slot of a call, held in an `async with` block"""
+
+    def __init__(self, semaphore: asyncio.Semaphore,
+                 deadline: Deadline or None):
+        self._semaphore = semaphore
+        self._deadline = deadline
+
+    async def __aenter__(self):
+        if self._deadline is None:
+            await self._semaphore.acquire()
+        else:
+            await self._deadline.wait_for(
+                self._semaphore.acquire(), 'waiting for a concurrency slot')
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._semaphore.release()
@@ -0,0 +1,500 @@
+import asyncio
+import hashlib
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .cache.base import payload_key
+from .dedup import DedupIndex, canonical_spec, dedup_key
+from .exceptions.error import DeadlineExceededError, FileError, \
+    ParameterError
+from .fileio import AtomicFile, file_digest
+from .journal import BatchJournal, JournalEntry
+from .scheduler import Job, JobScheduler
+from .store import link_file
+
+
+class BatchResult:
+    """Outcome of a single capture of a batch"""
+
+    index: int
+    spec: dict
+    result: bytes or None
+    error: Exception or None
+    key: str or None
+    skipped: bool
+    shared: int or None
+    size: int or None
+    digest: str or None
+
+    def __init__(self, index: int, spec: dict, result: bytes = None,
+                 error: Exception = None, key: str = None,
+                 skipped: bool = False, shared: int = None,
+                 size: int = None, digest: str = None):
+        self.index = index
+        self.spec = spec
+        self.result = result
+        self.error = error
+        self.key = key
+        self.skipped = skipped
+        # Index of the row whose capture this one reuses
+        self.shared = shared
+        # Of the file written, hashed while it downloaded
+        self.size = size
+        self.digest = digest
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def filename(self) -> str or None:
+        if isinstance(self.spec, dict):
+            return self.spec.get('filename')
+        return None
+
+    def __repr__(self):
+        return '{}(index={}, ok={}, skipped={}, shared={})'.format(
+            self.__class__.__name__, self.index, self.ok, self.skipped,
+            self.shared)
+
+
+def normalize_spec(spec) -> dict:
+    """Accept either a URL string or a dict of capture parameters"""
+    if isinstance(spec, str):
+        return {'url': spec}
+    if isinstance(spec, dict):
+        return dict(spec)
+    raise ParameterError('Capture spec must be a URL or a dict')
+
+
+def job_key(spec: dict) -> str:
+    """Journal key of a normalized capture spec"""
+    return payload_key(spec)
+
+
+def capture(client, index: int, spec, journal: BatchJournal = None,
+            key: str = None) -> BatchResult:
+    """Run one capture with `client`, never raising"""
+    try:
+        spec = normalize_spec(spec)
+        if 'filename' in spec:
+            # Journaled files are hashed on the way, not read back
+            image_file = client._get_file(dict(spec), journal is not None)
+            result = BatchResult(index, spec, key=key, size=image_file.size,
+                                 digest=image_file.digest)
+        else:
+            result = BatchResult(index, spec, client.get_raw(**spec), key=key)
+    except Exception as error:
+        result = BatchResult(index, spec, error=error, key=key)
+
+    _record(journal, result)
+    return result
+
+
+async def capture_async(client, index: int, spec) -> BatchResult:
+    """Run one capture with an `AsyncClient`, never raising"""
+    try:
+        spec = normalize_spec(spec)
+        if 'filename' in spec:
+            await client.get(**dict(spec))
+            return BatchResult(index, spec)
+        return BatchResult(index, spec, await client.get_raw(**spec))
+    except Exception as error:
+        return BatchResult(index, spec, error=error)
+
+
+def capture_job(client, job: Job,
+                journal: BatchJournal = None) -> BatchResult:
+    """Run a scheduled capture, failing it if its deadline passed"""
+    if job.expired:
+        result = BatchResult(job.index, job.spec, key=job.key, error=(
+            DeadlineExceededError('Deadline exceeded in the queue')))
+        _record(journal, result)
+        return result
+    return capture(client, job.index, job.call_spec(), journal, job.key)
+
+
+def _record(journal: BatchJournal or None, result: BatchResult):
+    if journal is not None and result.key is not None:
+        try:
+            journal.record(_journal_entry(result))
+        except Exception as error:
+            result.error = error
+
+
+def _journal_entry(result: BatchResult) -> JournalEntry:
+    if not result.ok:
+        # Error messages may contain the request URL with the API key
+        error = type(result.error).__name__
+        status = getattr(result.error, 'status_code', None)
+        if status is not None:
+            error += ' {}'.format(status)
+        return JournalEntry(result.key, JournalEntry.ERROR, error=error)
+
+    if result.filename is not None:
+        size, checksum = result.size, result.digest
+        if checksum is None:
+            size, checksum = file_digest(result.filename)
+        return JournalEntry(result.key, JournalEntry.OK, size, checksum,
+                            result.filename)
+    return JournalEntry(result.key, JournalEntry.OK, len(result.result),
+                        hashlib.sha256(result.result).hexdigest())
+
+
+def run_batch(client, specs, workers: int, queue_size: int,
+              journal: BatchJournal or str = None,
+              scheduler: JobScheduler = None,
+              dedupe: bool or DedupIndex = False):
+    """
+    Run captures on a thread pool and yield `BatchResult` objects
+    in completion order.
+
+    At most `queue_size` specs are taken from the iterable ahead of
+    the results consumed, so lazy generators are never materialized.
+
+    With a `journal`, every finished job is recorded, and jobs it lists
+    as completed are yielded as skipped results without an API call.
+
+    With a `scheduler`, the specs taken ahead are run in its order
+    instead of the input order.
+
+    With `dedupe`, specs are sent in canonical form and the rows
+    equivalent to an earlier one share its capture instead of calling
+    the API.
+    """
+    _check_sizes(workers, queue_size, scheduler, dedupe)
+    if scheduler is not None:
+        return _iterate_scheduled(
+            client, specs, workers, queue_size, journal, scheduler, dedupe)
+    return _iterate_batch(
+        client, specs, workers, queue_size, journal, dedupe)
+
+
+def run_batch_async(client, specs, workers: int, queue_size: int,
+                    scheduler: JobScheduler = None,
+                    dedupe: bool or DedupIndex = False):
+    """
+    Asynchronous counterpart of `run_batch`, without a journal:
+    an async generator of `BatchResult` objects in completion order
+    """
+    _check_sizes(workers, queue_size, scheduler, dedupe)
+    return _iterate_async(client, specs, workers, queue_size,
+                          scheduler or JobScheduler(), dedupe)
+
+
+def _check_sizes(workers: int, queue_size: int,
+                 scheduler: JobScheduler or None,
+                 dedupe: bool or DedupIndex = False):
+    if type(workers) is not int or workers < 1:
+        raise ValueError('Workers number should be a positive integer')
+    if type(queue_size) is not int or queue_size < workers:
+        raise ValueError('Queue size should be at least the workers number')
+    if scheduler is not None and not isinstance(scheduler, JobScheduler):
+        raise ValueError('Scheduler should be a JobScheduler instance')
+    if type(dedupe) is not bool and not isinstance(dedupe, DedupIndex):
+        raise ValueError('Dedupe should be a bool or a DedupIndex instance')
+
+
+class _Dedup:
+    """Rows of a batch sharing the capture of an equivalent earlier row"""
+
+    def __init__(self, dedupe: bool or DedupIndex, link: bool = False):
+        # An index given by the caller outlives the batch
+        self.owns_index = not isinstance(dedupe, DedupIndex)
+        self.index = DedupIndex() if self.owns_index else dedupe
+        # Shared files are hard links of a content-addressed store
+        self.link = link
+        self._leaders = {}
+        self._waiting = {}
+        # Rows held until the capture they share is done
+        self.waiting = 0
+
+    def admit(self, index: int, spec, key: str = None) -> tuple:
+        """
+        :return: tuple: (spec, None) of a capture to run, in canonical
+                form, or (None, results) of a repeated row: its result if
+                the shared capture is done, none while it runs
+        """
+        try:
+            spec = canonical_spec(normalize_spec(spec))
+        except ParameterError:
+            return spec, None
+
+        capture_key = dedup_key(spec)
+        leader = self.index.claim(capture_key, index)
+        if leader is None:
+            self._leaders[index] = capture_key
+            return spec, None
+
+        outcome = self.index.outcome(capture_key)
+        if outcome is None:
+            self._waiting.setdefault(capture_key, []).append(
+                (index, spec, key, leader))
+            self.waiting += 1
+            return None, []
+        leader, filename, data = outcome
+        return None, [_shared_result(index, spec, key, leader, filename,
+                                     data, link=self.link)]
+
+    def settle(self, result: BatchResult) -> list:
+        """Results of the rows waiting for the capture of `result`"""
+        capture_key = self._leaders.pop(result.index, None)
+        if capture_key is None:
+            return []
+
+        if result.ok:
+            self.index.finish(capture_key, result.filename, result.result)
+        else:
+            # Later rows try again
+            self.index.discard(capture_key)
+        waiting = self._waiting.pop(capture_key, ())
+        self.waiting -= len(waiting)
+        shared = [
+            _shared_result(index, spec, key, leader, result.filename,
+                           result.result, result.error, self.link)
+            for index, spec, key, leader in waiting
+        ]
+        for item in shared:
+            if item.ok and item.filename is not None:
+                item.size, item.digest = result.size, result.digest
+        return shared
+
+    def close(self):
+        if self.owns_index:
+            self.index.close()
+
+
+def _shared_result(index: int, spec: dict, key: str or None, leader: int,
+                   filename: str or None, data: bytes or None,
+                   error: Exception = None,
+                   link: bool = False) -> BatchResult:
+    result = BatchResult(index, spec, data, error, key, shared=leader)
+    target = result.filename
+    if error is None and target is not None and target != filename:
+        try:
+            if link:
+                link_file(filename, target)
+            else:
+                with open(filename, 'rb') as source, \
+                        AtomicFile(target) as copy:
+                    shutil.copyfileobj(source, copy)
+        except OSError:
+            result.error = FileError('Cannot write result to file')
+    return result
+
+
+def _held(dedup: _Dedup or None) -> int:
+    return 0 if dedup is None else dedup.waiting
+
+
+def _with_shared(result: BatchResult, dedup: _Dedup or None,
+                 journal: BatchJournal or None):
+    yield result
+    if dedup is not None:
+        for shared in dedup.settle(result):
+            _record(journal, shared)
+            yield shared
+
+
+def _iterate_batch(client, specs, workers: int, queue_size: int,
+                   journal: BatchJournal or str = None,
+                   dedupe: bool or DedupIndex = False):
+    # Opened here so that a generator never iterated leaks no journal
+    owns_journal = isinstance(journal, str)
+    if owns_journal:
+        journal = BatchJournal(journal)
+    dedup = None if dedupe is False \
+        else _Dedup(dedupe, client.store is not None)
+
+    specs = enumerate(specs)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted \
+                    and len(pending) + _held(dedup) < queue_size:
+                try:
+                    index, spec = next(specs)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                spec, key = _journal_key(journal, spec)
+                if key is not None and journal.is_done(key):
+                    yield BatchResult(index, spec, key=key, skipped=True)
+                    continue
+                if dedup is not None:
+                    spec, shared = dedup.admit(index, spec, key)
+                    if spec is None:
+                        for result in shared:
+                            _record(journal, result)
+                            yield result
+                        continue
+
+                pending.add(executor.submit(
+                    capture, client, index, spec, journal, key))
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _with_shared(future.result(), dedup, journal)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        if dedup is not None:
+            dedup.close()
+        if journal is not None:
+            if owns_journal:
+                journal.close()
+            else:
+                journal.flush()
+
+
+def _journal_key(journal: BatchJournal or None, spec) -> tuple:
+    """Spec, normalized if possible, and its journal key, if any"""
+    if journal is None:
+        return spec, None
+    try:
+        spec = normalize_spec(spec)
+        return spec, job_key(spec)
+    except Exception:
+        return spec, None
+
+
+def _iterate_scheduled(client, specs, workers: int, queue_size: int,
+                       journal: BatchJournal or str,
+                       scheduler: JobScheduler,
+                       dedupe: bool or DedupIndex = False):
+    owns_journal = isinstance(journal, str)
+    if owns_journal:
+        journal = BatchJournal(journal)
+    dedup = None if dedupe is False \
+        else _Dedup(dedupe, client.store is not None)
+
+    specs = enumerate(specs)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    running = {}
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(scheduler) + len(running) \
+                    + _held(dedup) < queue_size:
+                try:
+                    index, spec = next(specs)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                spec, key = _journal_key(journal, spec)
+                if key is not None and journal.is_done(key):
+                    yield BatchResult(index, spec, key=key, skipped=True)
+                    continue
+                if dedup is not None:
+                    spec, shared = dedup.admit(index, spec, key)
+                    if spec is None:
+                        for result in shared:
+                            _record(journal, result)
+                            yield result
+                        continue
+                try:
+                    scheduler.push(index, normalize_spec(spec), key)
+                except (ParameterError, ValueError) as error:
+                    yield from _with_shared(
+                        BatchResult(index, spec, error=error, key=key),
+                        dedup, journal)
+
+            while len(running) < workers:
+                job = scheduler.pop()
+                if job is None:
+                    break
+                running[executor.submit(
+                    capture_job, client, job, journal)] = job
+
+            if not running:
+                return
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                scheduler.done(running.pop(future))
+                yield from _with_shared(future.result(), dedup, journal)
+    finally:
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+        if dedup is not None:
+            dedup.close()
+        if journal is not None:
+            if owns_journal:
+                journal.close()
+            else:
+                journal.flush()
+
+
+async def _iterate_async(client, specs, workers: int, queue_size: int,
+                         scheduler: JobScheduler,
+                         dedupe: bool or DedupIndex = False):
+    dedup = None if dedupe is False \
+        else _Dedup(dedupe, client.store is not None)
+    specs = enumerate(specs)
+    running = {}
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(scheduler) + len(running) \
+                    + _held(dedup) < queue_size:
+                try:
+                    index, spec = next(specs)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                if dedup is not None:
+                    spec, shared = dedup.admit(index, spec)
+                    if spec is None:
+                        for result in shared:
+                            yield result
+                        continue
+                try:
+                    scheduler.push(index, normalize_spec(spec))
+                except (ParameterError, ValueError) as error:
+                    for result in _with_shared(
+                            BatchResult(index, spec, error=error),
+                            dedup, None):
+                        yield result
+
+            while len(running) < workers:
+                job = scheduler.pop()
+                if job is None:
+                    break
+                if job.expired:
+                    scheduler.done(job)
+                    for result in _with_shared(BatchResult(
+                            job.index, job.spec, error=DeadlineExceededError(
+                                'Deadline exceeded in the queue')),
+                            dedup, None):
+                        yield result
+                    continue
+                running[asyncio.ensure_future(capture_async(
+                    client, job.index, job.call_spec()))] = job
+
+            if not running:
+                return
+
+            done, _ = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                scheduler.done(running.pop(task))
+                for result in _with_shared(task.result(), dedup, None):
+                    yield result
+    finally:
+        for task in running:
+            task.cancel()
+        if dedup is not None:
+            dedup.close()
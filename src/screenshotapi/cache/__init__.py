@@ -0,0 +1,6 @@
+__all__ = ['Cache', 'CacheStats', 'CacheWriter', 'DiskCache', 'MemoryCache',
+           'payload_key']
+
+from .base import Cache, CacheStats, CacheWriter, payload_key
+from .disk import DiskCache
+from .memory import MemoryCache
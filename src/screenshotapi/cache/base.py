@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+
+
+def payload_key(payload: dict) -> str:
+    """
+    Canonical cache key of an API payload.
+
+    The API key does not affect the result and is excluded, so clients
+    with different keys share cached screenshots.
+    """
+    canonical = json.dumps(
+        {k: v for k, v in payload.items() if k != 'apiKey'},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe cache counters"""
+
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+    expirations: int
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.as_dict())
+
+
+class CacheWriter:
+    """
+    Collects a streamed response body and stores it on `commit`.
+
+    Caches able to store data incrementally override `Cache.writer`.
+    """
+
+    def __init__(self, cache, key: str):
+        self._cache = cache
+        self._key = key
+        self._chunks = []
+
+    def write(self, chunk: bytes):
+        self._chunks.append(chunk)
+
+    def commit(self):
+        self._cache.set(self._key, b''.join(self._chunks))
+        self._chunks = []
+
+    def discard(self):
+        self._chunks = []
+
+
+class Cache:
+    """Base class of response caches"""
+
+    stats: CacheStats
+
+    # Operations may wait for I/O: async clients run them in a thread
+    blocking = True
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> bytes or None:
+        raise NotImplementedError()
+
+    def set(self, key: str, value: bytes):
+        raise NotImplementedError()
+
+    def delete(self, key: str):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def writer(self, key: str) -> CacheWriter:
+        """Get a writer storing a streamed body under `key`"""
+        return CacheWriter(self, key)
@@ -0,0 +1,200 @@
+import os
+import struct
+import threading
+import time
+
+from .base import Cache, CacheWriter
+from ..fileio import AtomicFile
+
+
+class DiskCacheWriter(CacheWriter):
+    """Streams a response body straight into a cache file"""
+
+    def __init__(self, cache, key: str):
+        super().__init__(cache, key)
+        self._file = cache._open_entry(key)
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def commit(self):
+        self._cache._commit_entry(self._file)
+
+    def discard(self):
+        self._file.discard()
+
+
+class DiskCache(Cache):
+    """
+    Persistent content-addressed response cache.
+
+    Each entry is a file named after the payload hash. Files are written
+    atomically, so several processes may share one cache directory.
+    Least recently used entries are evicted when `max_size` is exceeded.
+    """
+
+    _HEADER = struct.Struct('<d')
+    _SUFFIX = '.bin'
+    _LOW_WATERMARK = 0.9
+
+    def __init__(self, path: str, ttl: float = None, max_size: int = None):
+        """
+        :param path: str: Cache directory, created if missing
+        :param ttl: float: (optional) Seconds an entry stays valid.
+                Never expires by default
+        :param max_size: int: (optional) Total size limit in bytes.
+                Unlimited by default
+        """
+        super().__init__()
+
+        if ttl is not None and ttl <= 0:
+            raise ValueError('TTL should be positive or None')
+        if max_size is not None and (type(max_size) is not int
+                                     or max_size <= 0):
+            raise ValueError('Max size should be a positive integer or None')
+
+        self._path = path
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._scan())
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def ttl(self) -> float or None:
+        return self._ttl
+
+    @property
+    def max_size(self) -> int or None:
+        return self._max_size
+
+    @property
+    def size(self) -> int:
+        """Approximate total size of the entries in bytes"""
+        return self._size
+
+    def get(self, key: str) -> bytes or None:
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                header = f.read(self._HEADER.size)
+                data = f.read()
+        except OSError:
+            self.stats.incr('misses')
+            return None
+
+        if len(header) != self._HEADER.size or self._expired(
+                self._HEADER.unpack(header)[0]):
+            self._remove_entry(filename)
+            self.stats.incr('expirations')
+            self.stats.incr('misses')
+            return None
+
+        try:
+            # The modification time tracks the last access for LRU eviction
+            os.utime(filename)
+        except OSError:
+            pass
+
+        self.stats.incr('hits')
+        return data
+
+    def set(self, key: str, value: bytes):
+        entry = self._open_entry(key)
+        try:
+            entry.write(value)
+        except BaseException:
+            entry.discard()
+            raise
+        self._commit_entry(entry)
+
+    def delete(self, key: str):
+        self._remove_entry(self._filename(key))
+
+    def clear(self):
+        for filename, _, _ in self._scan():
+            self._remove_entry(filename)
+
+    def writer(self, key: str) -> CacheWriter:
+        return DiskCacheWriter(self, key)
+
+    def _open_entry(self, key: str) -> AtomicFile:
+        filename = self._filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        entry = AtomicFile(filename)
+        entry.write(self._HEADER.pack(time.time()))
+        return entry
+
+    def _commit_entry(self, entry: AtomicFile):
+        with self._lock:
+            # An entry overwritten by the same key no longer counts
+            replaced = self._entry_size(entry.filename)
+            entry.commit()
+            self._size += entry.size - replaced
+            overflow = self._max_size is not None \
+                and self._size > self._max_size
+
+        self.stats.incr('stores')
+        if overflow:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self._max_size * self._LOW_WATERMARK
+
+            for filename, size, _ in entries:
+                if total <= target:
+                    break
+                if self._remove(filename):
+                    self.stats.incr('evictions')
+                total -= size
+
+            self._size = total
+
+    def _expired(self, created: float) -> bool:
+        return self._ttl is not None and time.time() - created > self._ttl
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self._path, key[:2], key + self._SUFFIX)
+
+    def _scan(self):
+        for directory in os.scandir(self._path):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.startswith('.') \
+                        or not entry.name.endswith(self._SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    @staticmethod
+    def _entry_size(filename: str) -> int:
+        try:
+            return os.stat(filename).st_size
+        except OSError:
+            return 0
+
+    def _remove_entry(self, filename: str):
+        with self._lock:
+            size = self._entry_size(filename)
+            if self._remove(filename):
+                self._size = max(0, self._size - size)
+
+    def _remove(self, filename: str) -> bool:
+        try:
+            os.remove(filename)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .base import Cache
+
+
+class MemoryCache(Cache):
+    """
+    In-process LRU response cache bounded by the total size in bytes.
+
+    Cached bodies are returned as the very same `bytes` objects,
+    without copying.
+    """
+
+    blocking = False
+
+    def __init__(self, max_size: int, ttl: float = None):
+        """
+        :param max_size: int: Total size limit of cached bodies in bytes
+        :param ttl: float: (optional) Default seconds an entry stays valid.
+                Never expires by default
+        """
+        super().__init__()
+
+        if type(max_size) is not int or max_size <= 0:
+            raise ValueError('Max size should be a positive integer')
+        MemoryCache._validate_ttl(ttl)
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def ttl(self) -> float or None:
+        return self._ttl
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached bodies in bytes"""
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes or None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.incr('misses')
+                return None
+
+            value, expires = entry
+            if expires is not None and time.monotonic() > expires:
+                self._pop(key)
+                self.stats.incr('expirations')
+                self.stats.incr('misses')
+                return None
+
+            self._entries.move_to_end(key)
+
+        self.stats.incr('hits')
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        """
+        :param key: str: Cache key
+        :param value: bytes: Response body
+        :param ttl: float: (optional) Seconds the entry stays valid,
+                overrides the cache default
+        """
+        MemoryCache._validate_ttl(ttl)
+        if ttl is None:
+            ttl = self._ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._pop(key)
+
+            if len(value) > self._max_size:
+                return
+
+            self._entries[key] = (value, expires)
+            self._size += len(value)
+
+            while self._size > self._max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats.incr('evictions')
+
+        self.stats.incr('stores')
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    @staticmethod
+    def _validate_ttl(ttl: float or None):
+        if ttl is not None and ttl <= 0:
+            raise ValueError('TTL should be positive or None')
@@ -0,0 +1,422 @@
+"""
+Capture screenshots of the URLs listed in a file.
+
+Input rows are plain URLs, CSV with a `url` column or JSON lines with
+a `url` key; the other CSV columns and JSON keys are capture options of
+the row, e.g. `width` or `full_page`. Gzip-compressed input is detected
+automatically. Screenshots are stored under OUTPUT in a sharded layout:
+ab/cd/abcd....jpg, named after a hash of the URL and its options.
+
+Finished captures are recorded in a journal, OUTPUT/.screenshotapi-journal
+by default, so that running the same command again after an interruption
+skips the screenshots already taken.
+
+With --store DIR, each distinct screenshot is kept once in DIR and the
+output files are hard links to it; `screenshotapi gc DIR` removes the
+screenshots no output file links to anymore.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import sys
+import time
+
+from .cache.base import payload_key
+from .client import Client
+from .dedup import DiskDedupIndex, canonical_spec
+from .exceptions.error import ScreenshotApiError
+from .hooks import REDACTED
+from .net.retry import RetryPolicy
+from .scheduler import JobScheduler
+from .store import BlobStore
+from .version import VERSION
+
+API_KEY_ENV = 'SCREENSHOT_API_KEY'
+FORMATS = ('auto', 'lines', 'csv', 'jsonl')
+JOURNAL_NAME = '.screenshotapi-journal'
+
+# Capture options which are not strings
+OPTION_TYPES = {
+    'decode_base64': bool,
+    'fail_on_hostname_change': bool,
+    'full_page': bool,
+    'landscape': bool,
+    'mobile': bool,
+    'no_js': bool,
+    'retina': bool,
+    'scroll': bool,
+    'touch_screen': bool,
+    'delay': int,
+    'height': int,
+    'priority': int,
+    'quality': int,
+    'thumb_width': int,
+    'timeout': int,
+    'width': int,
+    'deadline': float,
+    'scale': float,
+}
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_input(path: str):
+    """Text stream of a file or stdin (`-`), gunzipped if needed"""
+    raw = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    buffered = raw if hasattr(raw, 'peek') else io.BufferedReader(raw)
+    if buffered.peek(2)[:2] == _GZIP_MAGIC:
+        buffered = gzip.GzipFile(fileobj=buffered)
+    return io.TextIOWrapper(buffered, encoding='utf-8', newline='')
+
+
+def detect_format(path: str, first_line: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if first_line.lstrip().startswith('{'):
+        return 'jsonl'
+    return 'lines'
+
+
+def coerce(name: str, value: str):
+    """
+    Typed value of a CSV cell or `-O` option, by the type of the option.
+    Other options, `url` included, and values that do not parse stay
+    strings, for the client to validate
+    """
+    kind = OPTION_TYPES.get(name, str)
+    if kind is bool:
+        lowered = value.strip().lower()
+        if lowered in ('true', 'false'):
+            return lowered == 'true'
+        return value
+    if kind is float:
+        # Whole numbers are sent as such, `scale=2` and not `2.0`
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        number = kind(value)
+    except ValueError:
+        return value
+    # Words such as 'nan' or 'infinity' stay strings
+    if kind is float and not math.isfinite(number):
+        return value
+    return number
+
+
+def read_rows(stream, fmt: str):
+    """
+    Yield capture specs, dicts with `url` and options, from a text stream
+    :param fmt: str: One of `lines`, `csv` or `jsonl`
+    :raises ValueError: malformed row
+    """
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 2):
+            if not row.get('url'):
+                raise ValueError('Line {}: url column required'.format(number))
+            yield {k: coerce(k, v) for k, v in row.items()
+                   if k and v is not None and v != ''}
+        return
+
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if fmt == 'lines':
+            yield {'url': line}
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError('Line {}: invalid JSON'.format(number))
+        if not isinstance(row, dict) or not row.get('url'):
+            raise ValueError('Line {}: url key required'.format(number))
+        yield row
+
+
+def read_specs(path: str, fmt: str = 'auto'):
+    """Yield the capture specs of a file, `-` for stdin"""
+    with open_input(path) as stream:
+        if fmt == 'auto':
+            first = stream.readline()
+            fmt = detect_format(path, first)
+            stream = _chain(first, stream)
+        yield from read_rows(stream, fmt)
+
+
+def _chain(first: str, stream):
+    yield first
+    yield from stream
+
+
+def describe(error: Exception, api_key: str = None) -> str:
+    """One-line error description, without the API key"""
+    if isinstance(error, ScreenshotApiError):
+        status = getattr(error, 'status_code', None)
+        text = ' '.join(str(error.message).split())
+        if status is not None:
+            text = '{} {}'.format(status, text)
+    else:
+        text = '{}: {}'.format(type(error).__name__, error)
+    return text.replace(api_key, REDACTED) if api_key else text
+
+
+class ShardedLayout:
+    """
+    Output paths spread over nested directories, `depth` levels of two
+    hex digits, so that no directory gets too many files
+    """
+
+    def __init__(self, root: str, depth: int = 2):
+        if type(depth) is not int or not 0 <= depth <= 8:
+            raise ValueError('Shard depth should be in [0, 8]')
+        self.root = root
+        self.depth = depth
+        self._created = set()
+
+    def path(self, spec: dict) -> str:
+        key = payload_key(spec)
+        directory = os.path.join(
+            self.root, *[key[2 * i:2 * i + 2] for i in range(self.depth)])
+        if directory not in self._created:
+            os.makedirs(directory, exist_ok=True)
+            self._created.add(directory)
+        return os.path.join(
+            directory, '{}.{}'.format(key, spec.get('type') or 'jpg'))
+
+
+class Progress:
+    """Live throughput and error summary"""
+
+    def __init__(self, stream=None, interval: float = 1.0):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.skipped = 0
+        self._start = time.monotonic()
+        self._shown = self._start
+        self._live = self.stream.isatty()
+
+    def update(self, ok: bool, skipped: bool = False):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.done += 1
+            if not ok:
+                self.errors += 1
+
+        now = time.monotonic()
+        if now - self._shown >= self.interval:
+            self._shown = now
+            self._show('\r' if self._live else '', '' if self._live else '\n')
+
+    def message(self, text: str):
+        """Print a line without mixing it with the live summary"""
+        self.stream.write('\r\x1b[K' + text + '\n' if self._live
+                          else text + '\n')
+        self.stream.flush()
+
+    def finish(self):
+        self._show('\r' if self._live else '', '\n')
+
+    def _show(self, start: str, end: str):
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        skipped = ', {} skipped'.format(self.skipped) if self.skipped else ''
+        self.stream.write('{}{} done, {} errors{}, {:.1f}/s, {:.0f}s{}'.format(
+            start, self.done, self.errors, skipped, self.done / elapsed,
+            elapsed, end))
+        self.stream.flush()
+
+
+def parse_arguments(argv: list):
+    parser = argparse.ArgumentParser(
+        prog='screenshotapi', description=__doc__.split('\n\n')[0].strip(),
+        epilog=__doc__.split('\n\n', 1)[1].strip())
+    parser.add_argument('input', help='URL list, - for stdin')
+    parser.add_argument('-o', '--output', required=True,
+                        help='output directory')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='auto',
+                        help='input format, by file extension by default')
+    parser.add_argument('-k', '--api-key',
+                        default=os.environ.get(API_KEY_ENV),
+                        help='API key, ${} by default'.format(API_KEY_ENV))
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help='parallel captures, 8 by default')
+    parser.add_argument('-r', '--rate', type=float,
+                        help='max API calls per second')
+    parser.add_argument('--burst', type=int, default=1,
+                        help='max API calls at once, used with --rate')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='retries of transient failures, 3 by default')
+    parser.add_argument('--per-domain', type=int, metavar='N',
+                        help='max captures of one domain at once; rows '
+                             'may set priority, deadline and tenant')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='capture equivalent rows once, e.g. '
+                             'example.com and http://Example.com/')
+    parser.add_argument('--dedupe-dir', metavar='DIR',
+                        help='keep the --dedupe index in a file under DIR, '
+                             'for lists too large for memory')
+    parser.add_argument('--store', metavar='DIR',
+                        help='keep identical screenshots once in DIR, on '
+                             'the file system of OUTPUT')
+    parser.add_argument('--shard-depth', type=int, default=2,
+                        help='output directory levels, 2 by default')
+    parser.add_argument('--journal', metavar='PATH',
+                        help='journal of finished captures, '
+                             'OUTPUT/{} by default'.format(JOURNAL_NAME))
+    parser.add_argument('--no-journal', action='store_true',
+                        help='neither skip nor record finished captures')
+    parser.add_argument('-O', '--option', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='capture option of every row, e.g. width=1280')
+    parser.add_argument('--timeout', type=float,
+                        help='socket read timeout in seconds, derived '
+                             'from the capture timeout by default')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help='max time per capture, retries included')
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='no progress output')
+    parser.add_argument('--version', action='version', version=VERSION)
+
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error('API key required: --api-key or ${}'.format(API_KEY_ENV))
+    if args.concurrency < 1:
+        parser.error('Concurrency should be a positive integer')
+    if args.per_domain is not None and args.per_domain < 1:
+        parser.error('Per domain limit should be a positive integer')
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error('Deadline should be positive')
+
+    if args.dedupe_dir:
+        args.dedupe = True
+
+    defaults = {}
+    for option in args.option:
+        name, sep, value = option.partition('=')
+        if not sep or not name:
+            parser.error('Invalid option: ' + option)
+        defaults[name] = coerce(name, value)
+    args.defaults = defaults
+    if args.no_journal:
+        args.journal = None
+    elif not args.journal:
+        args.journal = os.path.join(args.output, JOURNAL_NAME)
+    return args
+
+
+def client_from_arguments(args) -> Client:
+    kwargs = {
+        'pool_size': args.concurrency,
+        'retry': RetryPolicy(max_retries=args.retries)
+        if args.retries > 0 else None,
+    }
+    if args.rate:
+        kwargs['rate_limit'] = args.rate
+        kwargs['burst'] = args.burst
+    if args.timeout:
+        kwargs['timeout'] = args.timeout
+    if args.deadline:
+        kwargs['deadline'] = args.deadline
+    if args.base_url:
+        kwargs['base_url'] = args.base_url
+    if args.store:
+        kwargs['store'] = BlobStore(args.store)
+    return Client(args.api_key, **kwargs)
+
+
+def capture_specs(rows, defaults: dict, layout: ShardedLayout,
+                  canonical: bool = False):
+    for row in rows:
+        spec = dict(defaults)
+        spec.update(row)
+        if canonical:
+            # Equivalent rows get the same output file
+            spec = canonical_spec(spec)
+        if 'filename' not in spec:
+            spec['filename'] = layout.path(spec)
+        yield spec
+
+
+def collect_garbage(argv: list) -> int:
+    """
+    `screenshotapi gc DIR`
+    :return: int: 0 on success, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog='screenshotapi gc',
+        description='Remove the screenshots of a --store directory that '
+                    'no output file links to anymore.')
+    parser.add_argument('store', help='store directory')
+    parser.add_argument('--min-age', type=float, default=3600.0,
+                        metavar='SECONDS',
+                        help='keep the files written more recently, '
+                             '3600 by default')
+    args = parser.parse_args(argv)
+    if not os.path.isdir(os.path.join(args.store, BlobStore.BLOBS)):
+        parser.error('Not a store directory: ' + args.store)
+
+    try:
+        removed, freed = BlobStore(args.store).collect(args.min_age)
+    except OSError as error:
+        sys.stderr.write('screenshotapi: {}\n'.format(describe(error)))
+        return 1
+    print('{} files removed, {} bytes freed'.format(removed, freed))
+    return 0
+
+
+def main(argv: list = None) -> int:
+    """
+    :return: int: 0 if every capture succeeded, 1 otherwise
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['gc']:
+        return collect_garbage(argv[1:])
+
+    args = parse_arguments(argv)
+    progress = Progress(interval=1.0 if not args.quiet else float('inf'))
+
+    try:
+        layout = ShardedLayout(args.output, args.shard_depth)
+        if args.journal:
+            os.makedirs(os.path.dirname(os.path.abspath(args.journal)),
+                        exist_ok=True)
+        rows = read_specs(args.input, args.format)
+        with client_from_arguments(args) as client:
+            specs = capture_specs(rows, args.defaults, layout, args.dedupe)
+            scheduler = JobScheduler(args.per_domain) \
+                if args.per_domain else None
+            dedupe = DiskDedupIndex(args.dedupe_dir) \
+                if args.dedupe_dir else args.dedupe
+            try:
+                for result in client.get_many(
+                        specs, workers=args.concurrency,
+                        journal=args.journal, scheduler=scheduler,
+                        dedupe=dedupe):
+                    progress.update(result.ok, result.skipped)
+                    if not result.ok:
+                        progress.message('{}\t{}'.format(
+                            result.spec.get('url'),
+                            describe(result.error, args.api_key)))
+            finally:
+                if args.dedupe_dir:
+                    dedupe.close()
+    except (OSError, ValueError, ScreenshotApiError) as error:
+        sys.stderr.write('screenshotapi: {}\n'.format(
+            describe(error, args.api_key)))
+        return 1
+    finally:
+        if not args.quiet:
+            progress.finish()
+
+    return 1 if progress.errors else 0
@@ -1,7 +1,18 @@
 import re
-
+import time
+from urllib.parse import quote_plus, urlencode
+
+from .batch import run_batch
+from .decoder import Base64StreamDecoder
+from .dedup import DedupIndex
+from .fileio import AtomicFile, BufferWriter
+from .hooks import redact
+from .journal import BatchJournal
+from .net.deadline import Deadline
 from .net.http import ApiRequester
-from .models.request import ImageFormat
+from .scheduler import JobScheduler
+from .store import BlobStore, BlobWriter
+from .models.request import EncodedPayload, ImageFormat
 from .exceptions.error import EmptyApiKeyError, FileError, ParameterError
 
 
@@ -9,7 +20,9 @@ class Client:
     _api_requester: ApiRequester or None
     _api_key: str
 
-    __default_url = 'https://website-screenshot.whoisxmlapi.com/api/v1'
+    _REQUESTER = ApiRequester
+
+    _DEFAULT_URL = 'https://website-screenshot.whoisxmlapi.com/api/v1'
 
     _re_api_key = re.compile(r'^at_[a-z0-9]{29}$', re.IGNORECASE)
 
@@ -19,6 +32,8 @@ class Client:
         re.IGNORECASE
     )
 
+    _CALL_KEYS = frozenset(('filename', 'options', 'url'))
+
     _DEFAULT_IMAGE_FORMAT = 'image'
     _PARSABLE_FORMAT = 'json'
     _WIDTH = 800
@@ -50,17 +65,64 @@ class Client:
         """
         :param api_key: str: Your API key
         :key base_url: str: (optional) API endpoint URL
-        :key timeout: float: (optional) API call timeout in seconds
+        :key timeout: float: (optional) Socket read timeout in seconds.
+                By default, the page-load `timeout` and `delay` of each call
+                plus `ApiRequester.RENDER_MARGIN`
+        :key deadline: float: (optional) Default time budget of a call in
+                seconds, covering the connection wait, connect, rendering,
+                download and retries. Unlimited by default
+        :key transport: Transport: (optional) HTTP client, e.g.
+                `FakeTransport` in tests. Not closed with the client.
+                `RequestsTransport` over the connection pool by default
+        :key pool: ConnectionPool: (optional) Connection pool shared with
+                other clients. Ignored if `transport` is given
+        :key pool_size: int: (optional) Max number of keep-alive connections.
+                Ignored if `pool` is given
+        :key keep_alive: bool: (optional) Reuse connections between calls.
+                Ignored if `pool` is given. True by default
+        :key idle_timeout: float: (optional) Seconds of inactivity after
+                which idle connections are dropped.
+                Ignored if `pool` is given
+        :key cache: Cache: (optional) Response cache,
+                e.g. `DiskCache` or `MemoryCache`
+        :key chunk_size: int: (optional) Bytes read at once when streaming
+                a response body. 64 KiB by default
+        :key coalesce: bool: (optional) Concurrent `get_raw` calls with
+                identical parameters share one API call. False by default
+        :key retry: RetryPolicy: (optional) Retries of transient failures.
+                No retries by default
+        :key rate_limit: float: (optional) Max API calls per second.
+                Calls wait for their turn instead of being throttled by
+                the server. Unlimited by default
+        :key burst: int: (optional) Max API calls sent at once after a
+                pause, used with `rate_limit`. 1 by default
+        :key rate_limiter: RateLimiter: (optional) Limiter shared with
+                other clients, overrides `rate_limit`
+        :key concurrency_limiter: AdaptiveLimiter: (optional) Adapts the
+                number of API calls in flight to the API latency and
+                errors, may be shared with other clients
+        :key hedge: HedgePolicy: (optional) Sends a duplicate of the
+                `get_raw` calls still waiting after a latency percentile
+                and keeps the first response. Disabled by default
+        :key metrics: Metrics: (optional) Per-phase timings and counters.
+                Disabled by default
+        :key hooks: Hooks: (optional) Callbacks run at each stage of
+                a capture
+        :key store: BlobStore: (optional) Keeps each distinct image of
+                `get` once, files become hard links to it. Disabled by
+                default
         """
 
         self._api_key = ''
+        self._api_key_query = ''
 
         self.api_key = api_key
+        self.store = kwargs.pop('store', None)
 
         if 'base_url' not in kwargs:
-            kwargs['base_url'] = Client.__default_url
+            kwargs['base_url'] = Client._DEFAULT_URL
 
-        self.api_requester = ApiRequester(**kwargs)
+        self.api_requester = self._REQUESTER(**kwargs)
 
     @property
     def api_key(self) -> str:
@@ -69,6 +131,7 @@ class Client:
     @api_key.setter
     def api_key(self, value: str):
         self._api_key = Client._validate_api_key(value)
+        self._api_key_query = 'apiKey=' + quote_plus(self._api_key)
 
     @property
     def api_requester(self) -> ApiRequester or None:
@@ -78,6 +141,16 @@ class Client:
     def api_requester(self, value: ApiRequester):
         self._api_requester = value
 
+    @property
+    def store(self) -> BlobStore or None:
+        return self._store
+
+    @store.setter
+    def store(self, value: BlobStore or None):
+        if value is not None and not isinstance(value, BlobStore):
+            raise ValueError('Store should be a BlobStore instance')
+        self._store = value
+
     @property
     def base_url(self) -> str:
         return self._api_requester.base_url
@@ -85,23 +158,43 @@ class Client:
     @base_url.setter
     def base_url(self, value: str or None):
         if value is None:
-            self._api_requester.base_url = Client.__default_url
+            self._api_requester.base_url = Client._DEFAULT_URL
         else:
             self._api_requester.base_url = value
 
     @property
-    def timeout(self) -> float:
+    def timeout(self) -> float or None:
         return self._api_requester.timeout
 
     @timeout.setter
-    def timeout(self, value: float):
+    def timeout(self, value: float or None):
         self._api_requester.timeout = value
 
+    @property
+    def deadline(self) -> float or None:
+        return self._api_requester.deadline
+
+    @deadline.setter
+    def deadline(self, value: float or None):
+        self._api_requester.deadline = value
+
+    def close(self):
+        """Release pooled connections (unless the pool is shared)"""
+        self._api_requester.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def get(self, **kwargs):
         """
         Capture screenshot and save to file
         :key filename: Required. str. File name for the screenshot
         :key url: Required. str. The target website's url
+        :key options: Optional. `CaptureOptions`. Parameters validated in
+                advance. Other parameters given along override them
         :key credits: Optional. Which subscription credits to use.
                 Supported options: SA_CREDITS, DRS_CREDITS.
                 SA_CREDITS by default
@@ -150,6 +243,11 @@ class Client:
         :key fail_on_hostname_change: Optional. bool.
                 Responds with HTTP 422 HTTP if target domain name is changed
                 due to redirects. False by default
+        :key decode_base64: Optional. bool. Receives the image in base64
+                and decodes it while downloading if True.
+                False by default
+        :key deadline: Optional. float. Seconds. Time budget of the call,
+                retries included. `Client.deadline` by default
         :raises ConnectionError:
         :raises ScreenshotApiError: Base class for all errors below
         :raises ResponseError: response contains an error message
@@ -158,40 +256,71 @@ class Client:
         :raises HttpApiError: HTTP code >= 300 and not equal to above codes
         :raises ParameterError: invalid parameter's value
         :raises FileError: cannot open/write file
+        :raises DeadlineExceededError: the deadline expired
         """
 
-        filename = None
+        self._get_file(kwargs)
 
-        kwargs['output_format'] = Client._PARSABLE_FORMAT
-        kwargs['image_output_format'] = Client._DEFAULT_IMAGE_FORMAT
+    def _get_file(self, kwargs: dict, hashed: bool = False):
+        """
+        `get`, hashing the image while it downloads if `hashed`
+        :return: The committed `AtomicFile` or `BlobWriter`, with the
+                `size` and `digest` of the image
+        """
+        deadline = self._start_deadline(kwargs)
+        decode = Client._set_file_formats(kwargs)
+        filename = Client._validate_filename(kwargs.get('filename'))
+        payload = self._prepare_payload(kwargs)
 
-        if 'filename' in kwargs:
-            filename = kwargs['filename']
+        image_file = self._open_output(filename, hashed)
 
-        if type(filename) is not str or not filename:
-            raise ParameterError('Output file name required')
+        try:
+            self._stream_to(payload, image_file, decode, deadline)
+        except BaseException:
+            image_file.discard()
+            raise
 
         try:
-            image_file = open(filename, 'wb')
+            image_file.commit()
         except Exception:
-            raise FileError('Cannot open output file')
+            raise FileError('Cannot write result to file')
+        return image_file
 
-        image_file.close()
+    def get_to_stream(self, fileobj, **kwargs) -> int:
+        """
+        Capture screenshot and write it to a binary file-like object
+        as the response arrives.
 
-        response = self.get_raw(**kwargs)
+        Accepts the same parameters as `get`, except for `filename`.
+        :param fileobj: Object with a `write(bytes)` method
+        :return: int: Number of bytes written
+        :raises FileError: cannot write to `fileobj`
+        """
 
-        try:
-            image_file = open(filename, 'wb')
-            image_file.write(response)
-        except Exception:
-            raise FileError('Cannot write result to file')
-        finally:
-            image_file.close()
+        deadline = self._start_deadline(kwargs)
+        decode = Client._set_file_formats(kwargs)
+
+        return self._stream_to(
+            self._prepare_payload(kwargs), fileobj, decode, deadline)
+
+    def get_into(self, buffer, **kwargs) -> int:
+        """
+        Capture screenshot into a preallocated buffer.
+
+        Accepts the same parameters as `get`, except for `filename`.
+        :param buffer: Writable buffer, e.g. `bytearray` or `mmap`
+        :return: int: Number of bytes written from the buffer start
+        :raises FileError: the buffer is too small
+        """
+
+        return self.get_to_stream(BufferWriter(buffer), **kwargs)
 
     def get_raw(self, **kwargs) -> bytes:
         """
         Get raw API response
         :key url: Required. str. The target website's url
+        :key options: Optional. `CaptureOptions`. Parameters validated in
+                advance. Other parameters given along override them
         :key credits: Optional. Which subscription credits to use.
                 Supported options: SA_CREDITS, DRS_CREDITS.
                 SA_CREDITS by default
@@ -246,6 +375,8 @@ class Client:
         :key fail_on_hostname_change: Optional. bool.
                 Responds with HTTP 422 HTTP if target domain name is changed
                 due to redirects. False by default
+        :key deadline: Optional. float. Seconds. Time budget of the call,
+                retries included. `Client.deadline` by default
         :return: bytes
         :raises ConnectionError:
         :raises ScreenshotApiError: Base class for all errors below
@@ -254,13 +385,133 @@ class Client:
         :raises BadRequestError: Server returned 400 or 422 HTTP code
         :raises HttpApiError: HTTP code >= 300 and not equal to above codes
         :raises ParameterError: invalid parameter's value
+        :raises DeadlineExceededError: the deadline expired
         """
 
-        api_credits, cookies, delay, fail_on_hostname_change = [None] * 4
-        full_page, height, image_output_format, image_type = [None] * 4
-        landscape, mobile, mode, no_js, quality, retina, scale = [None] * 7
-        scroll, thumb_width, timeout, touch_screen, ua = [None] * 5
+        deadline = self._start_deadline(kwargs)
+        return self._api_requester.get(
+            self._prepare_payload(kwargs), deadline)
+
+    def get_many(self, specs, workers: int = None, queue_size: int = None,
+                 journal: BatchJournal or str = None,
+                 scheduler: JobScheduler = None,
+                 dedupe: bool or DedupIndex = False):
+        """
+        Capture many screenshots in parallel
+        :param specs: Iterable of capture specs, may be a lazy generator.
+                Each spec is either a URL string or a dict of `get` keyword
+                arguments. Specs with `filename` are written to that file,
+                the others are returned as in `get_raw`
+        :param workers: int: Number of worker threads. 8 by default,
+                or the max limit of the client's `concurrency_limiter`,
+                which then decides how many of them call the API at once
+        :param queue_size: int: Max number of specs taken from `specs` ahead
+                of consumed results. Twice the `workers` by default
+        :param journal: BatchJournal or str: (optional) Journal, or its path,
+                recording finished jobs. Jobs it lists as completed are
+                yielded as skipped, to resume an interrupted batch
+        :param scheduler: JobScheduler: (optional) Runs the specs taken
+                ahead by `priority`, `deadline` and `tenant`, with a cap of
+                captures per domain. Input order by default
+        :param dedupe: bool or DedupIndex: (optional) Send specs with a
+                canonical URL and without default options, and capture
+                equivalent specs once: the other rows get the shared
+                result, with `BatchResult.shared` set to the index of the
+                row captured. Use a `DiskDedupIndex` for very long lists.
+                Disabled by default
+        :return: generator of `BatchResult` in completion order.
+                Errors are not raised, but stored in `BatchResult.error`
+        :raises ValueError: invalid workers or queue size
+        """
+
+        if workers is None:
+            limiter = self._api_requester.concurrency_limiter
+            workers = 8 if limiter is None else limiter.max_limit
+        if queue_size is None and type(workers) is int:
+            queue_size = workers * 2
+
+        return run_batch(
+            self, specs, workers, queue_size, journal, scheduler, dedupe)
+
+    @staticmethod
+    def _set_file_formats(kwargs: dict) -> bool:
+        decode = Client._validate_decode_base64(
+            kwargs.pop('decode_base64', False))
+
+        kwargs['output_format'] = Client._PARSABLE_FORMAT
+        if decode:
+            kwargs['image_output_format'] = Client.BASE64_FORMAT
+        else:
+            kwargs['image_output_format'] = Client._DEFAULT_IMAGE_FORMAT
+
+        return decode
+
+    @staticmethod
+    def _open_atomic(filename: str, hashed: bool = False) -> AtomicFile:
+        try:
+            return AtomicFile(filename, hashed=hashed)
+        except Exception:
+            raise FileError('Cannot open output file')
+
+    def _open_output(self, filename: str,
+                     hashed: bool = False) -> AtomicFile or BlobWriter:
+        # Blob writers always hash the data
+        if self._store is None:
+            return Client._open_atomic(filename, hashed)
+        return self._store.writer(filename)
 
+    @staticmethod
+    def _file_writer(fileobj):
+        def write(chunk: bytes):
+            try:
+                fileobj.write(chunk)
+            except Exception:
+                raise FileError('Cannot write result to file')
+
+        return write
+
+    def _start_deadline(self, kwargs: dict) -> Deadline or None:
+        # Started before validation so that the budget covers the whole call
+        seconds = kwargs.pop('deadline', None)
+        if seconds is None:
+            seconds = self.deadline
+            if seconds is None:
+                return None
+        return Deadline(Client._validate_deadline(seconds))
+
+    def _stream_to(self, payload: dict, fileobj, decode: bool,
+                   deadline: Deadline = None) -> int:
+        write = Client._file_writer(fileobj)
+
+        if not decode:
+            return self._api_requester.stream(payload, write, deadline)
+
+        decoder = Base64StreamDecoder()
+
+        def write_decoded(chunk: bytes):
+            data = decoder.decode(chunk)
+            if data:
+                write(data)
+
+        self._api_requester.stream(payload, write_decoded, deadline)
+        decoder.finish()
+        return decoder.size
+
+    def _prepare_payload(self, kwargs: dict) -> dict:
+        metrics = self._api_requester.metrics
+        hooks = self._api_requester.hooks
+        if not metrics.enabled and hooks is None:
+            return self._validate_call(kwargs)
+
+        start = time.perf_counter()
+        payload = self._validate_call(kwargs)
+        elapsed = time.perf_counter() - start
+        metrics.observe('validate', elapsed)
+        if hooks is not None and hooks.has('on_validate'):
+            hooks.emit('on_validate', redact(payload), elapsed=elapsed)
+        return payload
+
+    def _validate_call(self, kwargs: dict) -> dict:
         if self.api_key == '':
             raise EmptyApiKeyError('')
 
@@ -272,6 +523,28 @@ class Client:
         if not url:
             raise ParameterError('URL required')
 
+        options = kwargs.get('options')
+        if options is None:
+            payload = {'apiKey': self.api_key, 'url': url}
+            payload.update(Client._validate_options(kwargs))
+            return payload
+
+        if not isinstance(options, CaptureOptions):
+            raise ParameterError('Options must be a CaptureOptions instance')
+
+        overrides = {k: v for k, v in kwargs.items()
+                     if k not in Client._CALL_KEYS}
+
+        return options.merge(overrides).payload(
+            self.api_key, url, self._api_key_query)
+
+    @staticmethod
+    def _validate_options(kwargs: dict) -> dict:
+        api_credits, cookies, delay, fail_on_hostname_change = [None] * 4
+        full_page, height, image_output_format, image_type = [None] * 4
+        landscape, mobile, mode, no_js, quality, retina, scale = [None] * 7
+        scroll, thumb_width, timeout, touch_screen, ua = [None] * 5
+
         if 'credits' in kwargs:
             api_credits = Client._validate_credits(kwargs['credits'])
 
@@ -349,15 +622,13 @@ class Client:
             fail_on_hostname_change = Client._validate_fail_on_host_change(
                 kwargs['fail_on_hostname_change'])
 
-        return self._api_requester.get(
-            self._build_payload(
-                self.api_key, url, api_credits, image_output_format,
-                output_format, image_type, quality, width,
-                height, thumb_width, mode, scroll,
-                full_page, no_js, delay, timeout,
-                scale, retina, ua, cookies,
-                mobile, touch_screen, landscape, fail_on_hostname_change
-            )
+        return Client._build_payload(
+            None, None, api_credits, image_output_format,
+            output_format, image_type, quality, width,
+            height, thumb_width, mode, scroll,
+            full_page, no_js, delay, timeout,
+            scale, retina, ua, cookies,
+            mobile, touch_screen, landscape, fail_on_hostname_change
         )
 
     @staticmethod
@@ -435,6 +706,19 @@ class Client:
             f'Credits type must be {Client.SA_CREDITS} '
             f'or {Client.DRS_CREDITS}')
 
+    @staticmethod
+    def _validate_decode_base64(value: bool) -> bool:
+        if type(value) is bool:
+            return value
+
+        raise ParameterError('Base64 decoding must be True or False')
+
+    @staticmethod
+    def _validate_deadline(value: float) -> float:
+        if type(value) in (int, float) and value > 0:
+            return value
+        raise ParameterError('Deadline must be a positive number of seconds')
+
     @staticmethod
     def _validate_delay(value: int) -> int:
         if type(value) is int \
@@ -452,6 +736,13 @@ class Client:
         raise ParameterError(
             'Fail on hostname change mode must be True or False')
 
+    @staticmethod
+    def _validate_filename(value: str) -> str:
+        if type(value) is str and value:
+            return value
+
+        raise ParameterError('Output file name required')
+
     @staticmethod
     def _validate_full_page(value: bool):
         if type(value) is bool:
@@ -616,3 +907,106 @@ class Client:
         raise ParameterError(
             f'Image width must be between {Client.MIN_SIZE} '
             f'and {Client.MAX_SIZE}')
+
+
+class CaptureOptions:
+    """
+    Immutable, hashable set of capture parameters validated once.
+
+    Accepts the same parameters as `Client.get_raw`, except for `url`.
+    Pass it as `options` to reuse it for many URLs: each call then
+    validates only the URL.
+    """
+
+    __slots__ = ('_kwargs', '_payload', '_query', '_key', '_hash',
+                 '_derived')
+
+    _MAX_DERIVED = 16
+
+    def __init__(self, **kwargs):
+        """
+        :raises ParameterError: invalid parameter's value
+        """
+        for key in Client._CALL_KEYS:
+            if key in kwargs:
+                raise ParameterError(
+                    f'Capture options cannot contain {key}')
+
+        payload = Client._validate_options(dict(kwargs))
+        key = tuple(sorted(payload.items()))
+
+        set_slot = object.__setattr__
+        set_slot(self, '_kwargs', dict(kwargs))
+        set_slot(self, '_payload', payload)
+        set_slot(self, '_query', urlencode(payload))
+        set_slot(self, '_key', key)
+        set_slot(self, '_hash', hash(key))
+        set_slot(self, '_derived', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CaptureOptions is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('CaptureOptions is immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, CaptureOptions) and self._key == other._key
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(k, v) for k, v in self._kwargs.items()))
+
+    def as_dict(self) -> dict:
+        """API parameters without `apiKey` and `url`"""
+        return dict(self._payload)
+
+    def replace(self, **kwargs) -> 'CaptureOptions':
+        """Copy with some parameters changed"""
+        merged = dict(self._kwargs)
+        merged.update(kwargs)
+        if 'response_format' in kwargs:
+            merged.pop('output_format', None)
+        elif 'output_format' in kwargs:
+            merged.pop('response_format', None)
+        return CaptureOptions(**merged)
+
+    def merge(self, overrides: dict) -> 'CaptureOptions':
+        """
+        Like `replace`, but reuses the result for the same overrides
+        """
+        if not overrides:
+            return self
+
+        try:
+            key = tuple(sorted(overrides.items()))
+            derived = self._derived.get(key)
+        except TypeError:
+            return self.replace(**overrides)
+
+        if derived is None:
+            derived = self.replace(**overrides)
+            if len(self._derived) < self._MAX_DERIVED:
+                self._derived[key] = derived
+        return derived
+
+    def payload(self, api_key: str, url: str,
+                api_key_query: str = None) -> EncodedPayload:
+        """
+        API parameters for one capture.
+
+        The query string of the options is encoded once, so only the URL
+        is encoded per call.
+        :param api_key_query: str: (optional) Encoded `apiKey=...` part
+        """
+        if api_key_query is None:
+            api_key_query = 'apiKey=' + quote_plus(api_key)
+        query = api_key_query + '&url=' + quote_plus(url)
+        if self._query:
+            query += '&' + self._query
+
+        payload = EncodedPayload(query=query, apiKey=api_key, url=url)
+        payload.update(self._payload)
+        return payload
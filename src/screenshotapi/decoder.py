@@ -0,0 +1,84 @@
+import binascii
+from base64 import b64decode
+
+from .exceptions.error import ResponseError
+
+
+class Base64StreamDecoder:
+    """
+    Incremental decoder for `BASE64_FORMAT` responses.
+
+    Chunks of the response body are decoded as they arrive, so the whole
+    base64 text never has to be kept in memory. An optional data URI
+    prefix (`data:image/jpeg;base64,`) is skipped.
+    """
+
+    _DATA_URI = b'data:'
+    _MAX_PREFIX_LENGTH = 256
+    _WHITESPACE = b' \t\r\n'
+
+    def __init__(self):
+        self._head = b''
+        self._in_body = False
+        self._tail = b''
+        self.size = 0
+
+    def decode(self, chunk: bytes) -> bytes:
+        """
+        Decode the next chunk of the body
+        :return: bytes: The decoded data available so far, may be empty
+        :raises ResponseError: the body is not valid base64
+        """
+        if not self._in_body:
+            chunk = self._skip_prefix(chunk)
+            if chunk is None:
+                return b''
+
+        data = self._tail + chunk
+        if any(c in data for c in self._WHITESPACE):
+            data = data.translate(None, self._WHITESPACE)
+
+        cut = len(data) - len(data) % 4
+        self._tail = data[cut:]
+
+        return self._decode(data[:cut])
+
+    def finish(self):
+        """
+        Check that the whole body has been decoded
+        :raises ResponseError: the body is truncated or is not valid base64
+        """
+        if self._head:
+            raise ResponseError('Invalid data URI in response')
+
+        if self._tail:
+            raise ResponseError('Truncated base64 response')
+
+    def _skip_prefix(self, chunk: bytes) -> bytes or None:
+        self._head += chunk
+        head = self._head
+
+        if len(head) < len(self._DATA_URI) \
+                and self._DATA_URI.startswith(head):
+            return None
+
+        if head.startswith(self._DATA_URI):
+            comma = head.find(b',')
+            if comma < 0:
+                if len(head) > self._MAX_PREFIX_LENGTH:
+                    raise ResponseError('Invalid data URI in response')
+                return None
+            head = head[comma + 1:]
+
+        self._head = b''
+        self._in_body = True
+        return head
+
+    def _decode(self, data: bytes) -> bytes:
+        try:
+            decoded = b64decode(data, validate=True)
+        except binascii.Error:
+            raise ResponseError('Invalid base64 response')
+
+        self.size += len(decoded)
+        return decoded
@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+from .cache.base import payload_key
+
+# Documented API defaults: options set to them are dropped
+_DEFAULTS = {
+    'credits': 'sa',
+    'delay': 250,
+    'height': 600,
+    'image_output_format': 'image',
+    'mode': 'fast',
+    'output_format': 'json',
+    'quality': 85,
+    'scale': 1.0,
+    'timeout': 15000,
+    'type': 'jpg',
+    'width': 800,
+}
+
+# Keys of a batch spec which do not change the screenshot
+_RUN_KEYS = frozenset(('deadline', 'filename', 'priority', 'tenant'))
+
+_BOOL_OPTIONS = frozenset((
+    'decode_base64', 'fail_on_hostname_change', 'full_page', 'landscape',
+    'mobile', 'no_js', 'retina', 'scroll', 'touch_screen'))
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_re_escape = re.compile(r'%([0-9a-fA-F]{2})')
+
+_UNRESERVED = frozenset(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a capture URL: `http://` when the scheme is missing,
+    scheme and host in lowercase, no default port, `/` for an empty path,
+    escapes of unreserved characters decoded and the others in uppercase.
+    The fragment is kept: single-page applications may route on it
+    :raises ValueError: the URL cannot be parsed
+    """
+    text = url.strip()
+    if '://' not in text:
+        text = 'http://' + text
+
+    parts = urlsplit(text)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if ':' in host:
+        host = '[{}]'.format(host)
+
+    netloc = host
+    if parts.port is not None and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc += ':{}'.format(parts.port)
+    if parts.username is not None:
+        userinfo = parts.netloc.rpartition('@')[0]
+        netloc = '{}@{}'.format(userinfo, netloc)
+
+    return urlunsplit((scheme, netloc, _unescape(parts.path) or '/',
+                       _unescape(parts.query), parts.fragment))
+
+
+def canonical_spec(spec: dict) -> dict:
+    """
+    Capture spec with its URL in canonical form and the options that
+    cannot change the screenshot dropped: disabled flags and documented
+    defaults. Values the client would reject are kept as they are, so
+    that the capture still reports them
+    """
+    spec = dict(spec)
+    if 'response_format' in spec:
+        spec['output_format'] = spec.pop('response_format')
+
+    url = spec.get('url')
+    if isinstance(url, str):
+        try:
+            spec['url'] = canonical_url(url)
+        except ValueError:
+            pass
+
+    for name in list(spec):
+        value = spec[name]
+        if name in _BOOL_OPTIONS:
+            if value is False:
+                del spec[name]
+        elif name == 'cookies':
+            if value == {}:
+                del spec[name]
+        elif name in _DEFAULTS:
+            default = _DEFAULTS[name]
+            if isinstance(default, str):
+                if type(value) is str:
+                    value = spec[name] = value.lower()
+                if value == default:
+                    del spec[name]
+            elif type(value) in (int, float) and value == default:
+                del spec[name]
+    return spec
+
+
+def dedup_key(spec: dict) -> str:
+    """
+    Key of the screenshot of a canonical spec: specs with the same key
+    get the same image. Captures to a file and raw captures differ
+    """
+    material = {k: v for k, v in spec.items() if k not in _RUN_KEYS}
+    options = material.get('options')
+    if options is not None and hasattr(options, 'as_dict'):
+        material['options'] = options.as_dict()
+    material['filename'] = 'filename' in spec
+    return payload_key(material)
+
+
+def _unescape(text: str) -> str:
+    def replace(match) -> str:
+        char = chr(int(match.group(1), 16))
+        if char in _UNRESERVED:
+            return char
+        return match.group(0).upper()
+
+    return _re_escape.sub(replace, text)
+
+
+class DedupIndex:
+    """
+    In-memory index of the captures of a batch by `dedup_key`.
+
+    The first row of a key runs the capture, the next rows share its
+    outcome: the file it wrote or its bytes, which stay in memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def claim(self, key: str, index: int) -> int or None:
+        """
+        :return: int: Index of the row which runs the capture of `key`,
+                None if it is `index`, the first row of that key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = (index, False, None, None)
+                return None
+            return entry[0]
+
+    def finish(self, key: str, filename: str = None, data: bytes = None):
+        """Record the outcome of a successful capture"""
+        with self._lock:
+            index = self._entries[key][0]
+            self._entries[key] = (index, True, filename, data)
+
+    def outcome(self, key: str) -> tuple or None:
+        """
+        :return: tuple: (index, filename, data) of a finished capture,
+                None while it runs
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0], entry[2], entry[3]
+
+    def discard(self, key: str):
+        """Forget a failed capture, the next row of its key runs again"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class DiskDedupIndex(DedupIndex):
+    """
+    `DedupIndex` kept in a temporary SQLite file, sorted by key, for
+    input lists whose keys and raw captures do not fit in memory.
+    The file is removed on `close`
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        :param directory: str: (optional) Directory of the index file.
+                The system temporary directory by default
+        :raises OSError: the file cannot be created
+        """
+        super().__init__()
+        fd, self._path = tempfile.mkstemp(
+            prefix='.screenshotapi-dedup.', suffix='.db', dir=directory)
+        os.close(fd)
+        # Durability is pointless for a file dropped with the batch
+        self._db = sqlite3.connect(self._path, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode = OFF')
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute(
+            'CREATE TABLE captures (key BLOB PRIMARY KEY, row INTEGER,'
+            ' done INTEGER, filename TEXT, data BLOB) WITHOUT ROWID')
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def claim(self, key: str, index: int) -> int or None:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT row FROM captures WHERE key = ?',
+                (bytes.fromhex(key),)).fetchone()
+            if row is not None:
+                return row[0]
+            self._db.execute(
+                'INSERT INTO captures VALUES (?, ?, 0, NULL, NULL)',
+                (bytes.fromhex(key), index))
+            return None
+
+    def finish(self, key: str, filename: str = None, data: bytes = None):
+        with self._lock:
+            self._db.execute(
+                'UPDATE captures SET done = 1, filename = ?, data = ?'
+                ' WHERE key = ?', (filename, data, bytes.fromhex(key)))
+
+    def outcome(self, key: str) -> tuple or None:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT row, done, filename, data FROM captures'
+                ' WHERE key = ?', (bytes.fromhex(key),)).fetchone()
+        if row is None or not row[1]:
+            return None
+        return row[0], row[2], row[3]
+
+    def discard(self, key: str):
+        with self._lock:
+            self._db.execute('DELETE FROM captures WHERE key = ?',
+                             (bytes.fromhex(key),))
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                'SELECT 1 FROM captures WHERE key = ?',
+                (bytes.fromhex(key),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM captures').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.close()
+            self._db = None
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
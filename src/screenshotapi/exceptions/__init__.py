@@ -1,6 +1,7 @@
-__all__ = ['ApiAuthError', 'BadRequestError', 'EmptyApiKeyError', 'FileError',
-           'HttpApiError', 'ParameterError', 'ResponseError',
-           'ScreenshotApiError']
+__all__ = ['ApiAuthError', 'BadRequestError', 'DeadlineExceededError',
+           'EmptyApiKeyError', 'FileError', 'HttpApiError', 'ParameterError',
+           'ResponseError', 'ScreenshotApiError']
 
-from .error import ApiAuthError, BadRequestError, EmptyApiKeyError, \
-    FileError, HttpApiError, ParameterError, ResponseError, ScreenshotApiError
+from .error import ApiAuthError, BadRequestError, DeadlineExceededError, \
+    EmptyApiKeyError, FileError, HttpApiError, ParameterError, \
+    ResponseError, ScreenshotApiError
@@ -27,8 +27,9 @@ class EmptyApiKeyError(ScreenshotApiError):
 
 
 class ResponseError(ScreenshotApiError):
-    def __init__(self, message):
+    def __init__(self, message, status_code: int = None):
         self.message = message
+        self.status_code = status_code
         self.parsed_message = None
         try:
             parsed = loads(message)
@@ -58,4 +59,12 @@ class FileError(ScreenshotApiError):
 
 
 class HttpApiError(ScreenshotApiError):
-    pass
+    def __init__(self, message, status_code: int = None,
+                 retry_after: float = None):
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(ScreenshotApiError):
+    """The call did not complete within its deadline, retries included"""
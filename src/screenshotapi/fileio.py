@@ -0,0 +1,124 @@
+import hashlib
+import os
+import secrets
+
+
+class AtomicFile:
+    """
+    Binary file written under a temporary name in the target directory
+    and renamed into place on `commit`.
+
+    Readers never see a partially written file, and a failed download
+    leaves the target untouched.
+    """
+
+    _filename: str
+    _tmp_name: str
+
+    def __init__(self, filename: str, mode: int = 0o666,
+                 hashed: bool = False):
+        """
+        :param filename: str: Target file name
+        :param mode: int: Permission bits, umask applies
+        :param hashed: bool: Compute the SHA-256 digest of the data while
+                it is written, see `digest`
+        :raises OSError: the temporary file cannot be created
+        """
+        self._filename = filename
+        directory, name = os.path.split(os.path.abspath(filename))
+        self._tmp_name = os.path.join(
+            directory, '.{}.{}.tmp'.format(name, secrets.token_hex(4)))
+
+        fd = os.open(self._tmp_name,
+                     os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                     | getattr(os, 'O_BINARY', 0),
+                     mode)
+        self._file = os.fdopen(fd, 'wb')
+        self._digest = hashlib.sha256() if hashed else None
+        self.size = 0
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def digest(self) -> str or None:
+        """SHA-256 hex digest of the data written, None if not hashed"""
+        if self._digest is None:
+            return None
+        return self._digest.hexdigest()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        if self._digest is not None:
+            self._digest.update(data)
+        self.size += len(data)
+        return written
+
+    def commit(self):
+        """Flush the data and atomically replace the target file"""
+        try:
+            self._file.close()
+            os.replace(self._tmp_name, self._filename)
+        except Exception:
+            self.discard()
+            raise
+
+    def discard(self):
+        """Drop the temporary file, the target is not modified"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_name)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+class BufferWriter:
+    """File-like object filling a preallocated writable buffer"""
+
+    def __init__(self, buffer):
+        """
+        :param buffer: Object supporting the writable buffer protocol,
+                e.g. `bytearray`, `memoryview` or `mmap`
+        """
+        self._view = memoryview(buffer).cast('B')
+        self.size = 0
+
+    def write(self, data) -> int:
+        end = self.size + len(data)
+        if end > len(self._view):
+            raise ValueError('Buffer is too small')
+
+        self._view[self.size:end] = data
+        self.size = end
+        return len(data)
+
+
+def file_digest(filename: str, chunk_size: int = 1 << 20) -> tuple:
+    """
+    Size and SHA-256 hex digest of a file
+    :raises OSError: the file cannot be read
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
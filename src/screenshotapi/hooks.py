@@ -0,0 +1,144 @@
+import itertools
+import logging
+import time
+
+REDACTED = '***'
+
+
+def redact(payload: dict) -> dict:
+    """Copy of the payload safe to log, without the API key"""
+    redacted = dict(payload)
+    if 'apiKey' in redacted:
+        redacted['apiKey'] = REDACTED
+    return redacted
+
+
+class HookEvent:
+    """
+    Lifecycle event passed to hooks.
+
+    `call_id` identifies an API call across its events and `attempt`
+    counts its retries from 1. `elapsed` is the time since the attempt
+    started, or the validation time for `on_validate`. `size` is the
+    chunk length for `on_chunk` and the body length for `on_complete`.
+    """
+
+    __slots__ = ('name', 'payload', 'call_id', 'attempt', 'elapsed',
+                 'status_code', 'size', 'error')
+
+    def __init__(self, name: str, payload: dict, call_id: int = None,
+                 attempt: int = None, elapsed: float = 0.0,
+                 status_code: int = None, size: int = None,
+                 error: Exception = None):
+        self.name = name
+        self.payload = payload
+        self.call_id = call_id
+        self.attempt = attempt
+        self.elapsed = elapsed
+        self.status_code = status_code
+        self.size = size
+        self.error = error
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name))
+            for name in self.__slots__
+            if getattr(self, name) is not None))
+
+
+class Hooks:
+    """
+    Callbacks run at each stage of a capture.
+
+    Every callback receives a `HookEvent`. They run synchronously in the
+    calling thread, or in the event loop for `AsyncClient`, so they should
+    be quick. Exceptions raised by callbacks are logged and never
+    interrupt a capture.
+    """
+
+    EVENTS = ('on_validate', 'on_request_start', 'on_connection_acquired',
+              'on_response_headers', 'on_chunk', 'on_complete', 'on_error')
+
+    __logger = logging.getLogger('screenshotapi-hooks')
+    _ids = itertools.count(1)
+
+    def __init__(self, **kwargs):
+        """
+        :key on_validate: callable or list: (optional) Parameters checked
+        :key on_request_start: callable or list: (optional) Request about
+                to be sent, after the rate limiter
+        :key on_connection_acquired: callable or list: (optional)
+                Connection taken from the pool or opened
+        :key on_response_headers: callable or list: (optional) Status and
+                headers received
+        :key on_chunk: callable or list: (optional) Part of the body
+                received
+        :key on_complete: callable or list: (optional) Body received
+        :key on_error: callable or list: (optional) Attempt failed
+        :raises ValueError: unknown event or callback is not callable
+        """
+        self._callbacks = {name: [] for name in Hooks.EVENTS}
+        for name, value in kwargs.items():
+            callbacks = value if isinstance(value, (list, tuple)) else [value]
+            for callback in callbacks:
+                self.add(name, callback)
+
+    def add(self, name: str, callback):
+        if name not in self._callbacks:
+            raise ValueError('Unknown hook: {}'.format(name))
+        if not callable(callback):
+            raise ValueError('Hook callback should be callable')
+        self._callbacks[name].append(callback)
+
+    def remove(self, name: str, callback):
+        if name in self._callbacks and callback in self._callbacks[name]:
+            self._callbacks[name].remove(callback)
+
+    def has(self, name: str) -> bool:
+        return bool(self._callbacks.get(name))
+
+    def emit(self, name: str, payload: dict, **fields):
+        callbacks = self._callbacks[name]
+        if not callbacks:
+            return
+
+        event = HookEvent(name, payload, **fields)
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception:
+                Hooks.__logger.exception('Hook %s failed', name)
+
+    def start_call(self, payload: dict) -> 'HookCall':
+        return HookCall(self, redact(payload), next(Hooks._ids))
+
+
+class HookCall:
+    """Events of one API call, through its retries"""
+
+    __slots__ = ('_hooks', 'payload', 'call_id', 'attempt', '_started')
+
+    def __init__(self, hooks: Hooks, payload: dict, call_id: int):
+        self._hooks = hooks
+        self.payload = payload
+        self.call_id = call_id
+        self.attempt = 0
+        self._started = time.perf_counter()
+
+    def start_attempt(self):
+        self.attempt += 1
+        self._started = time.perf_counter()
+        self.emit('on_request_start')
+
+    def emit(self, name: str, **fields):
+        if not self._hooks.has(name):
+            return
+        self._hooks.emit(
+            name, self.payload, call_id=self.call_id, attempt=self.attempt,
+            elapsed=time.perf_counter() - self._started, **fields)
+
+    def has(self, name: str) -> bool:
+        return self._hooks.has(name)
+
+    def connection_acquired(self):
+        self.emit('on_connection_acquired')
@@ -0,0 +1,232 @@
+import os
+import threading
+
+_HEADER = b'screenshotapi-journal 1\n'
+_ESCAPES = (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'))
+
+
+def _escape(text: str) -> str:
+    for char, escaped in _ESCAPES:
+        text = text.replace(char, escaped)
+    return text
+
+
+def _unescape(text: str) -> str:
+    if '\\' not in text:
+        return text
+    chars, i = [], 0
+    while i < len(text):
+        if text[i] == '\\' and i + 1 < len(text):
+            chars.append({'t': '\t', 'n': '\n', 'r': '\r'}.get(
+                text[i + 1], text[i + 1]))
+            i += 2
+        else:
+            chars.append(text[i])
+            i += 1
+    return ''.join(chars)
+
+
+class JournalEntry:
+    """Last recorded outcome of a job"""
+
+    __slots__ = ('key', 'status', 'size', 'checksum', 'path', 'error')
+
+    OK = 'ok'
+    ERROR = 'error'
+
+    def __init__(self, key: str, status: str, size: int = 0,
+                 checksum: str = '', path: str = '', error: str = ''):
+        self.key = key
+        self.status = status
+        self.size = size
+        self.checksum = checksum
+        self.path = path
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status == JournalEntry.OK
+
+    def __repr__(self):
+        return '{}(key={!r}, status={!r})'.format(
+            self.__class__.__name__, self.key, self.status)
+
+
+class BatchJournal:
+    """
+    Append-only record of finished batch jobs, to resume interrupted runs.
+
+    Each line holds the job key, status, output size, SHA-256 checksum
+    and output path or error. Records are written and fsynced by
+    a background thread in groups, every `sync_interval` seconds or
+    `sync_every` records, so captures never wait for the disk; a crash
+    loses at most the last group, whose jobs are then run again.
+
+    The journal is loaded into an in-memory index on open. A torn last
+    line left by a crash is dropped.
+    """
+
+    def __init__(self, path: str, sync_interval: float = 0.2,
+                 sync_every: int = 1024, fsync: bool = True):
+        """
+        :param path: str: Journal file, created if missing
+        :param sync_interval: float: Max seconds between group commits
+        :param sync_every: int: Records triggering an early commit
+        :param fsync: bool: Flush the records to the disk, not only to
+                the OS
+        :raises OSError: the journal cannot be read or created
+        """
+        if sync_interval <= 0 or type(sync_every) is not int \
+                or sync_every < 1:
+            raise ValueError('Invalid journal sync parameters')
+
+        self.path = path
+        self._sync_interval = sync_interval
+        self._sync_every = sync_every
+        self._fsync = fsync
+        self._index = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._error = None
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT
+                           | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            self._load()
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+        self._thread = threading.Thread(
+            target=self._run, name='screenshotapi-journal', daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: str) -> JournalEntry or None:
+        return self._index.get(key)
+
+    def is_done(self, key: str, verify: bool = True) -> bool:
+        """
+        True if the job completed
+        :param verify: bool: Also check that the output file still exists
+                with the recorded size
+        """
+        entry = self._index.get(key)
+        if entry is None or not entry.ok:
+            return False
+        if not verify or not entry.path:
+            return True
+        try:
+            return os.stat(entry.path).st_size == entry.size
+        except OSError:
+            return False
+
+    def record(self, entry: JournalEntry):
+        """Add a record, written by the next group commit"""
+        line = '\t'.join((
+            entry.status, entry.key, str(entry.size), entry.checksum,
+            _escape(entry.path), _escape(entry.error))) + '\n'
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Journal is closed')
+            if self._error is not None:
+                raise self._error
+            self._index[entry.key] = entry
+            self._pending.append(line.encode('utf-8'))
+            if len(self._pending) >= self._sync_every:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Write and sync the pending records now"""
+        self._commit()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        try:
+            self._commit()
+        finally:
+            os.close(self._fd)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _load(self):
+        chunks = []
+        while True:
+            chunk = os.read(self._fd, 1 << 20)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = b''.join(chunks)
+
+        if not data:
+            os.write(self._fd, _HEADER)
+            return
+        if not data.startswith(_HEADER):
+            if _HEADER.startswith(data):
+                # Crashed while writing the header
+                os.ftruncate(self._fd, 0)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _HEADER)
+                return
+            raise OSError('Not a batch journal: {}'.format(self.path))
+
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            os.ftruncate(self._fd, end)
+            os.lseek(self._fd, end, os.SEEK_SET)
+
+        index = self._index
+        for line in data[len(_HEADER):end].decode('utf-8').split('\n'):
+            fields = line.split('\t')
+            if len(fields) != 6:
+                continue
+            status, key, size, checksum, path, error = fields
+            index[key] = JournalEntry(
+                key, status, int(size or 0), checksum,
+                _unescape(path), _unescape(error))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._wakeup.wait(self._sync_interval)
+            try:
+                self._commit()
+            except OSError as error:
+                # Reported to the next `record` call
+                self._error = error
+
+    def _commit(self):
+        # Records are taken under the I/O lock so that groups are written
+        # in order, `record` only waits for the swap of the list
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            view = memoryview(b''.join(pending))
+            while view:
+                view = view[os.write(self._fd, view):]
+            if self._fsync:
+                os.fsync(self._fd)
@@ -0,0 +1,6 @@
+__all__ = ['Counter', 'Exporter', 'Gauge', 'Histogram', 'Metrics',
+           'NULL_METRICS', 'NullMetrics', 'PrometheusExporter']
+
+from .base import Counter, Exporter, Gauge, Histogram, Metrics, \
+    NULL_METRICS, NullMetrics
+from .prometheus import PrometheusExporter
@@ -0,0 +1,230 @@
+import bisect
+import threading
+
+
+class Counter:
+    """Thread-safe monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, value: float = 1, *labels):
+        """Add `value`, `labels` are given in the `label_names` order"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> list:
+        """List of (labels, value) tuples"""
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Gauge(Counter):
+    """Thread-safe value that goes up and down, with optional labels"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Thread-safe histogram with cumulative buckets and optional labels"""
+
+    kind = 'histogram'
+
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                       0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        if not buckets or list(buckets) != sorted(buckets):
+            raise ValueError('Buckets should be a sorted sequence')
+
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        """Record `value`, `labels` are given in the `label_names` order"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts, then +Inf, sum and count
+                entry = self._values[labels] = \
+                    [0] * (len(self.buckets) + 1) + [0.0, 0]
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[-1] if entry else 0
+
+    def total(self, *labels) -> float:
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[-2] if entry else 0.0
+
+    def samples(self) -> list:
+        """
+        List of (labels, cumulative bucket counts, sum, count) tuples,
+        the last bucket count is the +Inf one
+        """
+        with self._lock:
+            items = sorted((labels, list(entry))
+                           for labels, entry in self._values.items())
+
+        samples = []
+        for labels, entry in items:
+            cumulative, running = [], 0
+            for n in entry[:-2]:
+                running += n
+                cumulative.append(running)
+            samples.append((labels, cumulative, entry[-2], entry[-1]))
+        return samples
+
+
+class Metrics:
+    """
+    Capture metrics: per-phase latencies, responses and errors.
+
+    Phases are `validate` (parameter checks), `queue` (rate limiter wait),
+    `pool_wait` (waiting for a free connection), `connect`, `tls`,
+    `ttfb` (request sent to response headers), `download` (response body)
+    and `total` (one API call including retries).
+    """
+
+    enabled = True
+
+    def __init__(self, prefix: str = 'screenshotapi',
+                 buckets: tuple = Histogram.DEFAULT_BUCKETS):
+        """
+        :param prefix: str: Prefix of the metric names
+        :param buckets: tuple: Upper bounds of the latency buckets, seconds
+        """
+        self.phase_seconds = Histogram(
+            prefix + '_phase_seconds', 'Time spent per capture phase',
+            ('phase',), buckets)
+        self.responses = Counter(
+            prefix + '_responses_total', 'API responses by HTTP status',
+            ('status',))
+        self.errors = Counter(
+            prefix + '_errors_total', 'Failed API calls by error class',
+            ('error',))
+        self.response_bytes = Counter(
+            prefix + '_response_bytes_total', 'Response body bytes received')
+        self.concurrency_limit = Gauge(
+            prefix + '_concurrency_limit',
+            'API calls allowed in flight by the adaptive limiter')
+        self.in_flight = Gauge(
+            prefix + '_in_flight', 'API calls in flight')
+        self.hedges = Counter(
+            prefix + '_hedges_total',
+            'Hedged API calls: duplicates sent, won or denied by the budget',
+            ('outcome',))
+
+    def observe(self, phase: str, seconds: float):
+        self.phase_seconds.observe(seconds, phase)
+
+    def observe_request(self, pool_wait: float, connect: float, tls: float,
+                        headers: float):
+        """
+        Record the phases of a request that got its response headers
+        `headers` seconds after it was sent
+        """
+        self.phase_seconds.observe(pool_wait, 'pool_wait')
+        if connect:
+            self.phase_seconds.observe(connect, 'connect')
+        if tls:
+            self.phase_seconds.observe(tls, 'tls')
+        self.phase_seconds.observe(
+            max(0.0, headers - pool_wait - connect - tls), 'ttfb')
+
+    def response(self, status: int, size: int = 0):
+        self.responses.inc(1, str(status))
+        if size:
+            self.response_bytes.inc(size)
+
+    def error(self, error: BaseException):
+        self.errors.inc(1, type(error).__name__)
+
+    def concurrency(self, limit: int, in_flight: int):
+        """Record the state of an `AdaptiveLimiter`"""
+        self.concurrency_limit.set(limit)
+        self.in_flight.set(in_flight)
+
+    def hedge(self, outcome: str):
+        """Count a duplicate call `sent`, `won` or `denied`"""
+        self.hedges.inc(1, outcome)
+
+    def collect(self) -> list:
+        """All the instruments, for exporters"""
+        return [self.phase_seconds, self.responses, self.errors,
+                self.response_bytes, self.concurrency_limit, self.in_flight,
+                self.hedges]
+
+    def export(self, exporter):
+        """Pass the instruments to an `Exporter`"""
+        return exporter.export(self.collect())
+
+
+class NullMetrics(Metrics):
+    """Disabled metrics, every call is a no-op"""
+
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def observe(self, phase: str, seconds: float):
+        pass
+
+    def observe_request(self, pool_wait: float, connect: float, tls: float,
+                        headers: float):
+        pass
+
+    def response(self, status: int, size: int = 0):
+        pass
+
+    def error(self, error: BaseException):
+        pass
+
+    def concurrency(self, limit: int, in_flight: int):
+        pass
+
+    def hedge(self, outcome: str):
+        pass
+
+    def collect(self) -> list:
+        return []
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Exporter:
+    """Base class of metric exporters"""
+
+    def export(self, instruments: list):
+        """
+        :param instruments: list: `Counter`, `Gauge` and `Histogram`
+                objects
+        """
+        raise NotImplementedError
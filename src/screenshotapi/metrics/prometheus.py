@@ -0,0 +1,71 @@
+from .base import Exporter
+from ..fileio import AtomicFile
+
+
+class PrometheusExporter(Exporter):
+    """
+    Renders metrics in the Prometheus text exposition format.
+
+    No HTTP server is needed: `export` returns the text and, given a
+    `path`, also writes it atomically, e.g. for the node_exporter textfile
+    collector.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: str: (optional) File to write on every export
+        """
+        self.path = path
+
+    def export(self, instruments: list) -> str:
+        text = self.render(instruments)
+        if self.path is not None:
+            with AtomicFile(self.path, 0o644) as file:
+                file.write(text.encode('utf-8'))
+        return text
+
+    @staticmethod
+    def render(instruments: list) -> str:
+        lines = []
+        for instrument in instruments:
+            lines.append('# HELP {} {}'.format(
+                instrument.name, _escape(instrument.help)))
+            lines.append('# TYPE {} {}'.format(
+                instrument.name, instrument.kind))
+
+            names = instrument.label_names
+            if instrument.kind in ('counter', 'gauge'):
+                for labels, value in instrument.samples():
+                    lines.append('{}{} {}'.format(
+                        instrument.name, _labels(names, labels),
+                        _number(value)))
+                continue
+
+            bounds = [_number(b) for b in instrument.buckets] + ['+Inf']
+            for labels, buckets, total, count in instrument.samples():
+                for bound, value in zip(bounds, buckets):
+                    lines.append('{}_bucket{} {}'.format(
+                        instrument.name,
+                        _labels(names + ('le',), labels + (bound,)), value))
+                lines.append('{}_sum{} {}'.format(
+                    instrument.name, _labels(names, labels), _number(total)))
+                lines.append('{}_count{} {}'.format(
+                    instrument.name, _labels(names, labels), count))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, _escape(str(value)))
+        for name, value in zip(names, values)) + '}'
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n') \
+        .replace('"', r'\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -12,3 +12,17 @@ class ImageFormat:
     @staticmethod
     def values() -> list:
         return [ImageFormat.__dict__[k] for k in ImageFormat.keys()]
+
+
+class EncodedPayload(dict):
+    """
+    API parameters along with their URL-encoded query string.
+
+    The query string is sent as is, without encoding the parameters again.
+    """
+
+    query: str
+
+    def __init__(self, *args, query: str = '', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query = query
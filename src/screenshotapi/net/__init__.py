@@ -1,3 +1,16 @@
-__all__ = ['ApiRequester']
+__all__ = ['AdaptiveLimiter', 'ApiRequester', 'AsyncApiRequester',
+           'BaseApiRequester', 'ConnectionPool', 'Deadline', 'FakeTransport',
+           'HedgePolicy', 'Http2Transport', 'RateLimiter', 'RequestsTransport',
+           'RetryBudget', 'RetryPolicy', 'Transport']
 
+from .async_http import AsyncApiRequester
+from .concurrency import AdaptiveLimiter
+from .deadline import Deadline
+from .hedge import HedgePolicy
 from .http import ApiRequester
+from .http2 import Http2Transport
+from .pool import ConnectionPool
+from .ratelimit import RateLimiter
+from .requester import BaseApiRequester
+from .retry import RetryBudget, RetryPolicy
+from .transport import FakeTransport, RequestsTransport, Transport
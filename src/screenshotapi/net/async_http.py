@@ -0,0 +1,446 @@
+from .coalesce import AsyncSingleFlight
+from .concurrency import AdaptiveLimiter
+from .deadline import Deadline
+from .http import ApiRequester, CacheFiller
+from .pool import PhaseTrace
+from .requester import BaseApiRequester
+from ..cache.base import payload_key
+from ..exceptions.error import HttpApiError
+from ..hooks import HookCall
+from ..version import VERSION, LIBRARY_NAME
+import asyncio
+import functools
+import logging
+import time
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
+
+
+class AsyncApiRequester(BaseApiRequester):
+    __logger = logging.getLogger('async-api-requester')
+    __connect_timeout = 10
+    __user_agent = '{name}/{ver}'.format(name=LIBRARY_NAME, ver=VERSION)
+    _single_flight: AsyncSingleFlight or None
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: Parameters of `BaseApiRequester`, and:
+        - connector: (optional) shared `aiohttp.BaseConnector`
+        - pool_size: (optional) max number of open connections; int
+        - keep_alive: (optional) reuse connections between calls; bool
+        - idle_timeout: (optional) seconds before idle connections
+          are dropped; float
+        - coalesce: (optional) share one API call between concurrent
+          identical requests; bool
+
+        The `connect` phase of the metrics includes the TLS handshake
+        """
+        if aiohttp is None:
+            raise ImportError(
+                'aiohttp is required for asynchronous requests. '
+                'Install it with `pip install screenshot-api[async]`')
+
+        super().__init__(**kwargs)
+        if kwargs.get('coalesce'):
+            self._single_flight = AsyncSingleFlight()
+        self._session = None
+        self._connector = kwargs.get('connector')
+        self._owns_connector = self._connector is None
+        self._pool_size = kwargs.get('pool_size', 100)
+        self._keep_alive = kwargs.get('keep_alive', True)
+        self._idle_timeout = kwargs.get('idle_timeout', 60.0)
+
+    async def get(self, payload: dict, deadline: Deadline = None) -> bytes:
+        """
+        :param payload: dict: Query parameters
+        :param deadline: Deadline: (optional) Time budget of the call,
+                `deadline` seconds from now by default
+        :return: bytes: Response body
+        """
+        deadline = self._start_deadline(deadline)
+        if self._cache is None and self._single_flight is None:
+            return await self._fetch(payload, deadline)
+
+        key = payload_key(payload)
+        if self._single_flight is None:
+            return await self._get_cached(key, payload, deadline)
+
+        return await self._single_flight.do(
+            key, lambda: self._get_cached(key, payload, deadline),
+            deadline)
+
+    async def _get_cached(self, key: str, payload: dict,
+                          deadline: Deadline or None) -> bytes:
+        if self._cache is None:
+            return await self._fetch(payload, deadline)
+
+        body = await self._cache_call(self._cache.get, key)
+        if body is not None:
+            return body
+
+        body = await self._fetch(payload, deadline)
+        try:
+            await self._cache_call(self._cache.set, key, body)
+        except OSError as error:
+            AsyncApiRequester.__logger.warning(
+                'Cannot cache response: %s', error)
+        return body
+
+    async def _cache_call(self, func, *args):
+        # Disk reads, writes and fsync would stall the event loop
+        if not self._cache.blocking:
+            return func(*args)
+        return await asyncio.get_event_loop().run_in_executor(
+            None, func, *args)
+
+    async def stream(self, payload: dict, write,
+                     deadline: Deadline = None) -> int:
+        """
+        Pass the response body to `write` chunk by chunk
+        :param payload: dict: Query parameters
+        :param write: coroutine function: Awaited with each chunk of the body
+        :param deadline: Deadline: (optional) Time budget of the call,
+                `deadline` seconds from now by default
+        :return: int: Number of bytes received
+        """
+        deadline = self._start_deadline(deadline)
+        if self._cache is None:
+            return await self._fetch_stream(payload, write, deadline)
+
+        key = payload_key(payload)
+        body = await self._cache_call(self._cache.get, key)
+        if body is not None:
+            for i in range(0, len(body), self.chunk_size):
+                await write(body[i:i + self.chunk_size])
+            return len(body)
+
+        filler = await self._cache_call(
+            CacheFiller, self._cache, key, AsyncApiRequester.__logger)
+
+        async def write_through(chunk: bytes):
+            await write(chunk)
+            await self._cache_call(filler.write, chunk)
+
+        try:
+            size = await self._fetch_stream(
+                payload, write_through, deadline)
+        except BaseException:
+            await self._cache_call(filler.discard)
+            raise
+        await self._cache_call(filler.commit)
+        return size
+
+    async def _fetch(self, payload: dict,
+                     deadline: Deadline or None) -> bytes:
+        if self._hedge is not None:
+            return await self._hedge.run_async(
+                lambda fork: self._fetch_once(payload, fork),
+                deadline, self._metrics)
+        return await self._fetch_once(payload, deadline)
+
+    async def _fetch_once(self, payload: dict,
+                          deadline: Deadline or None) -> bytes:
+        call = self._start_call(payload)
+        return await self._measured(
+            lambda: self._send(payload, call, deadline), None, deadline)
+
+    async def _fetch_stream(self, payload: dict, write,
+                            deadline: Deadline or None) -> int:
+        call = self._start_call(payload)
+        started = []
+
+        async def tracked_write(chunk: bytes):
+            if not started:
+                started.append(True)
+            await write(chunk)
+
+        return await self._measured(
+            lambda: self._send_stream(payload, tracked_write, call, deadline),
+            lambda: not started,
+            deadline
+        )
+
+    async def _measured(self, send, can_retry=None,
+                        deadline: Deadline = None):
+        if not self._metrics.enabled:
+            return await self._with_retries(send, can_retry, deadline)
+        with self._measure(deadline):
+            return await self._with_retries(send, can_retry, deadline)
+
+    async def _with_retries(self, send, can_retry=None,
+                            deadline: Deadline = None):
+        if self._concurrency_limiter is not None:
+            send = functools.partial(self._limited, send, deadline)
+        if deadline is not None:
+            send = functools.partial(self._bounded, send, deadline)
+
+        retry = self._retry
+        if retry is None:
+            return await send()
+
+        retry.on_request()
+        attempt = 0
+        while True:
+            try:
+                return await send()
+            except HttpApiError as error:
+                failure = error
+                delay = retry.retry_delay(
+                    attempt, error.status_code, error.retry_after)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError) as error:
+                failure = error
+                delay = retry.retry_delay(
+                    attempt,
+                    read_timeout=AsyncApiRequester._is_read_timeout(error))
+
+            if delay is None or (can_retry is not None and not can_retry()):
+                raise failure
+            # No retry that would end past the deadline
+            if deadline is not None and delay >= deadline.remaining():
+                raise failure
+
+            AsyncApiRequester.__logger.debug(
+                'Retrying in %.2fs after: %s', delay, failure)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def _bounded(send, deadline: Deadline):
+        """Report the timeouts caused by the deadline as such"""
+        try:
+            return await send()
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                asyncio.TimeoutError) as error:
+            if deadline.expired:
+                raise deadline.error('waiting for the API') from error
+            raise
+
+    async def _limited(self, send, deadline: Deadline or None):
+        """Run one attempt in a slot of the concurrency limiter"""
+        limiter = self._concurrency_limiter
+        if deadline is None:
+            token = await limiter.acquire_async()
+        else:
+            token = await deadline.wait_for(
+                limiter.acquire_async(), 'waiting for a concurrency slot')
+        self._metrics.concurrency(limiter.limit, limiter.in_flight)
+
+        outcome = AdaptiveLimiter.IGNORE
+        try:
+            result = await send()
+            outcome = AdaptiveLimiter.SUCCESS
+            return result
+        except HttpApiError as error:
+            if ApiRequester._is_overload(error.status_code):
+                outcome = AdaptiveLimiter.OVERLOAD
+            raise
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                asyncio.TimeoutError):
+            outcome = AdaptiveLimiter.OVERLOAD
+            raise
+        finally:
+            limiter.release(token, outcome)
+            self._metrics.concurrency(limiter.limit, limiter.in_flight)
+
+    async def _send(self, payload: dict, call: HookCall = None,
+                    deadline: Deadline = None) -> bytes:
+        try:
+            async with await self._request(
+                    payload, call, deadline) as response:
+                start = time.perf_counter()
+                if call is None or not call.has('on_chunk'):
+                    body = await response.read()
+                else:
+                    chunks = []
+                    async for chunk in response.content.iter_chunked(
+                            self.chunk_size):
+                        chunks.append(chunk)
+                        call.emit('on_chunk', size=len(chunk))
+                    body = b''.join(chunks)
+                self._record_body(response.status, len(body), start, call)
+                if 200 <= response.status < 300:
+                    return body
+
+                ApiRequester._raise_for_status(
+                    response.status, body.decode('utf-8', 'replace'),
+                    response.headers.get('Retry-After'))
+        except Exception as error:
+            if call is not None:
+                call.emit('on_error', error=error)
+            raise
+
+    async def _send_stream(self, payload: dict, write, call: HookCall = None,
+                           deadline: Deadline = None) -> int:
+        try:
+            async with await self._request(
+                    payload, call, deadline) as response:
+                if not 200 <= response.status < 300:
+                    body = await response.read()
+                    self._record_body(response.status, 0, None, call)
+                    ApiRequester._raise_for_status(
+                        response.status, body.decode('utf-8', 'replace'),
+                        response.headers.get('Retry-After'))
+
+                start = time.perf_counter()
+                size = 0
+                async for chunk in response.content.iter_chunked(
+                        self.chunk_size):
+                    await write(chunk)
+                    size += len(chunk)
+                    if call is not None:
+                        call.emit('on_chunk', size=len(chunk))
+                self._record_body(response.status, size, start, call)
+                return size
+        except Exception as error:
+            if call is not None:
+                call.emit('on_error', error=error)
+            raise
+
+    async def _request(self, payload: dict, call: HookCall = None,
+                       deadline: Deadline = None):
+        """Send a GET request, the body is left to be read"""
+        metrics = self._metrics
+        if self._rate_limiter is not None:
+            start = time.perf_counter()
+            if deadline is None:
+                await self._rate_limiter.acquire_async()
+            elif not await self._rate_limiter.acquire_async(
+                    deadline.wait_time()):
+                raise deadline.error('waiting for the rate limiter')
+            if metrics.enabled:
+                metrics.observe('queue', time.perf_counter() - start)
+
+        if call is not None:
+            call.start_attempt()
+
+        url, params = self._target(payload)
+        trace = PhaseTrace(call and call.connection_acquired)
+        start = time.perf_counter()
+        response = await self._get_session().get(
+            url,
+            params=params,
+            timeout=self._client_timeout(payload, deadline),
+            trace_request_ctx=trace
+        )
+        if metrics.enabled:
+            metrics.observe_request(trace.pool_wait, trace.connect, 0.0,
+                                    time.perf_counter() - start)
+        if call is not None:
+            call.emit('on_response_headers', status_code=response.status)
+        return response
+
+    def _record_body(self, status: int, size: int, start: float or None,
+                     call: HookCall = None):
+        metrics = self._metrics
+        if metrics.enabled:
+            if start is not None:
+                metrics.observe('download', time.perf_counter() - start)
+            metrics.response(status, size)
+        if call is not None and 200 <= status < 300:
+            call.emit('on_complete', status_code=status, size=size)
+
+    async def close(self):
+        """Close the session and, unless it is shared, the connector"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # The session has to be created inside a running event loop
+        if self._session is None or self._session.closed:
+            connector = self._connector
+            if connector is None:
+                connector = aiohttp.TCPConnector(
+                    limit=self._pool_size,
+                    force_close=not self._keep_alive,
+                    keepalive_timeout=(
+                        self._idle_timeout if self._keep_alive else None)
+                )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                connector_owner=self._owns_connector,
+                headers={'User-Agent': AsyncApiRequester.__user_agent},
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=(
+                    [_trace_config()]
+                    if self._metrics.enabled or self._hooks is not None
+                    else None)
+            )
+        return self._session
+
+    def _client_timeout(self, payload: dict, deadline: Deadline or None):
+        connect_timeout = AsyncApiRequester.__connect_timeout
+        read_timeout = self.read_timeout(payload)
+        if deadline is None:
+            return aiohttp.ClientTimeout(
+                sock_connect=connect_timeout, sock_read=read_timeout)
+
+        # `total` also bounds the wait for a connection and the download
+        return aiohttp.ClientTimeout(
+            total=deadline.limit(None),
+            sock_connect=deadline.limit(connect_timeout),
+            sock_read=deadline.limit(read_timeout)
+        )
+
+    @staticmethod
+    def _is_read_timeout(error: Exception) -> bool:
+        # Connect timeouts are connection errors, the others mean that
+        # the API did not answer in time
+        connect_timeout = getattr(aiohttp, 'ConnectionTimeoutError', None)
+        if connect_timeout is not None and isinstance(error, connect_timeout):
+            return False
+        return isinstance(error, asyncio.TimeoutError)
+
+    def _target(self, payload: dict) -> tuple:
+        # Pre-encoded payloads skip the encoding of the parameters
+        query = getattr(payload, 'query', None)
+        if query:
+            return yarl.URL(self.base_url + '?' + query, encoded=True), None
+        return self.base_url, self._stringify(payload)
+
+    @staticmethod
+    def _stringify(payload: dict) -> dict:
+        # aiohttp refuses bool query values, `requests` sends them as text
+        return {k: str(v) for k, v in payload.items()}
+
+
+def _trace_config():
+    """
+    Times connection waits and connects into the request's PhaseTrace
+    and reports acquired connections
+    """
+
+    async def on_queued_start(session, context, params):
+        context.queued = time.perf_counter()
+
+    async def on_queued_end(session, context, params):
+        context.trace_request_ctx.pool_wait += \
+            time.perf_counter() - context.queued
+
+    async def on_create_start(session, context, params):
+        context.connecting = time.perf_counter()
+
+    async def on_create_end(session, context, params):
+        trace = context.trace_request_ctx
+        trace.connect += time.perf_counter() - context.connecting
+        if trace.on_acquired is not None:
+            trace.on_acquired()
+
+    async def on_reuse(session, context, params):
+        trace = context.trace_request_ctx
+        if trace.on_acquired is not None:
+            trace.on_acquired()
+
+    config = aiohttp.TraceConfig()
+    config.on_connection_queued_start.append(on_queued_start)
+    config.on_connection_queued_end.append(on_queued_end)
+    config.on_connection_create_start.append(on_create_start)
+    config.on_connection_create_end.append(on_create_end)
+    config.on_connection_reuseconn.append(on_reuse)
+    return config
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+from .deadline import Deadline
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key.
+
+    While a call is in flight, other callers with the same key wait for it
+    and receive its result or its exception instead of repeating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, func, deadline: Deadline = None):
+        """
+        Run `func()` unless a call with `key` is already in flight
+        :param deadline: Deadline: (optional) Time budget of this caller,
+                which stops waiting for a call in flight once it is spent
+        :return: The result of `func()`
+        :raises: The exception raised by `func()`
+        :raises DeadlineExceededError: the call in flight did not finish
+                within `deadline`
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            timeout = None if deadline is None else deadline.wait_time()
+            if not call.done.wait(timeout):
+                raise deadline.error('waiting for a coalesced call')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio counterpart of `SingleFlight`.
+
+    The call runs in its own task: a cancelled caller, the first one
+    included, does not cancel it for the others. It is only cancelled
+    when no caller waits for it anymore.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, func, deadline: Deadline = None):
+        """
+        Await `func()` unless a call with `key` is already in flight
+        :param deadline: Deadline: (optional) Time budget of this caller
+        :return: The result of `func()`
+        :raises: The exception raised by `func()`
+        :raises DeadlineExceededError: the call did not finish within
+                `deadline`
+        """
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(func()))
+            flight.task.add_done_callback(
+                lambda task: self._finished(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            if deadline is None:
+                return await asyncio.shield(flight.task)
+            return await deadline.wait_for(asyncio.shield(flight.task),
+                                           'waiting for a coalesced call')
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+    def _finished(self, key, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        if not flight.task.cancelled():
+            # Avoid "exception was never retrieved" without waiters
+            flight.task.exception()
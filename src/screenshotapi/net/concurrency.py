@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import threading
+import time
+
+
+class AdaptiveLimiter:
+    """
+    Thread-safe AIMD (additive increase, multiplicative decrease) limit of
+    the API calls in flight.
+
+    While calls succeed, the limit grows by `increase` per round trip,
+    i.e. `increase / limit` per call, as long as the limit is actually
+    used. It is multiplied by `decrease` on overload signals: 429 and 5xx
+    responses, timeouts, connection failures and latency spikes, when
+    the short-term average latency exceeds `latency_tolerance` times the
+    long-term one. Calls started before a cut cannot cut the limit again,
+    so that a burst of failures counts as a single signal.
+
+    Callers beyond the limit wait for a slot, threads and coroutines alike.
+    """
+
+    SUCCESS = 'success'
+    OVERLOAD = 'overload'
+    IGNORE = 'ignore'
+
+    _SHORT_WEIGHT = 0.25
+    _LONG_WEIGHT = 0.02
+
+    def __init__(self, initial: int = 4, min_limit: int = 1,
+                 max_limit: int = 64, increase: float = 1.0,
+                 decrease: float = 0.5, latency_tolerance: float = 2.0,
+                 warmup: int = 10):
+        """
+        :param initial: int: Limit to start with. 4 by default
+        :param min_limit: int: Lowest limit. 1 by default
+        :param max_limit: int: Highest limit. 64 by default
+        :param increase: float: Limit added per round trip. 1 by default
+        :param decrease: float: Limit factor on overload, in (0, 1).
+                0.5 by default
+        :param latency_tolerance: float: Latency spike threshold, relative
+                to the long-term average latency. 2 by default
+        :param warmup: int: Calls completed before latency spikes are
+                detected. 10 by default
+        """
+        if type(min_limit) is not int or min_limit < 1:
+            raise ValueError('Min limit should be a positive integer')
+        if type(max_limit) is not int or max_limit < min_limit:
+            raise ValueError('Max limit should be at least the min limit')
+        if type(initial) is not int \
+                or not min_limit <= initial <= max_limit:
+            raise ValueError('Initial limit should be in [min, max]')
+        if increase <= 0:
+            raise ValueError('Increase should be positive')
+        if not 0 < decrease < 1:
+            raise ValueError('Decrease should be in (0, 1)')
+        if latency_tolerance <= 1:
+            raise ValueError('Latency tolerance should be greater than 1')
+
+        self._min = min_limit
+        self._max = max_limit
+        self._increase = float(increase)
+        self._decrease = float(decrease)
+        self._tolerance = float(latency_tolerance)
+        self._warmup = warmup
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._generation = 0
+        self._samples = 0
+        self._short_latency = 0.0
+        self._long_latency = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters = collections.deque()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def min_limit(self) -> int:
+        return self._min
+
+    @property
+    def max_limit(self) -> int:
+        return self._max
+
+    def acquire(self, timeout: float = None) -> tuple or None:
+        """
+        Take a slot, blocking until one is free
+        :param timeout: float: (optional) Max seconds to wait
+        :return: tuple: Token to pass to `release`,
+                None if no slot is free within `timeout`
+        """
+        with self._condition:
+            if not self._condition.wait_for(self._has_slot, timeout):
+                return None
+            return self._take()
+
+    async def acquire_async(self) -> tuple:
+        """Awaitable counterpart of `acquire`"""
+        # The running loop inside a coroutine, also on Python 3.6
+        loop = asyncio.get_event_loop()
+        while True:
+            with self._lock:
+                if self._has_slot():
+                    return self._take()
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._async_waiters.remove(waiter)
+                    except ValueError:
+                        # Woken already: pass the slot on
+                        self._wake()
+                raise
+
+    def release(self, token: tuple, outcome: str = SUCCESS):
+        """
+        Free a slot and adjust the limit
+        :param token: tuple: Returned by `acquire`
+        :param outcome: str: `SUCCESS`, `OVERLOAD` or `IGNORE` for
+                failures that say nothing about the API load
+        """
+        generation, start = token
+        latency = time.monotonic() - start
+
+        with self._lock:
+            saturated = self._in_flight >= int(self._limit)
+            self._in_flight -= 1
+
+            if outcome == AdaptiveLimiter.SUCCESS:
+                if self._observe(latency):
+                    outcome = AdaptiveLimiter.OVERLOAD
+                elif saturated:
+                    self._limit = min(
+                        float(self._max),
+                        self._limit + self._increase / self._limit)
+
+            if outcome == AdaptiveLimiter.OVERLOAD \
+                    and generation == self._generation:
+                self._generation += 1
+                self._limit = max(float(self._min),
+                                  self._limit * self._decrease)
+
+            self._wake()
+
+    def _has_slot(self) -> bool:
+        return self._in_flight < int(self._limit)
+
+    def _take(self) -> tuple:
+        self._in_flight += 1
+        return self._generation, time.monotonic()
+
+    def _observe(self, latency: float) -> bool:
+        """Update the latency averages, True on a spike"""
+        self._samples += 1
+        if self._samples == 1:
+            self._short_latency = self._long_latency = latency
+            return False
+
+        self._short_latency += \
+            (latency - self._short_latency) * AdaptiveLimiter._SHORT_WEIGHT
+        self._long_latency += \
+            (latency - self._long_latency) * AdaptiveLimiter._LONG_WEIGHT
+        return self._samples > self._warmup \
+            and self._short_latency > self._long_latency * self._tolerance
+
+    def _wake(self):
+        free = int(self._limit) - self._in_flight
+        if free <= 0:
+            return
+        self._condition.notify(free)
+        for _ in range(min(free, len(self._async_waiters))):
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def __repr__(self):
+        return '{}(limit={}, in_flight={})'.format(
+            self.__class__.__name__, self.limit, self._in_flight)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
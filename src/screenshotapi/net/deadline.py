@@ -0,0 +1,113 @@
+import asyncio
+import math
+import threading
+import time
+
+from ..exceptions.error import DeadlineExceededError
+
+
+class Deadline:
+    """
+    Time budget of one API call: pool wait, connect, rendering, download
+    and retries included.
+
+    Waits are cut short and socket timeouts lowered to fit in the
+    remaining time; once it is spent, the call raises
+    `DeadlineExceededError`. A call may also be cancelled before its
+    deadline, which aborts the request in flight.
+    """
+
+    __slots__ = ('seconds', 'expires', 'cancelled', '_abort', '_lock')
+
+    def __init__(self, seconds: float or None):
+        """
+        :param seconds: float: Budget, starting now. None for a deadline
+                that only ends when cancelled
+        """
+        if seconds is not None and seconds <= 0:
+            raise ValueError('Deadline should be positive')
+        self.seconds = seconds
+        self.expires = math.inf if seconds is None \
+            else time.monotonic() + seconds
+        self.cancelled = False
+        self._abort = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def wait_time(self) -> float or None:
+        """Max seconds to wait for, None if unlimited"""
+        remaining = self.remaining()
+        return None if remaining == math.inf else remaining
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def check(self, stage: str):
+        """
+        :param stage: str: What the call was doing, for the error message
+        :raises DeadlineExceededError: no time left
+        """
+        if self.expired:
+            raise self.error(stage)
+
+    def error(self, stage: str) -> DeadlineExceededError:
+        if self.cancelled:
+            return DeadlineExceededError('Call cancelled ' + stage)
+        return DeadlineExceededError('Deadline of {:g}s exceeded {}'.format(
+            self.seconds, stage))
+
+    def limit(self, seconds: float or None) -> float or None:
+        """`seconds` lowered to the remaining time"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise self.error('before sending the request')
+        if seconds is None:
+            return None if remaining == math.inf else remaining
+        return min(seconds, remaining)
+
+    def fork(self) -> 'Deadline':
+        """Deadline ending with this one, but cancelled on its own"""
+        fork = Deadline(None)
+        fork.seconds = self.seconds
+        fork.expires = self.expires
+        return fork
+
+    def bind(self, abort):
+        """
+        Set the callable aborting the request in flight on `cancel`
+        :param abort: callable: None once the request is over
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._abort = abort
+                return
+        if abort is not None:
+            abort()
+
+    def cancel(self):
+        """Expire now and abort the request in flight, if any"""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self.expires = -math.inf
+            abort, self._abort = self._abort, None
+        if abort is not None:
+            abort()
+
+    async def wait_for(self, awaitable, stage: str):
+        """
+        Await `awaitable` within the remaining time
+        :raises DeadlineExceededError: it did not finish in time
+        """
+        try:
+            return await asyncio.wait_for(awaitable, self.wait_time())
+        except asyncio.TimeoutError:
+            raise self.error(stage) from None
+
+    def __repr__(self):
+        return '{}(remaining={:.3f})'.format(
+            self.__class__.__name__, self.remaining())
@@ -0,0 +1,206 @@
+import asyncio
+import bisect
+import collections
+import math
+import queue
+import threading
+import time
+
+from .deadline import Deadline
+from .retry import RetryBudget
+
+
+class HedgePolicy:
+    """
+    Hedged API calls: when a call has no response after the `percentile`
+    of the recent call latencies, a duplicate is sent and whichever
+    finishes first is used, the other one is cancelled.
+
+    Duplicates are paid for, so each one takes a token from `budget`;
+    without tokens the call just waits. A policy may be shared by
+    several clients.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_delay: float = 0.05,
+                 max_delay: float = None, window: int = 1000,
+                 warmup: int = 20, budget: RetryBudget = None):
+        """
+        :param percentile: float: Latency percentile after which a duplicate
+                is sent. 95 by default
+        :param min_delay: float: Min seconds before a duplicate.
+                0.05 by default
+        :param max_delay: float: (optional) Max seconds before a duplicate
+        :param window: int: Number of recent latencies the percentile is
+                computed on. 1000 by default
+        :param warmup: int: Calls observed before the first duplicate.
+                20 by default
+        :param budget: RetryBudget: (optional) Duplicates allowed.
+                5% of the calls by default
+        """
+        if not 0 < percentile < 100:
+            raise ValueError('Percentile should be in (0, 100)')
+        if min_delay < 0 or (max_delay is not None and max_delay < min_delay):
+            raise ValueError('Invalid hedge delay bounds')
+        if type(window) is not int or window < 1 \
+                or type(warmup) is not int or not 0 < warmup <= window:
+            raise ValueError('Invalid hedge window or warmup')
+        if budget is not None and not isinstance(budget, RetryBudget):
+            raise ValueError('Budget should be a RetryBudget instance')
+
+        self._percentile = percentile
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._warmup = warmup
+        self._budget = budget if budget is not None else RetryBudget(
+            ratio=0.05, min_per_second=0.0, max_tokens=10.0,
+            initial_tokens=0.0)
+        self._recent = collections.deque(maxlen=window)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> RetryBudget:
+        return self._budget
+
+    def delay(self) -> float or None:
+        """Seconds before a duplicate is sent, None while warming up"""
+        with self._lock:
+            count = len(self._sorted)
+            if count < self._warmup:
+                return None
+            # Nearest rank
+            latency = self._sorted[
+                math.ceil(count * self._percentile / 100) - 1]
+
+        delay = max(self._min_delay, latency)
+        if self._max_delay is not None:
+            delay = min(self._max_delay, delay)
+        return delay
+
+    def observe(self, seconds: float):
+        """Record the latency of a successful call"""
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                oldest = self._recent[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._recent.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def run(self, attempt, deadline: Deadline or None, metrics):
+        """
+        Call `attempt` and, if it is slow, a duplicate of it
+        :param attempt: callable: Sends the call within the `Deadline`
+                it is given, which is cancelled if the other call wins
+        :param deadline: Deadline: (optional) Time budget of the call
+        :param metrics: Metrics: Receives the hedge counts
+        :return: Result of the first successful call
+        :raises Exception: Error of the first call if both fail
+        """
+        self._budget.deposit()
+        delay = self._hedge_delay(deadline)
+        start = time.monotonic()
+        if delay is None:
+            result = attempt(deadline)
+            self.observe(time.monotonic() - start)
+            return result
+
+        outcomes = queue.Queue()
+        forks = []
+
+        def launch():
+            fork = deadline.fork() if deadline is not None \
+                else Deadline(None)
+            index = len(forks)
+            forks.append(fork)
+
+            def target():
+                try:
+                    outcomes.put((index, attempt(fork), None))
+                except Exception as error:
+                    outcomes.put((index, None, error))
+
+            threading.Thread(target=target, daemon=True).start()
+
+        launch()
+        try:
+            try:
+                outcome = outcomes.get(timeout=delay)
+            except queue.Empty:
+                if self._hedge(metrics):
+                    launch()
+                outcome = outcomes.get()
+
+            failure = None
+            finished = 0
+            while True:
+                index, result, error = outcome
+                finished += 1
+                if error is None:
+                    self._won(index, time.monotonic() - start, metrics)
+                    return result
+                if failure is None or index == 0:
+                    failure = error
+                if finished == len(forks):
+                    raise failure
+                outcome = outcomes.get()
+        finally:
+            for fork in forks:
+                fork.cancel()
+
+    async def run_async(self, attempt, deadline: Deadline or None, metrics):
+        """
+        Awaitable counterpart of `run`, `attempt` is a coroutine function
+        and the losing call is cancelled as a task
+        """
+        self._budget.deposit()
+        delay = self._hedge_delay(deadline)
+        start = time.monotonic()
+        if delay is None:
+            result = await attempt(deadline)
+            self.observe(time.monotonic() - start)
+            return result
+
+        tasks = [asyncio.ensure_future(attempt(deadline))]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._hedge(metrics):
+                tasks.append(asyncio.ensure_future(attempt(deadline)))
+                pending = set(tasks)
+
+            failure = None
+            while True:
+                if not done:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.index):
+                    if task.exception() is None:
+                        self._won(tasks.index(task),
+                                  time.monotonic() - start, metrics)
+                        return task.result()
+                    if failure is None or task is tasks[0]:
+                        failure = task.exception()
+                if not pending:
+                    raise failure
+                done = None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self, deadline: Deadline or None) -> float or None:
+        delay = self.delay()
+        if delay is not None and deadline is not None \
+                and delay >= deadline.remaining():
+            return None
+        return delay
+
+    def _hedge(self, metrics) -> bool:
+        if not self._budget.withdraw():
+            metrics.hedge('denied')
+            return False
+        metrics.hedge('sent')
+        return True
+
+    def _won(self, index: int, seconds: float, metrics):
+        self.observe(seconds)
+        if index > 0:
+            metrics.hedge('won')
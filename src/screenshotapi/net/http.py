@@ -1,95 +1,464 @@
-from requests import request, Response
+from .coalesce import SingleFlight
+from .concurrency import AdaptiveLimiter
+from .deadline import Deadline
+from ..hooks import HookCall
+from .pool import ConnectionPool, PhaseTrace
+from .requester import BaseApiRequester
+from .retry import parse_retry_after
+from .transport import RequestsTransport, Transport
+from ..cache.base import Cache, payload_key
 from ..exceptions.error import ApiAuthError, HttpApiError, BadRequestError
 from ..version import VERSION, LIBRARY_NAME
+import functools
 import logging
+import time
 
 
-class ApiRequester:
+class ApiRequester(BaseApiRequester):
     __logger = logging.getLogger('api-requester')
     __connect_timeout = 10
     __user_agent = '{name}/{ver}'.format(name=LIBRARY_NAME, ver=VERSION)
-    _base_url: str
-    _timeout: float
+    _transport: Transport
+    _owns_transport: bool
+    _single_flight: SingleFlight or None
 
     def __init__(self, **kwargs):
         """
 
-        :param kwargs: Supported parameters:
-        - base_url: (optional) API endpoint URL; str
-        - timeout: (optional) API call timeout in seconds; float
+        :param kwargs: Parameters of `BaseApiRequester`, and:
+        - transport: (optional) HTTP client, overrides the pool
+          parameters; Transport
+        - pool: (optional) shared connection pool; ConnectionPool
+        - pool_size: (optional) max connections kept per host; int
+        - keep_alive: (optional) reuse connections between calls; bool
+        - idle_timeout: (optional) seconds before idle connections
+          are dropped; float
+        - coalesce: (optional) share one API call between concurrent
+          identical requests; bool
         """
-        self._base_url = ''
-        self.timeout = 31
+        super().__init__(**kwargs)
+        if kwargs.get('coalesce'):
+            self._single_flight = SingleFlight()
 
-        if 'base_url' in kwargs:
-            self.base_url = kwargs['base_url']
-        if 'timeout' in kwargs:
-            self.timeout = kwargs['timeout']
+        if kwargs.get('transport') is not None:
+            if not isinstance(kwargs['transport'], Transport):
+                raise ValueError('Transport should be a Transport instance')
+            self._transport = kwargs['transport']
+            self._owns_transport = False
+        else:
+            self._transport = RequestsTransport(kwargs.get('pool'), **{
+                k: kwargs[k] for k in ('pool_size', 'keep_alive',
+                                       'idle_timeout')
+                if k in kwargs
+            })
+            self._owns_transport = True
 
     @property
-    def base_url(self) -> str:
-        return self._base_url
-
-    @base_url.setter
-    def base_url(self, url: str):
-        if url is None or len(url) <= 8 or not url.startswith('http'):
-            raise ValueError('Invalid URL specified.')
-        self._base_url = url
+    def transport(self) -> Transport:
+        return self._transport
 
     @property
-    def timeout(self) -> float:
-        """API call timeout in seconds"""
-        return self._timeout
-
-    @timeout.setter
-    def timeout(self, value: float):
-        """API call timeout in seconds"""
-        if value is not None and 1 <= value <= 60:
-            self._timeout = value
+    def pool(self) -> ConnectionPool or None:
+        """Connection pool of the default transport"""
+        return getattr(self._transport, 'pool', None)
+
+    def close(self):
+        """Close the transport unless it is shared"""
+        if self._owns_transport:
+            self._transport.close()
+
+    def get(self, payload: dict, deadline: Deadline = None) -> bytes:
+        """
+        :param payload: dict: Query parameters
+        :param deadline: Deadline: (optional) Time budget of the call,
+                `deadline` seconds from now by default
+        :return: bytes: Response body
+        """
+        deadline = self._start_deadline(deadline)
+        if self._cache is None and self._single_flight is None:
+            return self._fetch(payload, deadline)
+
+        key = payload_key(payload)
+        if self._single_flight is None:
+            return self._get_cached(key, payload, deadline)
+
+        return self._single_flight.do(
+            key, lambda: self._get_cached(key, payload, deadline),
+            deadline)
+
+    def _get_cached(self, key: str, payload: dict,
+                    deadline: Deadline or None) -> bytes:
+        if self._cache is None:
+            return self._fetch(payload, deadline)
+
+        body = self._cache.get(key)
+        if body is not None:
+            return body
+
+        body = self._fetch(payload, deadline)
+        try:
+            self._cache.set(key, body)
+        except OSError as error:
+            ApiRequester.__logger.warning('Cannot cache response: %s', error)
+        return body
+
+    def stream(self, payload: dict, write, deadline: Deadline = None) -> int:
+        """
+        Pass the response body to `write` chunk by chunk
+        :param payload: dict: Query parameters
+        :param write: callable: Called with each chunk of the body
+        :param deadline: Deadline: (optional) Time budget of the call,
+                `deadline` seconds from now by default
+        :return: int: Number of bytes received
+        """
+        deadline = self._start_deadline(deadline)
+        if self._cache is None:
+            return self._fetch_stream(payload, write, deadline)
+
+        key = payload_key(payload)
+        body = self._cache.get(key)
+        if body is not None:
+            for i in range(0, len(body), self.chunk_size):
+                write(body[i:i + self.chunk_size])
+            return len(body)
+
+        filler = CacheFiller(self._cache, key, ApiRequester.__logger)
+
+        def write_through(chunk: bytes):
+            write(chunk)
+            filler.write(chunk)
+
+        try:
+            size = self._fetch_stream(payload, write_through, deadline)
+        except BaseException:
+            filler.discard()
+            raise
+        filler.commit()
+        return size
+
+    def _fetch(self, payload: dict, deadline: Deadline or None) -> bytes:
+        if self._hedge is not None:
+            return self._hedge.run(
+                lambda fork: self._fetch_once(payload, fork),
+                deadline, self._metrics)
+        return self._fetch_once(payload, deadline)
+
+    def _fetch_once(self, payload: dict,
+                    deadline: Deadline or None) -> bytes:
+        call = self._start_call(payload)
+        return self._measured(
+            lambda: self._send(payload, call, deadline), None, deadline)
+
+    def _fetch_stream(self, payload: dict, write,
+                      deadline: Deadline or None) -> int:
+        call = self._start_call(payload)
+        started = []
+
+        def tracked_write(chunk: bytes):
+            if not started:
+                started.append(True)
+            write(chunk)
+
+        return self._measured(
+            lambda: self._send_stream(payload, tracked_write, call, deadline),
+            lambda: not started,
+            deadline
+        )
+
+    def _measured(self, send, can_retry=None, deadline: Deadline = None):
+        if not self._metrics.enabled:
+            return self._with_retries(send, can_retry, deadline)
+        with self._measure(deadline):
+            return self._with_retries(send, can_retry, deadline)
+
+    def _with_retries(self, send, can_retry=None, deadline: Deadline = None):
+        if self._concurrency_limiter is not None:
+            send = functools.partial(self._limited, send, deadline)
+        if deadline is not None:
+            send = functools.partial(self._bounded, send, deadline)
+
+        retry = self._retry
+        if retry is None:
+            return send()
+
+        retry.on_request()
+        attempt = 0
+        while True:
+            try:
+                return send()
+            except HttpApiError as error:
+                failure = error
+                delay = retry.retry_delay(
+                    attempt, error.status_code, error.retry_after)
+            except self._transport.read_timeout_errors as error:
+                failure = error
+                delay = retry.retry_delay(attempt, read_timeout=True)
+            except self._transport.connection_errors as error:
+                failure = error
+                delay = retry.retry_delay(attempt)
+
+            if delay is None or (can_retry is not None and not can_retry()):
+                raise failure
+            # No retry that would end past the deadline
+            if deadline is not None and delay >= deadline.remaining():
+                raise failure
+
+            ApiRequester.__logger.debug(
+                'Retrying in %.2fs after: %s', delay, failure)
+            time.sleep(delay)
+            attempt += 1
+
+    def _bounded(self, send, deadline: Deadline):
+        """Report the timeouts caused by the deadline as such"""
+        try:
+            return send()
+        except self._transport.read_timeout_errors \
+                + self._transport.connection_errors as error:
+            if deadline.expired:
+                raise deadline.error('waiting for the API') from error
+            raise
+
+    def _limited(self, send, deadline: Deadline or None):
+        """Run one attempt in a slot of the concurrency limiter"""
+        limiter = self._concurrency_limiter
+        if deadline is None:
+            token = limiter.acquire()
         else:
-            raise ValueError('Timeout value should be in [1, 60]')
+            token = limiter.acquire(deadline.wait_time())
+            if token is None:
+                raise deadline.error('waiting for a concurrency slot')
+        self._metrics.concurrency(limiter.limit, limiter.in_flight)
+
+        outcome = AdaptiveLimiter.IGNORE
+        try:
+            result = send()
+            outcome = AdaptiveLimiter.SUCCESS
+            return result
+        except HttpApiError as error:
+            if ApiRequester._is_overload(error.status_code):
+                outcome = AdaptiveLimiter.OVERLOAD
+            raise
+        except self._transport.read_timeout_errors \
+                + self._transport.connection_errors:
+            outcome = AdaptiveLimiter.OVERLOAD
+            raise
+        finally:
+            limiter.release(token, outcome)
+            self._metrics.concurrency(limiter.limit, limiter.in_flight)
+
+    @staticmethod
+    def _is_overload(status_code: int or None) -> bool:
+        return status_code is not None \
+            and (status_code == 429 or status_code >= 500)
+
+    def _send(self, payload: dict, call: HookCall = None,
+              deadline: Deadline = None) -> bytes:
+        try:
+            response = self._request(payload, call, deadline)
+            with response:
+                start = time.perf_counter()
+                if deadline is None and (
+                        call is None or not call.has('on_chunk')):
+                    body = response.content
+                else:
+                    chunks = []
+                    for chunk in response.iter_content(self.chunk_size):
+                        chunks.append(chunk)
+                        if call is not None:
+                            call.emit('on_chunk', size=len(chunk))
+                        if deadline is not None:
+                            deadline.check('while downloading the capture')
+                    body = b''.join(chunks)
+                self._record_body(
+                    response.status_code, len(body), start, call)
+
+            if not 200 <= response.status_code < 300:
+                # The body may have been read as chunks already
+                ApiRequester._raise_for_status(
+                    response.status_code, body.decode('utf-8', 'replace'),
+                    response.headers.get('Retry-After'))
+            return body
+        except Exception as error:
+            if call is not None:
+                call.emit('on_error', error=error)
+            raise
+
+    def _send_stream(self, payload: dict, write, call: HookCall = None,
+                     deadline: Deadline = None) -> int:
+        try:
+            response = self._request(payload, call, deadline)
+            with response:
+                if not 200 <= response.status_code < 300:
+                    self._record_body(response.status_code, 0, None, call)
+                    ApiRequester._raise_for_status(
+                        response.status_code, response.text,
+                        response.headers.get('Retry-After'))
+
+                start = time.perf_counter()
+                size = 0
+                for chunk in response.iter_content(self.chunk_size):
+                    write(chunk)
+                    size += len(chunk)
+                    if call is not None:
+                        call.emit('on_chunk', size=len(chunk))
+                    if deadline is not None:
+                        deadline.check('while downloading the capture')
+                self._record_body(response.status_code, size, start, call)
+                return size
+        except Exception as error:
+            if call is not None:
+                call.emit('on_error', error=error)
+            raise
+
+    def _request(self, payload: dict, call: HookCall = None,
+                 deadline: Deadline = None):
+        """Send a GET request, the body is left to be read"""
+        metrics = self._metrics
+        if self._rate_limiter is not None:
+            if metrics.enabled:
+                start = time.perf_counter()
+                self._wait_rate_limit(deadline)
+                metrics.observe('queue', time.perf_counter() - start)
+            else:
+                self._wait_rate_limit(deadline)
+
+        if call is not None:
+            call.start_attempt()
 
-    def get(self, payload: dict) -> bytes:
         headers = {
-            'User-Agent': ApiRequester.__user_agent,
-            'Connection': 'close'
+            'User-Agent': ApiRequester.__user_agent
         }
-        response = request(
-            'GET',
-            self.base_url,
-            params=payload,
-            headers=headers,
-            timeout=(ApiRequester.__connect_timeout, self.timeout)
-        )
+        url, target = self._target(payload)
+        timeout = self._timeouts(payload, deadline)
+        if not metrics.enabled and call is None and deadline is None:
+            return self._transport.stream(
+                'GET',
+                url,
+                headers=headers,
+                timeout=timeout,
+                **target
+            )
 
-        return ApiRequester._handle_response(response)
+        start = time.perf_counter()
+        with PhaseTrace(call and call.connection_acquired,
+                        deadline) as trace:
+            response = self._transport.stream(
+                'GET',
+                url,
+                headers=headers,
+                timeout=timeout,
+                **target
+            )
+        metrics.observe_request(trace.pool_wait, trace.connect, trace.tls,
+                                time.perf_counter() - start)
+        if call is not None:
+            call.emit('on_response_headers',
+                      status_code=response.status_code)
+        return response
+
+    def _wait_rate_limit(self, deadline: Deadline or None):
+        if deadline is None:
+            self._rate_limiter.acquire()
+        elif not self._rate_limiter.acquire(deadline.wait_time()):
+            raise deadline.error('waiting for the rate limiter')
+
+    def _timeouts(self, payload: dict, deadline: Deadline or None) -> tuple:
+        """Connect and read timeouts, cut to fit in the deadline"""
+        connect_timeout = ApiRequester.__connect_timeout
+        read_timeout = self.read_timeout(payload)
+        if deadline is None:
+            return connect_timeout, read_timeout
+        return deadline.limit(connect_timeout), deadline.limit(read_timeout)
+
+    def _record_body(self, status_code: int, size: int, start: float or None,
+                     call: HookCall = None):
+        metrics = self._metrics
+        if metrics.enabled:
+            if start is not None:
+                metrics.observe('download', time.perf_counter() - start)
+            metrics.response(status_code, size)
+        if call is not None and 200 <= status_code < 300:
+            call.emit('on_complete', status_code=status_code, size=size)
 
     def post(self, data: dict) -> bytes:
         headers = {
-            'User-Agent': ApiRequester.__user_agent,
-            'Connection': 'close'
+            'User-Agent': ApiRequester.__user_agent
         }
 
-        response = request(
+        response = self._transport.send(
             'POST',
             self.base_url,
             json=data,
             headers=headers,
-            timeout=(ApiRequester.__connect_timeout, self.timeout)
+            timeout=self._timeouts(data, None)
         )
 
         return ApiRequester._handle_response(response)
 
+    def _target(self, payload: dict) -> tuple:
+        # Pre-encoded payloads skip the encoding of the parameters
+        query = getattr(payload, 'query', None)
+        if query:
+            return self.base_url + '?' + query, {'encoded': True}
+        return self.base_url, {'params': payload}
+
     @staticmethod
-    def _handle_response(response: Response) -> bytes:
+    def _handle_response(response) -> bytes:
         if 200 <= response.status_code < 300:
             return response.content
 
-        if response.status_code in [401, 402, 403]:
-            raise ApiAuthError(response.text)
+        ApiRequester._raise_for_status(
+            response.status_code, response.text,
+            response.headers.get('Retry-After'))
+
+    @staticmethod
+    def _raise_for_status(status_code: int, text: str,
+                          retry_after: str = None):
+        if status_code in [401, 402, 403]:
+            raise ApiAuthError(text, status_code)
+
+        if status_code in [400, 422]:
+            raise BadRequestError(text, status_code)
+
+        if status_code >= 300:
+            raise HttpApiError(
+                text, status_code, parse_retry_after(retry_after))
+
+
+class CacheFiller:
+    """
+    Stores a streamed response body in a cache.
+
+    Caching failures are logged and never interrupt the download.
+    """
+
+    def __init__(self, cache: Cache, key: str, logger):
+        self._logger = logger
+        try:
+            self._writer = cache.writer(key)
+        except OSError as error:
+            self._failed(error)
+
+    def write(self, chunk: bytes):
+        if self._writer is not None:
+            try:
+                self._writer.write(chunk)
+            except OSError as error:
+                self._writer.discard()
+                self._failed(error)
+
+    def commit(self):
+        if self._writer is not None:
+            try:
+                self._writer.commit()
+            except OSError as error:
+                self._failed(error)
 
-        if response.status_code in [400, 422]:
-            raise BadRequestError(response.text)
+    def discard(self):
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
 
-        if response.status_code >= 300:
-            raise HttpApiError(response.text)
+    def _failed(self, error: Exception):
+        self._writer = None
+        self._logger.warning('Cannot cache response: %s', error)
@@ -0,0 +1,597 @@
+import collections
+import json
+import queue
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from .pool import PhaseTrace
+from .transport import Transport
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:  # pragma: no cover
+    h2 = None
+
+
+class Http2Transport(Transport):
+    """
+    HTTP/2 transport multiplexing concurrent calls over a few connections.
+
+    Up to `max_streams` requests share each connection and at most
+    `max_connections` connections are opened per host, so hundreds of
+    captures in flight need a handful of sockets and TLS sessions.
+    Callers wait for a free stream once every connection is busy.
+
+    Flow control windows are sized for multi-megabyte images: the server
+    may send `window_size` bytes per response and `connection_window`
+    bytes per connection before the client reads them. Received data is
+    acknowledged as it is read, so slow readers hold back their own
+    responses only.
+
+    HTTPS endpoints must negotiate `h2` with ALPN; plain `http://` URLs
+    use HTTP/2 with prior knowledge, e.g. for local test servers.
+
+    Requires the `h2` package: `pip install screenshot-api[http2]`.
+    """
+
+    connection_errors = (ConnectionError,)
+    read_timeout_errors = (TimeoutError,)
+
+    def __init__(self, max_connections: int = 2, max_streams: int = 100,
+                 window_size: int = 16 * 1024 * 1024,
+                 connection_window: int = 64 * 1024 * 1024,
+                 ssl_context: ssl.SSLContext = None):
+        """
+        :param max_connections: int: Max connections per host. 2 by default
+        :param max_streams: int: Max concurrent requests per connection,
+                lowered if the server allows fewer. 100 by default
+        :param window_size: int: Flow control window of each response,
+                bytes. 16 MiB by default
+        :param connection_window: int: Flow control window of each
+                connection, bytes. 64 MiB by default
+        :param ssl_context: ssl.SSLContext: (optional) TLS settings,
+                system CA certificates by default. The transport takes
+                it over and restricts its ALPN protocols to `h2`: do not
+                share it with other clients
+        """
+        if h2 is None:
+            raise ImportError(
+                'h2 is required for HTTP/2 requests. '
+                'Install it with `pip install screenshot-api[http2]`')
+        if type(max_connections) is not int or max_connections < 1:
+            raise ValueError('Max connections should be a positive integer')
+        if type(max_streams) is not int or max_streams < 1:
+            raise ValueError('Max streams should be a positive integer')
+        if not _MIN_WINDOW <= window_size <= _MAX_WINDOW \
+                or not _MIN_WINDOW <= connection_window <= _MAX_WINDOW:
+            raise ValueError('Windows should be in [{}, {}]'.format(
+                _MIN_WINDOW, _MAX_WINDOW))
+
+        if ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        ssl_context.set_alpn_protocols(['h2'])
+
+        self.max_connections = max_connections
+        self.max_streams = max_streams
+        self.window_size = window_size
+        self.connection_window = connection_window
+        self._ssl_context = ssl_context
+        self._connections = collections.defaultdict(list)
+        self._connecting = collections.Counter()
+        self._lock = threading.Condition()
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def connection_count(self) -> int:
+        """Number of open connections"""
+        with self._lock:
+            return sum(len(c) for c in self._connections.values())
+
+    def send(self, method: str, url: str, **kwargs):
+        response = self.stream(method, url, **kwargs)
+        with response:
+            response.content
+        return response
+
+    def stream(self, method: str, url: str, **kwargs):
+        connect_timeout, read_timeout = _timeouts(kwargs.get('timeout'))
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError('Invalid URL: {}'.format(url))
+
+        path = parts.path or '/'
+        query = parts.query
+        if kwargs.get('params'):
+            query = (query + '&' if query else '') + \
+                urlencode(kwargs['params'])
+        if query:
+            path += '?' + query
+
+        headers = dict(kwargs.get('headers') or {})
+        body = None
+        if kwargs.get('json') is not None:
+            body = json.dumps(kwargs['json']).encode('utf-8')
+            headers['content-type'] = 'application/json'
+            headers['content-length'] = str(len(body))
+
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        origin = (parts.scheme, parts.hostname, port)
+        connection = self._acquire(origin, connect_timeout)
+        try:
+            stream = connection.request(
+                method, path, parts.netloc, headers, body)
+        except BaseException:
+            self._stream_done(connection)
+            raise
+
+        trace = PhaseTrace.current()
+        if trace is not None:
+            if trace.deadline is not None:
+                trace.deadline.bind(stream.abort)
+            if trace.on_acquired is not None:
+                trace.on_acquired()
+        return stream.response(read_timeout)
+
+    def close(self):
+        """Close every connection, requests in flight fail"""
+        with self._lock:
+            self._closed = True
+            connections = [c for group in self._connections.values()
+                           for c in group]
+            self._connections.clear()
+            self._lock.notify_all()
+        for connection in connections:
+            connection.close()
+
+    def _acquire(self, origin: tuple, timeout: float) -> '_Connection':
+        """Reserve a stream on a connection to `origin`"""
+        trace = PhaseTrace.current()
+        start = time.perf_counter()
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Transport is closed')
+
+                group = self._connections[origin]
+                group[:] = [c for c in group if c.usable]
+                free = [c for c in group if c.active < c.max_streams]
+                if free:
+                    connection = min(free, key=lambda c: c.active)
+                    connection.active += 1
+                    if trace is not None:
+                        trace.pool_wait += time.perf_counter() - start
+                    return connection
+
+                if len(group) + self._connecting[origin] \
+                        < self.max_connections:
+                    self._connecting[origin] += 1
+                    break
+                deadline = trace and trace.deadline
+                if deadline is None:
+                    self._lock.wait()
+                else:
+                    deadline.check('waiting for an HTTP/2 stream')
+                    self._lock.wait(deadline.wait_time())
+
+        if trace is not None:
+            trace.pool_wait += time.perf_counter() - start
+        try:
+            connection = _Connection(self, origin, timeout)
+        finally:
+            with self._lock:
+                self._connecting[origin] -= 1
+                self._lock.notify_all()
+
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._connections[origin].append(connection)
+                connection.active += 1
+        if closed:
+            connection.close()
+            raise RuntimeError('Transport is closed')
+        return connection
+
+    def _stream_done(self, connection: '_Connection'):
+        with self._lock:
+            connection.active -= 1
+            self._lock.notify_all()
+
+    def _connection_lost(self, connection: '_Connection'):
+        with self._lock:
+            group = self._connections.get(connection.origin)
+            if group is not None and connection in group:
+                group.remove(connection)
+            self._lock.notify_all()
+
+
+_MIN_WINDOW = 65535
+_MAX_FRAME = 1024 * 1024
+_MAX_WINDOW = 2 ** 31 - 1
+
+
+def _timeouts(timeout) -> tuple:
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+class _Connection:
+    """One HTTP/2 connection, read by a background thread"""
+
+    def __init__(self, transport: Http2Transport, origin: tuple,
+                 timeout: float):
+        self.origin = origin
+        self.active = 0
+        self.usable = True
+        self._transport = transport
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._window_open = threading.Condition(self._lock)
+        self._error = None
+
+        self._socket = self._connect(timeout)
+        try:
+            self._h2 = h2.connection.H2Connection(
+                h2.config.H2Configuration(
+                    client_side=True, header_encoding='utf-8'))
+            self._h2.local_settings = h2.settings.Settings(
+                client=True, initial_values={
+                    h2.settings.SettingCodes.ENABLE_PUSH: 0,
+                    h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS:
+                        transport.max_streams,
+                    h2.settings.SettingCodes.INITIAL_WINDOW_SIZE:
+                        transport.window_size,
+                })
+            self._h2.initiate_connection()
+            # Fewer, larger frames for image bodies; applied once the
+            # server acknowledges it
+            self._h2.update_settings(
+                {h2.settings.SettingCodes.MAX_FRAME_SIZE: _MAX_FRAME})
+            if transport.connection_window > _MIN_WINDOW:
+                self._h2.increment_flow_control_window(
+                    transport.connection_window - _MIN_WINDOW)
+            self._socket.sendall(self._h2.data_to_send())
+        except OSError as error:
+            self._socket.close()
+            raise ConnectionError('Cannot start HTTP/2: {}'.format(error))
+
+        self._thread = threading.Thread(
+            target=self._read_loop, name='screenshotapi-h2', daemon=True)
+        self._thread.start()
+
+    @property
+    def max_streams(self) -> int:
+        return min(self._transport.max_streams,
+                   self._h2.remote_settings.max_concurrent_streams)
+
+    def _connect(self, timeout: float) -> socket.socket:
+        scheme, host, port = self.origin
+        trace = PhaseTrace.current()
+        start = time.perf_counter()
+        try:
+            sock = socket.create_connection((host, port), timeout)
+        except OSError as error:
+            raise ConnectionError(
+                'Cannot connect to {}:{}: {}'.format(host, port, error))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if trace is not None:
+            trace.connect += time.perf_counter() - start
+
+        if scheme == 'https':
+            start = time.perf_counter()
+            try:
+                sock = self._transport._ssl_context.wrap_socket(
+                    sock, server_hostname=host)
+            except OSError as error:
+                sock.close()
+                raise ConnectionError('TLS handshake failed: {}'.format(error))
+            if sock.selected_alpn_protocol() != 'h2':
+                sock.close()
+                raise ConnectionError(
+                    '{} does not support HTTP/2'.format(host))
+            if trace is not None:
+                trace.tls += time.perf_counter() - start
+
+        # Reads block in the reader thread, timeouts are per request
+        sock.settimeout(None)
+        return sock
+
+    def request(self, method: str, path: str, authority: str,
+                headers: dict, body: bytes or None) -> '_Stream':
+        scheme = self.origin[0]
+        request_headers = [(':method', method), (':scheme', scheme),
+                           (':authority', authority), (':path', path)]
+        request_headers.extend(
+            (name.lower(), str(value)) for name, value in headers.items())
+
+        with self._lock:
+            self._check()
+            stream_id = self._h2.get_next_available_stream_id()
+            stream = self._streams[stream_id] = _Stream(self, stream_id)
+            try:
+                self._h2.send_headers(stream_id, request_headers,
+                                      end_stream=body is None)
+                self._flush()
+                if body is not None:
+                    self._send_body(stream_id, body)
+            except (OSError, h2.exceptions.ProtocolError) as error:
+                self._streams.pop(stream_id, None)
+                raise ConnectionError('Cannot send request: {}'.format(error))
+        return stream
+
+    def _send_body(self, stream_id: int, body: bytes):
+        view = memoryview(body)
+        while view:
+            size = min(len(view), self._h2.max_outbound_frame_size,
+                       self._h2.local_flow_control_window(stream_id))
+            if size <= 0:
+                if not self._window_open.wait(60):
+                    raise ConnectionError('Flow control window stalled')
+                self._check()
+                continue
+            self._h2.send_data(stream_id, view[:size].tobytes())
+            view = view[size:]
+            self._flush()
+        self._h2.end_stream(stream_id)
+        self._flush()
+
+    def acknowledge(self, stream_id: int, size: int):
+        """Open the flow control windows of data read by the caller"""
+        with self._lock:
+            if self._error is not None:
+                return
+            try:
+                self._h2.acknowledge_received_data(size, stream_id)
+                self._flush()
+            except (OSError, h2.exceptions.ProtocolError):
+                pass
+
+    def cancel(self, stream_id: int):
+        """Reset a stream whose response is no longer needed"""
+        with self._lock:
+            if self._streams.pop(stream_id, None) is None:
+                return
+            if self._error is None:
+                try:
+                    self._h2.reset_stream(
+                        stream_id, h2.errors.ErrorCodes.CANCEL)
+                    self._flush()
+                except (OSError, h2.exceptions.ProtocolError):
+                    pass
+        self._transport._stream_done(self)
+
+    def close(self):
+        with self._lock:
+            self.usable = False
+            if self._error is None:
+                try:
+                    self._h2.close_connection()
+                    self._flush()
+                except (OSError, h2.exceptions.ProtocolError):
+                    pass
+        self._fail(ConnectionError('Connection closed'))
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def _flush(self):
+        data = self._h2.data_to_send()
+        if data:
+            self._socket.sendall(data)
+
+    def _read_loop(self):
+        while True:
+            try:
+                data = self._socket.recv(256 * 1024)
+            except OSError as error:
+                self._fail(ConnectionError(
+                    'Connection lost: {}'.format(error)))
+                return
+            if not data:
+                self._fail(ConnectionError('Connection closed by server'))
+                return
+
+            with self._lock:
+                try:
+                    events = self._h2.receive_data(data)
+                    self._flush()
+                except (OSError, h2.exceptions.ProtocolError) as error:
+                    events = None
+                    failure = error
+                if events:
+                    self._window_open.notify_all()
+            if events is None:
+                self._fail(ConnectionError(
+                    'HTTP/2 protocol error: {}'.format(failure)))
+                return
+
+            for event in events:
+                self._dispatch(event)
+
+    def _dispatch(self, event):
+        if isinstance(event, h2.events.ConnectionTerminated):
+            # Streams above the last one processed never reached the API
+            self.usable = False
+            self._transport._connection_lost(self)
+            with self._lock:
+                refused = [s for i, s in self._streams.items()
+                           if i > (event.last_stream_id or 0)]
+            for stream in refused:
+                stream.finish(ConnectionError('Server closed the connection'))
+            return
+
+        stream_id = getattr(event, 'stream_id', None)
+        if stream_id is None:
+            return
+        with self._lock:
+            stream = self._streams.get(stream_id)
+        if stream is None:
+            return
+
+        if isinstance(event, h2.events.ResponseReceived):
+            stream.put(('headers', event.headers))
+        elif isinstance(event, h2.events.DataReceived):
+            stream.put(('data', event.data, event.flow_controlled_length))
+        elif isinstance(event, h2.events.StreamEnded):
+            stream.finish()
+        elif isinstance(event, h2.events.StreamReset):
+            stream.finish(ConnectionError(
+                'Stream reset by server: {}'.format(event.error_code)))
+
+    def _fail(self, error: Exception):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+            self.usable = False
+            streams = list(self._streams.values())
+            self._window_open.notify_all()
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+        self._transport._connection_lost(self)
+        for stream in streams:
+            stream.finish(error)
+
+    def _stream_finished(self, stream_id: int):
+        with self._lock:
+            found = self._streams.pop(stream_id, None) is not None
+        if found:
+            self._transport._stream_done(self)
+
+
+class _Stream:
+    def __init__(self, connection: _Connection, stream_id: int):
+        self._connection = connection
+        self.stream_id = stream_id
+        self._events = queue.Queue()
+
+    def put(self, event: tuple):
+        self._events.put(event)
+
+    def finish(self, error: Exception = None):
+        """Called once the server is done with the stream"""
+        self._connection._stream_finished(self.stream_id)
+        self._events.put(('error', error) if error else ('end',))
+
+    def get(self, timeout: float or None) -> tuple:
+        try:
+            event = self._events.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('Read timed out')
+        if event[0] == 'error':
+            raise event[1]
+        return event
+
+    def response(self, timeout: float or None) -> 'Http2Response':
+        try:
+            event = self.get(timeout)
+        except BaseException:
+            self.cancel()
+            raise
+        if event[0] != 'headers':
+            raise ConnectionError('Response without headers')
+        headers = CaseInsensitiveDict(
+            (k, v) for k, v in event[1] if not k.startswith(':'))
+        status = next(int(v) for k, v in event[1] if k == ':status')
+        return Http2Response(self, status, headers, timeout)
+
+    def acknowledge(self, size: int):
+        if size:
+            self._connection.acknowledge(self.stream_id, size)
+
+    def abort(self):
+        """Reset the stream and fail the pending reads"""
+        self.cancel()
+        self._events.put(('error', ConnectionError('Stream cancelled')))
+
+    def cancel(self):
+        self._connection.cancel(self.stream_id)
+
+        # Unread data still counts against the connection window
+        unread = 0
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'data':
+                unread += event[2]
+        self.acknowledge(unread)
+
+
+class Http2Response:
+    """Response of `Http2Transport`, the body is read on demand"""
+
+    def __init__(self, stream: _Stream, status_code: int,
+                 headers: CaseInsensitiveDict, timeout: float or None):
+        self.status_code = status_code
+        self.headers = headers
+        self._stream = stream
+        self._timeout = timeout
+        self._content = None
+        self._done = False
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b''.join(self.iter_content(256 * 1024))
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', 'replace')
+
+    def iter_content(self, chunk_size: int):
+        if self._content is not None:
+            for i in range(0, len(self._content), chunk_size):
+                yield self._content[i:i + chunk_size]
+            return
+
+        buffer, buffered = [], 0
+        try:
+            while not self._done:
+                event = self._stream.get(self._timeout)
+                if event[0] == 'end':
+                    self._done = True
+                    break
+                if event[0] != 'data':
+                    continue
+                self._stream.acknowledge(event[2])
+                buffer.append(event[1])
+                buffered += len(event[1])
+                if buffered >= chunk_size:
+                    yield b''.join(buffer)
+                    buffer, buffered = [], 0
+        except BaseException:
+            self.close()
+            raise
+        if buffer:
+            yield b''.join(buffer)
+
+    def close(self):
+        if not self._done:
+            self._done = True
+            self._stream.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
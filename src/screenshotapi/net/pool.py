@@ -0,0 +1,316 @@
+import functools
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+from requests import PreparedRequest, Request, Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+_local = threading.local()
+
+
+class PhaseTrace:
+    """Connection phases of the requests sent by one thread, in seconds"""
+
+    __slots__ = ('pool_wait', 'connect', 'tls', 'on_acquired', 'deadline')
+
+    def __init__(self, on_acquired=None, deadline=None):
+        """
+        :param on_acquired: callable: (optional) Called when a connection
+                is taken from the pool
+        :param deadline: Deadline: (optional) Bounds the wait for a free
+                connection
+        """
+        self.pool_wait = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.on_acquired = on_acquired
+        self.deadline = deadline
+
+    @staticmethod
+    def current() -> 'PhaseTrace' or None:
+        """Trace of the request being sent by this thread, if any"""
+        return getattr(_local, 'trace', None)
+
+    def __enter__(self):
+        _local.trace = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.trace = None
+
+
+_current_trace = PhaseTrace.current
+
+
+class _ConnectTiming:
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            trace = _current_trace()
+            if trace is not None:
+                trace.connect += time.perf_counter() - start
+
+
+class _PoolWaitTiming:
+    def _get_conn(self, timeout=None):
+        trace = _current_trace()
+        if trace is None:
+            return super()._get_conn(timeout)
+
+        deadline = trace.deadline
+        if deadline is not None:
+            remaining = deadline.wait_time()
+            if timeout is None or \
+                    (remaining is not None and remaining < timeout):
+                timeout = remaining
+
+        start = time.perf_counter()
+        try:
+            connection = super()._get_conn(timeout)
+        finally:
+            trace.pool_wait += time.perf_counter() - start
+        if deadline is not None:
+            # Cancelling the deadline aborts the request on this connection
+            connection.deadline = deadline
+            deadline.bind(functools.partial(_abort, connection))
+        if trace.on_acquired is not None:
+            trace.on_acquired()
+        return connection
+
+    def _put_conn(self, conn):
+        if conn is not None and conn.deadline is not None:
+            conn.deadline.bind(None)
+            conn.deadline = None
+        super()._put_conn(conn)
+
+
+def _abort(connection):
+    # Wakes up the thread blocked on the socket, the connection is then
+    # dropped by the pool
+    sock = connection.sock
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _TracedHTTPConnection(_ConnectTiming, HTTPConnection):
+    deadline = None
+
+
+class _TracedHTTPSConnection(_ConnectTiming, HTTPSConnection):
+    deadline = None
+
+    def connect(self):
+        trace = _current_trace()
+        if trace is None:
+            return super().connect()
+
+        start = time.perf_counter()
+        connected = trace.connect
+        try:
+            return super().connect()
+        finally:
+            # Whatever is not the TCP connect is the TLS handshake
+            trace.tls += time.perf_counter() - start \
+                - (trace.connect - connected)
+
+
+class _TracedHTTPConnectionPool(_PoolWaitTiming, HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(_PoolWaitTiming, HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP connections.
+
+    One pool may be shared by several `ApiRequester` (and thus `Client`)
+    instances, so that all of them reuse the same TCP+TLS connections.
+    """
+
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_IDLE_TIMEOUT = 60.0
+
+    _session: Session
+    _adapter: HTTPAdapter
+    _pool_size: int
+    _keep_alive: bool
+    _idle_timeout: float or None
+
+    def __init__(self, **kwargs):
+        """
+        :key pool_size: int: (optional) Max number of connections kept open
+                per host. 10 by default
+        :key keep_alive: bool: (optional) Reuse connections between requests.
+                True by default
+        :key idle_timeout: float: (optional) Seconds of inactivity after which
+                idle connections are dropped. None disables eviction.
+                60 by default
+        :key block: bool: (optional) Wait for a free connection instead of
+                opening an extra one when the pool is exhausted.
+                False by default
+        """
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        self._closed = False
+
+        self.pool_size = kwargs.get('pool_size', self.DEFAULT_POOL_SIZE)
+        self.keep_alive = kwargs.get('keep_alive', True)
+        self.idle_timeout = kwargs.get(
+            'idle_timeout', self.DEFAULT_IDLE_TIMEOUT)
+        self._block = bool(kwargs.get('block', False))
+
+        self._adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            pool_block=self._block
+        )
+        # Connection phases are timed for the requests run with a PhaseTrace
+        self._adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _TracedHTTPConnectionPool,
+            'https': _TracedHTTPSConnectionPool,
+        }
+
+        self._session = Session()
+        # API responses never need cookies; refusing them keeps the shared
+        # session free of cross-thread mutable state.
+        self._session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[]))
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @pool_size.setter
+    def pool_size(self, value: int):
+        if type(value) is int and value > 0:
+            self._pool_size = value
+        else:
+            raise ValueError('Pool size should be a positive integer')
+
+    @property
+    def keep_alive(self) -> bool:
+        return self._keep_alive
+
+    @keep_alive.setter
+    def keep_alive(self, value: bool):
+        self._keep_alive = bool(value)
+
+    @property
+    def idle_timeout(self) -> float or None:
+        return self._idle_timeout
+
+    @idle_timeout.setter
+    def idle_timeout(self, value: float or None):
+        if value is None or value > 0:
+            self._idle_timeout = value
+        else:
+            raise ValueError('Idle timeout should be positive or None')
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def request(self, method: str, url: str, encoded: bool = False,
+                **kwargs) -> Response:
+        """
+        Send a request through one of the pooled connections.
+
+        Accepts the same keyword arguments as `requests.Session.request`.
+        :param encoded: bool: The query string of `url` is already encoded
+                and is sent as is, without being parsed and quoted again
+        """
+        if self._closed:
+            raise RuntimeError('Connection pool is closed')
+
+        if not self.keep_alive:
+            headers = dict(kwargs.get('headers') or {})
+            headers['Connection'] = 'close'
+            kwargs['headers'] = headers
+
+        self._acquire()
+        try:
+            if encoded:
+                return self._send_encoded(method, url, **kwargs)
+            return self._session.request(method, url, **kwargs)
+        except EmptyPoolError:
+            trace = _current_trace()
+            if trace is not None and trace.deadline is not None \
+                    and trace.deadline.expired:
+                raise trace.deadline.error(
+                    'waiting for a pooled connection') from None
+            raise
+        finally:
+            self._release()
+
+    def prepare_encoded(self, method: str, url: str, headers: dict = None,
+                        json=None) -> PreparedRequest:
+        """
+        Request to `url` with its query string already encoded: only the
+        part before the query goes through `requests` URL preparation
+        """
+        base, _, query = url.partition('?')
+        prepared = self._session.prepare_request(
+            Request(method, base, headers=headers, json=json))
+        if query:
+            prepared.url += '?' + query
+        return prepared
+
+    def _send_encoded(self, method: str, url: str, **kwargs) -> Response:
+        session = self._session
+        prepared = self.prepare_encoded(
+            method, url, kwargs.pop('headers', None), kwargs.pop('json', None))
+        settings = session.merge_environment_settings(
+            prepared.url, kwargs.pop('proxies', None) or {},
+            kwargs.pop('stream', None), kwargs.pop('verify', None),
+            kwargs.pop('cert', None))
+        settings.update(kwargs)
+        return session.send(prepared, **settings)
+
+    def evict_idle(self):
+        """Drop all idle connections if the pool has not been used lately"""
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _acquire(self):
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+
+    def _evict_idle_locked(self, now: float):
+        if self._idle_timeout is None or self._in_flight > 0:
+            return
+        if now - self._last_used > self._idle_timeout:
+            self._adapter.poolmanager.clear()
+            self._last_used = now
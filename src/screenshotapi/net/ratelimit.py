@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket pacing outgoing API calls.
+
+    Tokens are added at `rate` per second up to `burst`. A call takes
+    one token, waiting for it if the bucket is empty. Waiting callers
+    are served in the order they arrive.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: float: Calls per second
+        :param burst: int: Max number of calls sent at once after
+                a pause. 1 by default
+        """
+        if not rate or rate <= 0:
+            raise ValueError('Rate should be positive')
+        if type(burst) is not int or burst < 1:
+            raise ValueError('Burst should be a positive integer')
+
+        self._rate = float(rate)
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        return self._burst
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Take a token, blocking until it is available
+        :param timeout: float: (optional) Max seconds to wait
+        :return: bool: False if the token cannot be had within `timeout`
+        """
+        delay = self._reserve(timeout)
+        if delay is None:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    async def acquire_async(self, timeout: float = None) -> bool:
+        """Awaitable counterpart of `acquire`"""
+        delay = self._reserve(timeout)
+        if delay is None:
+            return False
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    def _reserve(self, timeout: float or None) -> float or None:
+        # Tokens may go negative: each waiting caller reserves its slot
+        # and sleeps until the bucket refills up to it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst,
+                self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+
+            delay = max(0.0, (1 - self._tokens) / self._rate)
+            if timeout is not None and delay > timeout:
+                return None
+
+            self._tokens -= 1
+            return delay
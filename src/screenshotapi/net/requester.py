@@ -0,0 +1,244 @@
+from .coalesce import AsyncSingleFlight, SingleFlight
+from .concurrency import AdaptiveLimiter
+from .deadline import Deadline
+from .hedge import HedgePolicy
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from ..cache.base import Cache
+from ..hooks import HookCall, Hooks
+from ..metrics import Metrics, NULL_METRICS
+import contextlib
+import time
+
+
+class BaseApiRequester:
+    """
+    Configuration shared by `ApiRequester` and `AsyncApiRequester`:
+    timeouts, cache, retries, limiters, hedging, metrics and hooks
+    """
+
+    # API defaults of the page-load `timeout` and `delay`, ms
+    _PAGE_TIMEOUT = 15000
+    _DELAY = 250
+    # Seconds left to the API for rendering and uploading the capture
+    RENDER_MARGIN = 10
+    _base_url: str
+    _timeout: float or None
+    _deadline: float or None
+    _cache: Cache or None
+    _retry: RetryPolicy or None
+    _rate_limiter: RateLimiter or None
+    _concurrency_limiter: AdaptiveLimiter or None
+    _hedge: HedgePolicy or None
+    _metrics: Metrics
+    _hooks: Hooks or None
+    _single_flight: SingleFlight or AsyncSingleFlight or None
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: Supported parameters:
+        - base_url: (optional) API endpoint URL; str
+        - timeout: (optional) socket read timeout in seconds. Derived
+          from the page-load timeout and delay of each call by default;
+          float
+        - deadline: (optional) default time budget of a call in seconds,
+          retries included; float
+        - chunk_size: (optional) bytes read at once when streaming
+          a response body; int
+        - cache: (optional) response cache; Cache
+        - retry: (optional) retry policy for failed calls; RetryPolicy
+        - rate_limiter: (optional) limiter shared with other requesters;
+          RateLimiter
+        - rate_limit: (optional) max API calls per second; float
+        - burst: (optional) max API calls sent at once, used with
+          `rate_limit`; int
+        - concurrency_limiter: (optional) adaptive limit of the calls in
+          flight; AdaptiveLimiter
+        - hedge: (optional) duplicate slow `get` calls; HedgePolicy
+        - metrics: (optional) per-phase timings and counters; Metrics
+        - hooks: (optional) lifecycle callbacks; Hooks
+        """
+        self._base_url = ''
+        self._timeout = None
+        self.deadline = kwargs.get('deadline')
+        self.chunk_size = kwargs.get('chunk_size', 64 * 1024)
+        self.cache = kwargs.get('cache')
+        self.retry = kwargs.get('retry')
+        self.metrics = kwargs.get('metrics')
+        self.hooks = kwargs.get('hooks')
+        self._rate_limiter = kwargs.get('rate_limiter')
+        if self._rate_limiter is None and kwargs.get('rate_limit'):
+            self._rate_limiter = RateLimiter(
+                kwargs['rate_limit'], kwargs.get('burst', 1))
+        self.concurrency_limiter = kwargs.get('concurrency_limiter')
+        self.hedge = kwargs.get('hedge')
+        self._single_flight = None
+
+        if 'base_url' in kwargs:
+            self.base_url = kwargs['base_url']
+        if 'timeout' in kwargs:
+            self.timeout = kwargs['timeout']
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, url: str):
+        if url is None or len(url) <= 8 or not url.startswith('http'):
+            raise ValueError('Invalid URL specified.')
+        self._base_url = url
+
+    @property
+    def timeout(self) -> float or None:
+        """
+        Socket read timeout in seconds, None if derived from the
+        page-load timeout and delay of each call
+        """
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value: float or None):
+        if value is None or 1 <= value <= 60:
+            self._timeout = value
+        else:
+            raise ValueError('Timeout value should be in [1, 60]')
+
+    @property
+    def deadline(self) -> float or None:
+        """Default time budget of a call in seconds, retries included"""
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, value: float or None):
+        if value is None or (type(value) in (int, float) and value > 0):
+            self._deadline = value
+        else:
+            raise ValueError('Deadline should be positive or None')
+
+    def read_timeout(self, payload: dict) -> float:
+        """Socket read timeout of a call with the given parameters"""
+        if self._timeout is not None:
+            return self._timeout
+        return BaseApiRequester._derived_timeout(payload)
+
+    @staticmethod
+    def _derived_timeout(payload: dict) -> float:
+        # The API answers after loading the page, waiting for the delay
+        # and rendering the capture
+        page_timeout = payload.get('timeout') \
+            or BaseApiRequester._PAGE_TIMEOUT
+        delay = payload.get('delay')
+        if delay is None:
+            delay = BaseApiRequester._DELAY
+        return (page_timeout + delay) / 1000 \
+            + BaseApiRequester.RENDER_MARGIN
+
+    def _start_deadline(self, deadline: Deadline or None) -> Deadline or None:
+        if deadline is None and self._deadline is not None:
+            return Deadline(self._deadline)
+        return deadline
+
+    @property
+    def chunk_size(self) -> int:
+        """Bytes read at once when streaming a response body"""
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, value: int):
+        if type(value) is int and value > 0:
+            self._chunk_size = value
+        else:
+            raise ValueError('Chunk size should be a positive integer')
+
+    @property
+    def cache(self) -> Cache or None:
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: Cache or None):
+        if value is not None and not isinstance(value, Cache):
+            raise ValueError('Cache should be a Cache instance or None')
+        self._cache = value
+
+    @property
+    def retry(self) -> RetryPolicy or None:
+        return self._retry
+
+    @retry.setter
+    def retry(self, value: RetryPolicy or None):
+        if value is not None and not isinstance(value, RetryPolicy):
+            raise ValueError('Retry should be a RetryPolicy instance or None')
+        self._retry = value
+
+    @property
+    def rate_limiter(self) -> RateLimiter or None:
+        return self._rate_limiter
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveLimiter or None:
+        return self._concurrency_limiter
+
+    @concurrency_limiter.setter
+    def concurrency_limiter(self, value: AdaptiveLimiter or None):
+        if value is not None and not isinstance(value, AdaptiveLimiter):
+            raise ValueError(
+                'Concurrency limiter should be an AdaptiveLimiter or None')
+        self._concurrency_limiter = value
+
+    @property
+    def hedge(self) -> HedgePolicy or None:
+        return self._hedge
+
+    @hedge.setter
+    def hedge(self, value: HedgePolicy or None):
+        if value is not None and not isinstance(value, HedgePolicy):
+            raise ValueError('Hedge should be a HedgePolicy instance or None')
+        self._hedge = value
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, value: Metrics or None):
+        if value is None:
+            value = NULL_METRICS
+        elif not isinstance(value, Metrics):
+            raise ValueError('Metrics should be a Metrics instance or None')
+        self._metrics = value
+
+    @property
+    def hooks(self) -> Hooks or None:
+        return self._hooks
+
+    @hooks.setter
+    def hooks(self, value: Hooks or None):
+        if value is not None and not isinstance(value, Hooks):
+            raise ValueError('Hooks should be a Hooks instance or None')
+        self._hooks = value
+
+    @property
+    def single_flight(self) -> SingleFlight or AsyncSingleFlight or None:
+        return self._single_flight
+
+    def _start_call(self, payload: dict) -> HookCall or None:
+        if self._hooks is None:
+            return None
+        return self._hooks.start_call(payload)
+
+    @contextlib.contextmanager
+    def _measure(self, deadline: Deadline or None):
+        """Record the total time of a call, and its error if it failed"""
+        metrics = self._metrics
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            # The losers of hedged calls did not fail
+            if deadline is None or not deadline.cancelled:
+                metrics.error(error)
+            raise
+        finally:
+            metrics.observe('total', time.perf_counter() - start)
@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value: str or None) -> float or None:
+    """Parse a `Retry-After` header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the requests sent.
+
+    Every request deposits `ratio` tokens, every retry withdraws one.
+    `min_per_second` tokens are added over time so that retries are
+    possible at low request rates. When the API is degraded the budget
+    runs out and failures are reported instead of multiplying the load.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0,
+                 max_tokens: float = 100.0, initial_tokens: float = 10.0):
+        """
+        :param ratio: float: Retries allowed per request. 0.1 by default
+        :param min_per_second: float: Retries allowed per second
+                regardless of the traffic. 1 by default
+        :param max_tokens: float: Max number of retries saved up.
+                100 by default
+        :param initial_tokens: float: Retries available at start.
+                10 by default
+        """
+        if ratio < 0 or min_per_second < 0 or max_tokens < 1 \
+                or initial_tokens < 0:
+            raise ValueError('Invalid retry budget parameters')
+
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._max_tokens = max_tokens
+        self._tokens = min(max_tokens, initial_tokens)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def deposit(self):
+        """Account a request"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        """Take a token for a retry, False if the budget is exhausted"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self._max_tokens,
+            self._tokens + (now - self._updated) * self._min_per_second)
+        self._updated = now
+
+
+class RetryPolicy:
+    """
+    Retries of failed API calls with capped exponential backoff and
+    full jitter.
+
+    Only connection failures and the statuses in `retry_statuses` are
+    retried. Authentication errors and bad requests are never retried.
+    A policy, and thus its budget, may be shared by several clients.
+    """
+
+    DEFAULT_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+    def __init__(self, **kwargs):
+        """
+        :key max_retries: int: (optional) Max retries per call. 3 by default
+        :key backoff_base: float: (optional) Seconds of the first backoff.
+                0.5 by default
+        :key backoff_max: float: (optional) Backoff cap in seconds.
+                30 by default
+        :key retry_statuses: iterable: (optional) HTTP codes to retry.
+                429, 500, 502, 503, 504 by default
+        :key retry_connection_errors: bool: (optional) Retry failures to
+                connect or connections reset before a response.
+                True by default
+        :key retry_read_timeouts: bool: (optional) Retry calls the API did
+                not answer in time. The capture may be charged twice.
+                False by default
+        :key max_retry_after: float: (optional) Longest `Retry-After` wait
+                in seconds; the call fails if the server asks for more.
+                60 by default
+        :key budget: RetryBudget: (optional) Retry budget.
+                A `RetryBudget()` by default
+        """
+        self.max_retries = kwargs.get('max_retries', 3)
+        self.backoff_base = kwargs.get('backoff_base', 0.5)
+        self.backoff_max = kwargs.get('backoff_max', 30.0)
+        self.retry_statuses = frozenset(
+            kwargs.get('retry_statuses', self.DEFAULT_RETRY_STATUSES))
+        self.retry_connection_errors = \
+            kwargs.get('retry_connection_errors', True)
+        self.retry_read_timeouts = kwargs.get('retry_read_timeouts', False)
+        self.max_retry_after = kwargs.get('max_retry_after', 60.0)
+        self.budget = kwargs.get('budget') or RetryBudget()
+
+        if type(self.max_retries) is not int or self.max_retries < 0:
+            raise ValueError('Max retries should be a non-negative integer')
+        if self.backoff_base < 0 or self.backoff_max < self.backoff_base:
+            raise ValueError('Invalid backoff parameters')
+
+    def backoff(self, attempt: int) -> float:
+        """Randomized delay before the retry number `attempt` + 1"""
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def on_request(self):
+        """Account an API call in the retry budget"""
+        self.budget.deposit()
+
+    def retry_delay(self, attempt: int, status_code: int = None,
+                    retry_after: float = None,
+                    read_timeout: bool = False) -> float or None:
+        """
+        Decide whether to retry a failed call
+        :param attempt: int: Number of retries made so far
+        :param status_code: int: HTTP code, None for connection failures
+        :param retry_after: float: Seconds from the `Retry-After` header
+        :param read_timeout: bool: The API did not answer in time
+        :return: Seconds to wait before retrying, None to give up
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        if status_code is not None:
+            if status_code not in self.retry_statuses:
+                return None
+        elif read_timeout:
+            if not self.retry_read_timeouts:
+                return None
+        elif not self.retry_connection_errors:
+            return None
+
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+
+        if not self.budget.withdraw():
+            return None
+
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -0,0 +1,182 @@
+import threading
+from email.message import Message
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.exceptions import ChunkedEncodingError, ReadTimeout, \
+    ConnectionError as RequestsConnectionError
+
+from .pool import ConnectionPool, PhaseTrace
+
+
+class Transport:
+    """
+    HTTP client used by `ApiRequester`.
+
+    Lifecycle contract:
+    - a transport is shared by the threads of a client and must be
+      thread-safe;
+    - connections may be kept open and reused between calls;
+    - responses returned by `stream` hold their connection until they are
+      closed, `ApiRequester` always closes them;
+    - `close` drops the connections, later calls raise `RuntimeError`.
+
+    Responses expose `status_code`, `headers` (with a case-insensitive
+    `get`), `content`, `text`, `iter_content(chunk_size)`, `close()` and
+    the context manager protocol, like `requests.Response`.
+
+    Failures are reported by raising the exception types listed in
+    `connection_errors` and `read_timeout_errors`, so that retry policies
+    can tell them apart. Transports may record connection phases in
+    `PhaseTrace.current()` when it is set.
+    """
+
+    connection_errors = (ConnectionError,)
+    read_timeout_errors = (TimeoutError,)
+
+    def send(self, method: str, url: str, **kwargs):
+        """
+        Send a request and read the whole response body
+        :param method: str: HTTP method
+        :param url: str: URL, may include a query string
+        :key params: dict: (optional) Query parameters to encode
+        :key encoded: bool: (optional) The query string of `url` is
+                already encoded and should be sent as is
+        :key headers: dict: (optional) Request headers
+        :key json: (optional) JSON request body
+        :key timeout: tuple: (optional) Connect and read timeouts, seconds
+        :return: Response
+        """
+        raise NotImplementedError
+
+    def stream(self, method: str, url: str, **kwargs):
+        """
+        Send a request and return once the response headers are received,
+        accepts the same arguments as `send`
+        :return: Response with the body left to be read
+        """
+        raise NotImplementedError
+
+    @property
+    def closed(self) -> bool:
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Default transport: `requests` over a keep-alive `ConnectionPool`.
+
+    Reports pool waits, connects and TLS handshakes to `PhaseTrace`.
+    """
+
+    connection_errors = (RequestsConnectionError, ChunkedEncodingError)
+    read_timeout_errors = (ReadTimeout,)
+
+    def __init__(self, pool: ConnectionPool = None, **kwargs):
+        """
+        :param pool: ConnectionPool: (optional) Shared connection pool,
+                left open by `close`
+        :key pool_size: int: (optional) See `ConnectionPool`
+        :key keep_alive: bool: (optional) See `ConnectionPool`
+        :key idle_timeout: float: (optional) See `ConnectionPool`
+        """
+        self._owns_pool = pool is None
+        self._pool = ConnectionPool(**kwargs) if pool is None else pool
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool
+
+    @property
+    def closed(self) -> bool:
+        return self._pool.closed
+
+    def send(self, method: str, url: str, **kwargs):
+        return self._pool.request(method, url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs):
+        return self._pool.request(method, url, stream=True, **kwargs)
+
+    def close(self):
+        """Close the connection pool unless it is shared"""
+        if self._owns_pool:
+            self._pool.close()
+
+
+class FakeResponse:
+    """In-memory response of `FakeTransport`"""
+
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self.status_code = status_code
+        self.headers = Message()
+        for name, value in (headers or {}).items():
+            self.headers[name] = str(value)
+        self.content = body
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', 'replace')
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FakeTransport(Transport):
+    """
+    In-memory transport for tests, no network involved.
+
+    `handler` receives the method and the decoded query parameters and
+    returns a (status, headers, body) tuple, or raises to emulate
+    failures. Sent requests are recorded in `requests`.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def send(self, method: str, url: str, **kwargs):
+        if self._closed:
+            raise RuntimeError('Transport is closed')
+
+        query = dict(parse_qsl(urlsplit(url).query))
+        query.update(
+            {k: str(v) for k, v in (kwargs.get('params') or {}).items()})
+        with self._lock:
+            self.requests.append((method, query))
+
+        trace = PhaseTrace.current()
+        if trace is not None and trace.on_acquired is not None:
+            trace.on_acquired()
+
+        status, headers, body = self.handler(method, query)
+        return FakeResponse(status, headers, body)
+
+    def stream(self, method: str, url: str, **kwargs):
+        return self.send(method, url, **kwargs)
+
+    def close(self):
+        self._closed = True
@@ -0,0 +1,189 @@
+import collections
+import heapq
+import itertools
+import math
+import time
+from urllib.parse import urlsplit
+
+
+class Job:
+    """Capture waiting in a `JobScheduler`"""
+
+    __slots__ = ('index', 'spec', 'key', 'priority', 'expires', 'tenant',
+                 'domain', '_order')
+
+    def __init__(self, index: int, spec: dict, key: str or None,
+                 priority: int, expires: float, tenant: str, domain: str,
+                 order: int):
+        self.index = index
+        self.spec = spec
+        self.key = key
+        self.priority = priority
+        self.expires = expires
+        self.tenant = tenant
+        self.domain = domain
+        self._order = (priority, expires, order)
+
+    def __lt__(self, other: 'Job') -> bool:
+        return self._order < other._order
+
+    def call_spec(self) -> dict:
+        """
+        Spec passed to the client: without the scheduling keys and with
+        the time left before the deadline
+        """
+        spec = {k: v for k, v in self.spec.items()
+                if k not in JobScheduler.SCHEDULING_KEYS}
+        if self.expires != math.inf:
+            spec['deadline'] = max(0.001, self.expires - time.monotonic())
+        return spec
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def __repr__(self):
+        return '{}(index={}, priority={}, tenant={!r}, domain={!r})'.format(
+            self.__class__.__name__, self.index, self.priority, self.tenant,
+            self.domain)
+
+
+class JobScheduler:
+    """
+    Order in which the captures of a batch are run.
+
+    Specs may carry a `priority` (lower runs first, 0 by default), a
+    `deadline` in seconds and a `tenant` (any hashable queue name).
+    The most urgent priority always goes first; tenants with jobs of that
+    priority take turns, and each tenant runs its jobs by earliest
+    deadline. At most `max_per_domain` captures of the same site run at
+    once, the other jobs of that site wait without blocking the rest.
+
+    Not thread-safe: it is driven by the batch loop. One scheduler
+    serves one batch at a time.
+    """
+
+    SCHEDULING_KEYS = frozenset(('priority', 'tenant'))
+    DEFAULT_TENANT = 'default'
+
+    def __init__(self, max_per_domain: int = None):
+        """
+        :param max_per_domain: int: (optional) Max captures of one domain
+                in flight. Unlimited by default
+        """
+        if max_per_domain is not None \
+                and (type(max_per_domain) is not int or max_per_domain < 1):
+            raise ValueError('Max per domain should be a positive integer')
+
+        self._max_per_domain = max_per_domain
+        self._queues = {}
+        self._turns = collections.deque()
+        self._blocked = collections.defaultdict(list)
+        self._running = collections.Counter()
+        self._order = itertools.count()
+        self._size = 0
+
+    @property
+    def max_per_domain(self) -> int or None:
+        return self._max_per_domain
+
+    def __len__(self) -> int:
+        """Number of jobs waiting"""
+        return self._size
+
+    def push(self, index: int, spec: dict, key: str = None) -> Job:
+        """
+        Queue a normalized capture spec
+        :raises ValueError: invalid priority or deadline
+        """
+        try:
+            priority = int(spec.get('priority', 0))
+            deadline = spec.get('deadline')
+            expires = math.inf if deadline is None \
+                else time.monotonic() + float(deadline)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid priority or deadline')
+
+        tenant = spec.get('tenant', JobScheduler.DEFAULT_TENANT)
+        job = Job(index, spec, key, priority, expires, tenant,
+                  domain_of(spec.get('url')), next(self._order))
+        self._enqueue(job)
+        self._size += 1
+        return job
+
+    def pop(self) -> Job or None:
+        """
+        Next job to run, None if there are no jobs or all of them wait
+        for their domain. Call `done` once it is finished
+        """
+        best = None
+        for tenant in list(self._turns):
+            queue = self._queues[tenant]
+            # Jobs of a busy domain wait aside until one of its captures
+            # is done
+            while queue and self._busy(queue[0].domain):
+                job = heapq.heappop(queue)
+                heapq.heappush(self._blocked[job.domain], job)
+            if not queue:
+                del self._queues[tenant]
+                self._turns.remove(tenant)
+            elif best is None or queue[0].priority < best:
+                best = queue[0].priority
+        if best is None:
+            return None
+
+        while True:
+            tenant = self._turns[0]
+            self._turns.rotate(-1)
+            queue = self._queues[tenant]
+            if queue[0].priority == best:
+                break
+
+        job = heapq.heappop(queue)
+        if not queue:
+            del self._queues[tenant]
+            self._turns.remove(tenant)
+        self._size -= 1
+        if job.domain is not None:
+            self._running[job.domain] += 1
+        return job
+
+    def done(self, job: Job):
+        """Free the domain slot of a job returned by `pop`"""
+        if job.domain is None:
+            return
+        self._running[job.domain] -= 1
+        if not self._running[job.domain]:
+            del self._running[job.domain]
+
+        blocked = self._blocked.get(job.domain)
+        if blocked:
+            self._enqueue(heapq.heappop(blocked))
+            if not blocked:
+                del self._blocked[job.domain]
+
+    def _busy(self, domain: str or None) -> bool:
+        return self._max_per_domain is not None and domain is not None \
+            and self._running[domain] >= self._max_per_domain
+
+    def _enqueue(self, job: Job):
+        queue = self._queues.get(job.tenant)
+        if queue is None:
+            queue = self._queues[job.tenant] = []
+            self._turns.append(job.tenant)
+        heapq.heappush(queue, job)
+
+
+def domain_of(url) -> str or None:
+    """Host name of a capture URL, without `www.`"""
+    if not isinstance(url, str) or not url:
+        return None
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if host and host.startswith('www.'):
+        host = host[4:]
+    return host
@@ -0,0 +1,268 @@
+import hashlib
+import os
+import secrets
+import shutil
+import stat
+import time
+
+
+class BlobStore:
+    """
+    Content-addressed screenshot store.
+
+    Each distinct image is kept once, as a read-only blob named after its
+    SHA-256 digest, and output files are hard links to their blob: a
+    capture identical to an earlier one costs no data write. Output files
+    on another file system than the store get a copy of the blob instead.
+
+    Blobs are shared, so output files must not be modified in place.
+    Deleting an output file releases its blob, which `collect` removes.
+    """
+
+    BLOBS = 'blobs'
+    TMP = 'tmp'
+
+    def __init__(self, root: str, spill: int = 64 * 1024, depth: int = 2):
+        """
+        :param root: str: Store directory, created if needed
+        :param spill: int: Bytes of a response kept in memory while it
+                downloads; a larger one goes to a temporary file as it
+                arrives, so memory stays near the chunk size. Identical
+                captures within that size are never written.
+                64 KiB by default
+        :param depth: int: Blob directory levels of two hex digits.
+                2 by default
+        :raises ValueError: invalid spill size or depth
+        :raises OSError: the store directories cannot be created
+        """
+        if type(spill) is not int or spill < 0:
+            raise ValueError('Spill size should be a non-negative integer')
+        if type(depth) is not int or not 0 <= depth <= 8:
+            raise ValueError('Store depth should be in [0, 8]')
+
+        self._root = root
+        self._spill = spill
+        self._depth = depth
+        os.makedirs(os.path.join(root, BlobStore.BLOBS), exist_ok=True)
+        os.makedirs(os.path.join(root, BlobStore.TMP), exist_ok=True)
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    @property
+    def spill(self) -> int:
+        return self._spill
+
+    def path(self, digest: str) -> str:
+        """Blob file of a SHA-256 hex digest"""
+        return os.path.join(
+            self._root, BlobStore.BLOBS,
+            *[digest[2 * i:2 * i + 2] for i in range(self._depth)], digest)
+
+    def writer(self, filename: str) -> 'BlobWriter':
+        """
+        Writer hashing the data as it arrives, which links `filename`
+        to its blob on `commit`
+        """
+        return BlobWriter(self, filename)
+
+    def save(self, filename: str, data: bytes) -> str:
+        """
+        Store `data` and link `filename` to it
+        :return: str: SHA-256 hex digest of the data
+        :raises OSError: the blob or the file cannot be written
+        """
+        writer = self.writer(filename)
+        try:
+            writer.write(data)
+        except BaseException:
+            writer.discard()
+            raise
+        return writer.commit()
+
+    def collect(self, min_age: float = 3600.0) -> tuple:
+        """
+        Remove the blobs no output file links to anymore and temporary
+        files left by interrupted downloads
+        :param min_age: float: Seconds since the last write of a file
+                before it may be removed, so that captures in progress
+                keep theirs. 1 hour by default
+        :return: tuple: (number of files removed, bytes freed)
+        """
+        limit = time.time() - min_age
+        removed = freed = 0
+        for kind in (BlobStore.BLOBS, BlobStore.TMP):
+            for directory, _, names in os.walk(
+                    os.path.join(self._root, kind)):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        info = os.lstat(path)
+                        if info.st_mtime > limit or (
+                                kind == BlobStore.BLOBS
+                                and info.st_nlink > 1):
+                            continue
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                    removed += 1
+                    freed += info.st_size
+        return removed, freed
+
+    def _temp_file(self) -> tuple:
+        name = os.path.join(self._root, BlobStore.TMP,
+                            '{}.tmp'.format(secrets.token_hex(8)))
+        fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                     | getattr(os, 'O_BINARY', 0), 0o644)
+        return name, os.fdopen(fd, 'wb')
+
+    def _install(self, blob: str, data: bytes, tmp_name: str or None):
+        if tmp_name is None:
+            tmp_name, tmp_file = self._temp_file()
+            with tmp_file:
+                tmp_file.write(data)
+        try:
+            os.chmod(tmp_name, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp_name, blob)
+        except BaseException:
+            _remove(tmp_name)
+            raise
+
+    def _commit(self, digest: str, filename: str, data: bytes,
+                tmp_name: str or None):
+        blob = self.path(digest)
+        spilled = tmp_name is not None
+        if not os.path.exists(blob):
+            self._install(blob, data, tmp_name)
+            tmp_name = None
+        try:
+            link_file(blob, filename)
+        except FileNotFoundError:
+            if os.path.exists(blob) or (spilled and tmp_name is None):
+                raise
+            # Collected between the check and the link
+            self._install(blob, data, tmp_name)
+            tmp_name = None
+            link_file(blob, filename)
+        finally:
+            if tmp_name is not None:
+                _remove(tmp_name)
+
+
+class BlobWriter:
+    """
+    Response body on its way to a `BlobStore`, hashed while it downloads.
+    Same interface as `AtomicFile`: the target file is only replaced on
+    `commit`
+    """
+
+    def __init__(self, store: BlobStore, filename: str):
+        self._store = store
+        self._filename = filename
+        self._digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._tmp_name = None
+        self._file = None
+        self._closed = False
+        self.size = 0
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 hex digest of the data written so far"""
+        return self._digest.hexdigest()
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        if self._file is not None:
+            return self._file.write(data)
+
+        self._buffer += data
+        if len(self._buffer) > self._store.spill:
+            self._tmp_name, self._file = self._store._temp_file()
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        return len(data)
+
+    def commit(self) -> str:
+        """
+        Store the blob if it is new and link the target file to it
+        :return: str: SHA-256 hex digest of the data
+        """
+        digest = self._digest.hexdigest()
+        try:
+            if self._file is not None:
+                self._file.close()
+            self._store._commit(digest, self._filename, bytes(self._buffer),
+                                self._tmp_name)
+        except BaseException:
+            self.discard()
+            raise
+        self._tmp_name = None
+        self._closed = True
+        self._buffer = bytearray()
+        return digest
+
+    def discard(self):
+        """Drop the data, the target file is not modified"""
+        if self._file is not None:
+            self._file.close()
+        if self._tmp_name is not None:
+            _remove(self._tmp_name)
+            self._tmp_name = None
+        self._closed = True
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+def link_file(source: str, filename: str):
+    """
+    Atomically make `filename` a hard link of `source`, or a copy of it
+    on another file system
+    :raises OSError: the link or the copy cannot be written
+    """
+    try:
+        if os.path.samefile(source, filename):
+            return
+    except FileNotFoundError:
+        pass
+
+    directory, name = os.path.split(os.path.abspath(filename))
+    tmp_name = os.path.join(
+        directory, '.{}.{}.tmp'.format(name, secrets.token_hex(4)))
+    try:
+        os.link(source, tmp_name)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Another file system, or no hard links
+        shutil.copyfile(source, tmp_name)
+    try:
+        os.replace(tmp_name, filename)
+    finally:
+        _remove(tmp_name)
+
+
+def _remove(name: str):
+    try:
+        os.remove(name)
+    except FileNotFoundError:
+        pass
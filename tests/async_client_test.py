@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from screenshotapi import ApiAuthError, DiskCache, ParameterError
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+@unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+class TestAsyncClient(unittest.TestCase):
+
+    def test_concurrency_bounded(self):
+        lock = threading.Lock()
+        state = {'current': 0, 'max': 0}
+
+        def slow(query):
+            with lock:
+                state['current'] += 1
+                state['max'] = max(state['max'], state['current'])
+            time.sleep(0.05)
+            with lock:
+                state['current'] -= 1
+            return 200, {}, IMAGE
+
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url,
+                                   max_concurrency=3) as client:
+                return await asyncio.gather(*[
+                    client.get_raw(url='example.com') for _ in range(12)
+                ])
+
+        with StubServer(slow) as server:
+            results = run_async(run(server.url))
+
+        self.assertEqual(results, [IMAGE] * 12)
+        self.assertLessEqual(state['max'], 3)
+
+    def test_get_writes_file(self):
+        async def run(url, filename):
+            async with AsyncClient(API_KEY, base_url=url) as client:
+                await client.get(filename=filename, url='example.com',
+                                 full_page=True)
+
+        with StubServer() as server, tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'screen.jpg')
+            run_async(run(server.url, filename))
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), IMAGE)
+        self.assertEqual(server.queries[0]['fullPage'], 'True')
+
+    def test_validation(self):
+        client = AsyncClient(API_KEY)
+        with self.assertRaises(ParameterError):
+            run_async(client.get_raw(url='example.com', quality=150))
+
+    def test_auth_error(self):
+        with StubServer(lambda q: (403, {}, b'{"code": 403}')) as server:
+            async def run():
+                async with AsyncClient(API_KEY, base_url=server.url) as c:
+                    await c.get_raw(url='example.com')
+
+            with self.assertRaises(ApiAuthError):
+                run_async(run())
+
+    def test_disk_cache_off_loop(self):
+        threads = []
+
+        class ThreadCache(DiskCache):
+            def get(self, key):
+                threads.append(threading.current_thread())
+                return super().get(key)
+
+            def set(self, key, value):
+                threads.append(threading.current_thread())
+                super().set(key, value)
+
+        async def run(url, cache, filename):
+            async with AsyncClient(API_KEY, base_url=url,
+                                   cache=cache) as client:
+                for _ in range(2):
+                    self.assertEqual(
+                        await client.get_raw(url='example.com'), IMAGE)
+                await client.get(filename=filename, url='example.com',
+                                 full_page=True)
+
+        with StubServer() as server, tempfile.TemporaryDirectory() as tmp:
+            run_async(run(server.url, ThreadCache(tmp),
+                          os.path.join(tmp, 'screen.jpg')))
+        self.assertEqual(len(server.queries), 2)
+        self.assertGreaterEqual(len(threads), 4)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from screenshotapi import Client, ParameterError
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_results_and_errors(self):
+        specs = ['example.com', {'url': 'example.org', 'quality': 500},
+                 {'url': 'example.net', 'width': 400}, 42]
+
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            results = sorted(client.get_many(specs, workers=2),
+                             key=lambda r: r.index)
+
+        self.assertEqual([r.ok for r in results], [True, False, True, False])
+        self.assertEqual(results[0].result, IMAGE)
+        self.assertIsInstance(results[1].error, ParameterError)
+        self.assertEqual(results[2].spec, specs[2])
+
+    def test_lazy_input(self):
+        consumed = []
+
+        def specs():
+            for i in range(100):
+                consumed.append(i)
+                yield 'example{}.com'.format(i)
+
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            results = client.get_many(specs(), workers=2, queue_size=4)
+            next(results)
+            self.assertLessEqual(len(consumed), 5)
+            self.assertEqual(len(list(results)), 99)
+
+    def test_write_files(self):
+        with StubServer() as server, tempfile.TemporaryDirectory() as tmp:
+            client = Client(API_KEY, base_url=server.url)
+            specs = ({'url': 'example.com',
+                      'filename': os.path.join(tmp, '{}.jpg'.format(i))}
+                     for i in range(5))
+            for result in client.get_many(specs):
+                self.assertTrue(result.ok)
+                with open(result.filename, 'rb') as f:
+                    self.assertEqual(f.read(), IMAGE)
+
+    def test_invalid_workers(self):
+        client = Client(API_KEY)
+        with self.assertRaises(ValueError):
+            client.get_many([], workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from screenshotapi import Client, DiskCache, MemoryCache
+from screenshotapi.cache import payload_key
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_payload_key(self):
+        first = payload_key({'apiKey': 'a', 'url': 'x', 'width': 800})
+        second = payload_key({'width': 800, 'url': 'x', 'apiKey': 'b'})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, payload_key({'url': 'x', 'width': 801}))
+
+    def test_client_hits(self):
+        cache = DiskCache(self.tmp.name)
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url, cache=cache)
+            for _ in range(3):
+                self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+            buffer = io.BytesIO()
+            client.get_to_stream(buffer, url='example.com')
+            client.get_to_stream(buffer, url='example.com')
+            self.assertEqual(buffer.getvalue(), IMAGE * 2)
+
+            other = Client('at_' + 'b' * 29, base_url=server.url,
+                           cache=DiskCache(self.tmp.name))
+            self.assertEqual(other.get_raw(url='example.com'), IMAGE)
+
+        self.assertEqual(len(server.queries), 2)
+        self.assertEqual(cache.stats.hits, 3)
+        self.assertEqual(cache.stats.misses, 2)
+
+    def test_errors_not_cached(self):
+        cache = DiskCache(self.tmp.name)
+        with StubServer(lambda q: (500, {}, b'error')) as server:
+            client = Client(API_KEY, base_url=server.url, cache=cache)
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    client.get_raw(url='example.com')
+        self.assertEqual(len(server.queries), 2)
+        self.assertEqual(cache.stats.stores, 0)
+
+    def test_ttl(self):
+        cache = DiskCache(self.tmp.name, ttl=0.05)
+        cache.set('ab01', b'data')
+        self.assertEqual(cache.get('ab01'), b'data')
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('ab01'))
+        self.assertEqual(cache.stats.expirations, 1)
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.tmp.name, max_size=350)
+        for i, key in enumerate(('aa01', 'bb02', 'cc03')):
+            cache.set(key, b'x' * 100)
+            os.utime(cache._filename(key), (i, i))
+        cache.get('aa01')
+        cache.set('dd04', b'x' * 100)
+
+        self.assertIsNotNone(cache.get('aa01'))
+        self.assertIsNone(cache.get('bb02'))
+        self.assertIsNone(cache.get('cc03'))
+        self.assertLessEqual(cache.size, 350)
+        self.assertEqual(cache.stats.evictions, 2)
+
+    def test_overwrite(self):
+        cache = DiskCache(self.tmp.name, max_size=350)
+        for _ in range(5):
+            cache.set('aa01', b'x' * 100)
+        entry = os.path.getsize(cache._filename('aa01'))
+        self.assertEqual(cache.size, entry)
+        self.assertEqual(cache.stats.evictions, 0)
+
+        cache.delete('aa01')
+        self.assertEqual(cache.size, 0)
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_same_object_returned(self):
+        cache = MemoryCache(10 * len(IMAGE))
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url, cache=cache)
+            first = client.get_raw(url='example.com')
+            second = client.get_raw(url='example.com')
+        self.assertIs(first, second)
+        self.assertEqual(len(server.queries), 1)
+
+    def test_byte_budget(self):
+        cache = MemoryCache(250)
+        cache.set('a', b'x' * 100)
+        cache.set('b', b'x' * 100)
+        cache.get('a')
+        cache.set('c', b'x' * 100)
+        cache.set('huge', b'x' * 251)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(cache.size, 200)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_entry_ttl(self):
+        cache = MemoryCache(1000, ttl=60)
+        cache.set('short', b'data', ttl=0.05)
+        cache.set('long', b'data')
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('long'), b'data')
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from screenshotapi import cli
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+def outputs(root: str) -> list:
+    return sorted(os.path.relpath(os.path.join(path, name), root)
+                  for path, _, names in os.walk(root) for name in names
+                  if name != cli.JOURNAL_NAME)
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, 'out')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def run_cli(self, server, filename: str, *args) -> tuple:
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            code = cli.main([filename, '-o', self.output, '-k', API_KEY,
+                             '--base-url', server.url, '--retries', '0',
+                             '-c', '2'] + list(args))
+        return code, stderr.getvalue()
+
+    def write(self, name: str, text: str, compress: bool = False) -> str:
+        path = os.path.join(self.tmp.name, name)
+        opener = gzip.open if compress else open
+        with opener(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def test_gzipped_jsonl(self):
+        rows = [{'url': 'example.com/{}'.format(i), 'width': 400 + i}
+                for i in range(5)]
+        path = self.write('urls.jsonl.gz', '\n'.join(map(json.dumps, rows)),
+                          compress=True)
+
+        with StubServer() as server:
+            code, stderr = self.run_cli(server, path, '-O', 'type=png')
+
+        self.assertEqual(code, 0)
+        self.assertIn('5 done, 0 errors', stderr)
+        files = outputs(self.output)
+        self.assertEqual(len(files), 5)
+        for name in files:
+            parts = name.split(os.sep)
+            self.assertEqual(len(parts), 3)
+            self.assertTrue(parts[2].startswith(parts[0] + parts[1]))
+            self.assertTrue(name.endswith('.png'))
+            with open(os.path.join(self.output, name), 'rb') as f:
+                self.assertEqual(f.read(), IMAGE)
+
+        widths = sorted(int(q['width']) for q in server.queries)
+        self.assertEqual(widths, [400, 401, 402, 403, 404])
+
+    def test_csv_with_errors(self):
+        path = self.write('urls.csv', 'url,full_page\n'
+                                      'example.com,true\n'
+                                      'fail.example.com,false\n')
+
+        def handler(query):
+            if query['url'].startswith('fail'):
+                return 400, {}, b'Bad URL'
+            return 200, {}, IMAGE
+
+        with StubServer(handler) as server:
+            code, stderr = self.run_cli(server, path, '--shard-depth', '0')
+
+        self.assertEqual(code, 1)
+        self.assertIn('fail.example.com\t400 Bad URL', stderr)
+        self.assertIn('2 done, 1 errors', stderr)
+        self.assertEqual(len(outputs(self.output)), 1)
+        full_page = {q['url']: q.get('fullPage') for q in server.queries}
+        self.assertEqual(full_page, {'example.com': 'True',
+                                     'fail.example.com': None})
+
+    def test_fractional_option(self):
+        path = self.write('urls.txt', 'example.com\nexample.org\n')
+        with StubServer() as server:
+            code, stderr = self.run_cli(server, path, '-O', 'scale=1.5')
+
+        self.assertEqual(code, 0)
+        self.assertEqual([q['scale'] for q in server.queries], ['1.5'] * 2)
+        self.assertEqual(cli.coerce('scale', '2.5'), 2.5)
+        self.assertEqual(cli.coerce('scale', 'nan'), 'nan')
+
+    def test_coerce_by_option(self):
+        self.assertEqual(cli.coerce('width', '1024'), 1024)
+        self.assertIs(cli.coerce('full_page', 'True'), True)
+        self.assertEqual(cli.coerce('scale', '2'), 2)
+        # Values are not typed by their shape
+        self.assertEqual(cli.coerce('url', '12345'), '12345')
+        self.assertEqual(cli.coerce('ua', 'true'), 'true')
+        self.assertEqual(cli.coerce('width', 'wide'), 'wide')
+
+        path = self.write('urls.csv', 'url,width\n12345,400\n')
+        rows = list(cli.read_specs(path))
+        self.assertEqual(rows, [{'url': '12345', 'width': 400}])
+
+    def test_invalid_input(self):
+        path = self.write('urls.jsonl', '{"width": 400}\n')
+        with StubServer() as server:
+            code, stderr = self.run_cli(server, path)
+        self.assertEqual(code, 1)
+        self.assertIn('Line 1: url key required', stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from screenshotapi import Client, DeadlineExceededError, FakeTransport, \
+    HttpApiError
+from screenshotapi.net import async_http
+from screenshotapi.net.coalesce import AsyncSingleFlight, SingleFlight
+from screenshotapi.net.deadline import Deadline
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+
+def slow_image(query):
+    time.sleep(0.2)
+    return 200, {}, IMAGE
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_coalesced(self):
+        with StubServer(slow_image) as server:
+            client = Client(API_KEY, base_url=server.url, coalesce=True)
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(
+                    lambda _: client.get_raw(url='example.com'), range(8)))
+
+        self.assertEqual(results, [IMAGE] * 8)
+        self.assertEqual(len(server.queries), 1)
+        self.assertEqual(client.api_requester.single_flight.coalesced, 7)
+
+    def test_error_shared(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise HttpApiError('error')
+
+        def follow():
+            started.wait()
+            try:
+                flight.do('key', lambda: b'unexpected')
+            except HttpApiError as error:
+                errors.append(error)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        with self.assertRaises(HttpApiError):
+            flight.do('key', fail)
+        follower.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_async_leader_cancelled(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def capture():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return IMAGE
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do('key', capture))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do('key', capture))
+                         for _ in range(2)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            return leader.cancelled(), results
+
+        cancelled, results = run_async(run())
+        self.assertTrue(cancelled)
+        self.assertEqual(results, [IMAGE, IMAGE])
+        self.assertEqual(len(calls), 1)
+
+        # Without any caller left, the call itself is cancelled
+        async def abandon():
+            caller = asyncio.ensure_future(flight.do('key', capture))
+            await asyncio.sleep(0.01)
+            caller.cancel()
+            await asyncio.sleep(0.1)
+
+        run_async(abandon())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flight._calls, {})
+
+    def test_follower_deadline(self):
+        started = threading.Event()
+
+        def handler(method, query):
+            started.set()
+            time.sleep(1)
+            return 200, {}, IMAGE
+
+        client = Client(API_KEY, coalesce=True,
+                        transport=FakeTransport(handler))
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(client.get_raw, url='example.com',
+                                     deadline=5)
+            started.wait()
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceededError):
+                client.get_raw(url='example.com', deadline=0.2)
+            self.assertLess(time.monotonic() - start, 0.7)
+            self.assertEqual(leader.result(), IMAGE)
+
+        flight = AsyncSingleFlight()
+
+        async def capture():
+            await asyncio.sleep(0.5)
+            return IMAGE
+
+        async def run():
+            leader = asyncio.ensure_future(
+                flight.do('key', capture, Deadline(5)))
+            await asyncio.sleep(0)
+            with self.assertRaises(DeadlineExceededError):
+                await flight.do('key', capture, Deadline(0.1))
+            self.assertFalse(leader.done())
+            return await leader
+
+        self.assertEqual(run_async(run()), IMAGE)
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async_coalesced(self):
+        from screenshotapi import AsyncClient
+
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url,
+                                   coalesce=True) as client:
+                return await asyncio.gather(*[
+                    client.get_raw(url='example.com') for _ in range(10)])
+
+        with StubServer(slow_image) as server:
+            results = run_async(run(server.url))
+
+        self.assertEqual(results, [IMAGE] * 10)
+        self.assertEqual(len(server.queries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from screenshotapi import AdaptiveLimiter, Client, FakeTransport, \
+    HttpApiError, Metrics, PrometheusExporter
+from tests.server import API_KEY, IMAGE, run_async
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def fill(self, limiter: AdaptiveLimiter) -> list:
+        return [limiter.acquire() for _ in range(limiter.limit)]
+
+    def test_additive_increase(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=3)
+        for _ in range(10):
+            for token in self.fill(limiter):
+                limiter.release(token)
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual(limiter.in_flight, 0)
+
+        # Unused capacity does not grow the limit
+        limiter = AdaptiveLimiter(initial=2)
+        for _ in range(10):
+            limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 2)
+
+    def test_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter(initial=8, min_limit=3)
+        tokens = self.fill(limiter)
+        self.assertIsNone(limiter.acquire(timeout=0.01))
+
+        # One cut for the calls in flight together
+        for token in tokens:
+            limiter.release(token, AdaptiveLimiter.OVERLOAD)
+        self.assertEqual(limiter.limit, 4)
+
+        for _ in range(3):
+            limiter.release(limiter.acquire(), AdaptiveLimiter.OVERLOAD)
+        self.assertEqual(limiter.limit, 3)
+
+        limiter.release(limiter.acquire(), AdaptiveLimiter.IGNORE)
+        self.assertEqual(limiter.limit, 3)
+
+    def test_latency_spike(self):
+        limiter = AdaptiveLimiter(initial=4, warmup=5)
+        for _ in range(10):
+            limiter.release(limiter.acquire())
+
+        token = limiter.acquire()
+        generation, start = token
+        limiter.release((generation, start - 60))
+        self.assertEqual(limiter.limit, 2)
+
+    def test_waiters_are_woken(self):
+        limiter = AdaptiveLimiter(initial=1)
+        token = limiter.acquire()
+        threading.Timer(0.05, limiter.release, (token,)).start()
+
+        async def acquire():
+            return await asyncio.wait_for(limiter.acquire_async(), 5)
+
+        self.assertIsNotNone(run_async(acquire()))
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_client_backs_off(self):
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'peak': 0}
+
+        def handler(method, query):
+            with lock:
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+            time.sleep(0.005)
+            with lock:
+                state['in_flight'] -= 1
+            if query['url'].startswith('busy'):
+                return 429, {}, b'Too many requests'
+            return 200, {}, IMAGE
+
+        limiter = AdaptiveLimiter(initial=4, max_limit=6)
+        metrics = Metrics()
+        client = Client(API_KEY, transport=FakeTransport(handler),
+                        concurrency_limiter=limiter, metrics=metrics)
+
+        specs = ['busy{}.example.com'.format(i) for i in range(12)]
+        results = list(client.get_many(specs))
+        self.assertTrue(all(isinstance(r.error, HttpApiError)
+                            for r in results))
+        self.assertEqual(limiter.limit, 1)
+        self.assertLessEqual(state['peak'], 4)
+
+        text = metrics.export(PrometheusExporter())
+        self.assertIn('# TYPE screenshotapi_concurrency_limit gauge', text)
+        self.assertIn('screenshotapi_concurrency_limit 1\n', text)
+        self.assertIn('screenshotapi_in_flight 0\n', text)
+
+    def test_invalid_limits(self):
+        for kwargs in ({'initial': 0}, {'min_limit': 4, 'max_limit': 2},
+                       {'decrease': 1}, {'latency_tolerance': 1}):
+            with self.assertRaises(ValueError):
+                AdaptiveLimiter(**kwargs)
+        with self.assertRaises(ValueError):
+            Client(API_KEY, concurrency_limiter=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
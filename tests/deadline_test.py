@@ -0,0 +1,139 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from screenshotapi import Client, ConnectionPool, DeadlineExceededError, \
+    FakeTransport, HttpApiError, ParameterError, RetryPolicy
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+class RecordingTransport(FakeTransport):
+    def __init__(self, handler):
+        super().__init__(handler)
+        self.timeouts = []
+
+    def send(self, method: str, url: str, **kwargs):
+        self.timeouts.append(kwargs.get('timeout'))
+        return super().send(method, url, **kwargs)
+
+
+def slow(query):
+    if query['url'].startswith('slow'):
+        time.sleep(1)
+    return 200, {'Content-Type': 'image/jpeg'}, IMAGE
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_retries_stop_at_deadline(self):
+        statuses = iter([503, 503])
+
+        def flaky(method, query):
+            for status in statuses:
+                return status, {'Retry-After': '0'}, b'Unavailable'
+            return 200, {}, IMAGE
+
+        retry = RetryPolicy(max_retries=5, backoff_base=0.001,
+                            backoff_max=0.01)
+        client = Client(API_KEY, transport=FakeTransport(flaky),
+                        retry=retry, deadline=5)
+        self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+        # A backoff longer than the time left fails at once
+        transport = FakeTransport(
+            lambda method, query: (503, {'Retry-After': '10'}, b''))
+        client = Client(API_KEY, transport=transport, retry=retry)
+        start = time.monotonic()
+        with self.assertRaises(HttpApiError):
+            client.get_raw(url='example.com', deadline=2)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_slow_server(self):
+        with StubServer(slow) as server, \
+                tempfile.TemporaryDirectory() as tmp:
+            client = Client(API_KEY, base_url=server.url)
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceededError):
+                client.get_raw(url='slow.example.com', deadline=0.2)
+            self.assertLess(time.monotonic() - start, 0.8)
+
+            filename = os.path.join(tmp, 'slow.jpg')
+            client.deadline = 0.2
+            with self.assertRaises(DeadlineExceededError):
+                client.get(url='slow.example.com', filename=filename)
+            self.assertFalse(os.path.exists(filename))
+
+            client.get(url='example.com', filename=filename)
+            self.assertTrue(os.path.exists(filename))
+
+    def test_error_status(self):
+        with StubServer(lambda query: (503, {}, b'Unavailable')) as server:
+            client = Client(API_KEY, base_url=server.url, deadline=5)
+            with self.assertRaises(HttpApiError) as context:
+                client.get_raw(url='example.com')
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(context.exception.message, 'Unavailable')
+
+    def test_pool_wait(self):
+        pool = ConnectionPool(pool_size=1, block=True)
+        with StubServer(slow) as server:
+            client = Client(API_KEY, base_url=server.url, pool=pool)
+            busy = threading.Thread(
+                target=client.get_raw, kwargs={'url': 'slow.example.com'})
+            busy.start()
+            time.sleep(0.1)
+            with self.assertRaises(DeadlineExceededError) as raised:
+                client.get_raw(url='example.com', deadline=0.2)
+            self.assertIn('pooled connection', raised.exception.message)
+            busy.join()
+        pool.close()
+
+    def test_timeouts(self):
+        transport = RecordingTransport(lambda method, query: (200, {}, IMAGE))
+        client = Client(API_KEY, transport=transport)
+        client.get_raw(url='example.com')
+        client.get_raw(url='example.com', timeout=30000, delay=5000)
+        self.assertEqual(transport.timeouts, [(10, 25.25), (10, 45.0)])
+
+        client.get_raw(url='example.com', deadline=3)
+        connect_timeout, read_timeout = transport.timeouts[-1]
+        self.assertLessEqual(connect_timeout, 3)
+        self.assertLessEqual(read_timeout, 3)
+
+        client.timeout = 5
+        client.get_raw(url='example.com', timeout=30000)
+        self.assertEqual(transport.timeouts[-1], (10, 5))
+
+        with self.assertRaises(ParameterError):
+            client.get_raw(url='example.com', deadline=0)
+        with self.assertRaises(ValueError):
+            Client(API_KEY, deadline=-1)
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async(self):
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url, deadline=0.2,
+                                   max_concurrency=1) as client:
+                return await asyncio.gather(
+                    client.get_raw(url='slow.example.com'),
+                    client.get_raw(url='example.com'),
+                    return_exceptions=True)
+
+        with StubServer(slow) as server:
+            start = time.monotonic()
+            results = run_async(run(server.url))
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertTrue(all(isinstance(r, DeadlineExceededError)
+                            for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
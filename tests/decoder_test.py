@@ -0,0 +1,67 @@
+import base64
+import os
+import tempfile
+import unittest
+
+from screenshotapi import Client, FileError, ResponseError
+from screenshotapi.decoder import Base64StreamDecoder
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+def decode_chunks(body: bytes, size: int) -> bytes:
+    decoder = Base64StreamDecoder()
+    result = b''.join(decoder.decode(body[i:i + size])
+                      for i in range(0, len(body), size))
+    decoder.finish()
+    return result
+
+
+class TestBase64StreamDecoder(unittest.TestCase):
+
+    data = bytes(range(256)) * 7
+
+    def test_chunk_sizes(self):
+        body = b'data:image/png;base64,' + base64.b64encode(self.data)
+        for size in (1, 2, 3, 5, 7, 64, len(body)):
+            self.assertEqual(decode_chunks(body, size), self.data)
+
+    def test_without_prefix(self):
+        body = base64.encodebytes(self.data)
+        self.assertEqual(decode_chunks(body, 10), self.data)
+
+    def test_invalid(self):
+        with self.assertRaises(ResponseError):
+            decode_chunks(b'data:image/png;base64,@@@@', 4)
+        with self.assertRaises(ResponseError):
+            decode_chunks(base64.b64encode(self.data)[:-1], 4)
+        with self.assertRaises(ResponseError):
+            decode_chunks(b'data:', 4)
+
+
+class TestDecodingClient(unittest.TestCase):
+
+    def test_get_decodes_base64(self):
+        with StubServer() as server, tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'screen.jpg')
+            client = Client(API_KEY, base_url=server.url, chunk_size=10)
+            client.get(filename=filename, url='example.com',
+                       decode_base64=True)
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), IMAGE)
+        self.assertEqual(server.queries[0]['imageOutputFormat'], 'BASE64')
+
+    def test_get_into_buffer(self):
+        buffer = bytearray(len(IMAGE) + 10)
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            size = client.get_into(buffer, url='example.com',
+                                   decode_base64=True)
+            self.assertEqual(size, len(IMAGE))
+            self.assertEqual(buffer[:size], IMAGE)
+
+            with self.assertRaises(FileError):
+                client.get_into(bytearray(10), url='example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from screenshotapi import Client, DedupIndex, DiskDedupIndex, FakeTransport
+from screenshotapi.dedup import canonical_spec, canonical_url, dedup_key
+from tests.server import API_KEY, IMAGE
+
+
+def counting_handler():
+    lock = threading.Lock()
+    urls = []
+
+    def handler(method, query):
+        with lock:
+            urls.append(query['url'])
+        return 200, {}, IMAGE + query['url'].encode()
+
+    return handler, urls
+
+
+class TestCanonical(unittest.TestCase):
+
+    def test_url(self):
+        for url in ('example.com', 'http://example.com/', 'HTTP://Example.com',
+                    'http://EXAMPLE.com:80', ' example.com. '):
+            self.assertEqual(canonical_url(url), 'http://example.com/')
+
+        self.assertEqual(canonical_url('https://a.com:443/%7euser?q=%2f'),
+                         'https://a.com/~user?q=%2F')
+        self.assertEqual(canonical_url('a.com:8080/A#/route'),
+                         'http://a.com:8080/A#/route')
+
+    def test_spec(self):
+        spec = canonical_spec({'url': 'Example.com', 'width': 800,
+                               'full_page': False, 'mode': 'FAST',
+                               'type': 'PNG', 'response_format': 'json',
+                               'priority': 1})
+        self.assertEqual(spec, {'url': 'http://example.com/', 'type': 'png',
+                                'priority': 1})
+        # Invalid values are left for the client to report
+        self.assertEqual(canonical_spec({'url': 'a.com', 'scale': True}),
+                         {'url': 'http://a.com/', 'scale': True})
+
+        key = dedup_key(spec)
+        self.assertEqual(key, dedup_key(canonical_spec(
+            {'url': 'http://example.com', 'type': 'png', 'deadline': 5})))
+        self.assertNotEqual(key, dedup_key(dict(spec, filename='a.png')))
+
+
+class TestDedupIndex(unittest.TestCase):
+
+    def test_indexes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in (DedupIndex(), DiskDedupIndex(tmp)):
+                key = dedup_key({'url': 'http://example.com/'})
+                self.assertIsNone(index.claim(key, 3))
+                self.assertEqual(index.claim(key, 5), 3)
+                self.assertIsNone(index.outcome(key))
+                index.finish(key, data=IMAGE)
+                self.assertEqual(index.outcome(key), (3, None, IMAGE))
+                self.assertIn(key, index)
+
+                index.discard(key)
+                self.assertEqual(len(index), 0)
+                self.assertIsNone(index.claim(key, 7))
+                index.close()
+            self.assertEqual(os.listdir(tmp), [])
+
+
+class TestGetManyDedupe(unittest.TestCase):
+
+    def test_shared_results(self):
+        handler, urls = counting_handler()
+        client = Client(API_KEY, transport=FakeTransport(handler))
+        specs = ['example.com', 'http://example.com/', 'other.com',
+                 {'url': 'HTTP://Example.com', 'width': 800},
+                 {'url': 'example.com', 'width': 1024}]
+
+        results = sorted(client.get_many(specs, workers=2, dedupe=True),
+                         key=lambda r: r.index)
+        self.assertEqual(sorted(urls), [
+            'http://example.com/', 'http://example.com/',
+            'http://other.com/'])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual([r.shared for r in results],
+                         [None, 0, None, 0, None])
+        self.assertEqual(results[1].result, results[0].result)
+
+        # An index given by the caller outlives the batch
+        with DiskDedupIndex() as index:
+            for captures in (1, 0):
+                del urls[:]
+                results = list(client.get_many(
+                    ['a.com', 'A.com/'], workers=1, dedupe=index))
+                self.assertTrue(all(r.ok for r in results))
+                self.assertEqual(len(urls), captures)
+
+        with self.assertRaises(ValueError):
+            client.get_many(specs, dedupe='yes')
+
+    def test_shared_files(self):
+        handler, urls = counting_handler()
+        client = Client(API_KEY, transport=FakeTransport(handler))
+        with tempfile.TemporaryDirectory() as tmp:
+            specs = [{'url': 'example.com/page',
+                      'filename': os.path.join(tmp, '{}.jpg'.format(i))}
+                     for i in range(3)]
+            results = list(client.get_many(specs, workers=1, dedupe=True))
+
+            self.assertEqual(len(urls), 1)
+            self.assertTrue(all(r.ok for r in results))
+            for spec in specs:
+                with open(spec['filename'], 'rb') as f:
+                    self.assertEqual(f.read(),
+                                     IMAGE + b'http://example.com/page')
+
+
+if __name__ == '__main__':
+    unittest.main()
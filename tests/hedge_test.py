@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from screenshotapi import ApiAuthError, Client, FakeTransport, \
+    HedgePolicy, Metrics, RetryBudget
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+def first_call_slow():
+    lock = threading.Lock()
+    calls = []
+
+    def handler(query):
+        with lock:
+            calls.append(query['url'])
+            first = len(calls) == 1
+        if first:
+            time.sleep(1)
+        return 200, {'Content-Type': 'image/jpeg'}, IMAGE
+
+    return handler
+
+
+def warm_policy(**kwargs) -> HedgePolicy:
+    policy = HedgePolicy(warmup=1, **kwargs)
+    policy.observe(0.01)
+    return policy
+
+
+class TestHedgePolicy(unittest.TestCase):
+
+    def test_delay(self):
+        policy = HedgePolicy(percentile=90, min_delay=0.5, max_delay=50,
+                             window=100, warmup=10)
+        for i in range(9):
+            policy.observe(i + 1)
+        self.assertIsNone(policy.delay())
+
+        for i in range(9, 200):
+            policy.observe(i + 1)
+        # Only the last 100 latencies count
+        self.assertEqual(policy.delay(), 50)
+        policy = HedgePolicy(percentile=90, min_delay=0.5, warmup=10)
+        for i in range(100):
+            policy.observe((i + 1) / 100)
+        self.assertEqual(policy.delay(), 0.9)
+
+        for kwargs in ({'percentile': 100}, {'min_delay': 2, 'max_delay': 1},
+                       {'window': 10, 'warmup': 20}, {'budget': 5}):
+            with self.assertRaises(ValueError):
+                HedgePolicy(**kwargs)
+        with self.assertRaises(ValueError):
+            Client(API_KEY, hedge=0.95)
+
+    def test_duplicate_wins(self):
+        metrics = Metrics()
+        budget = RetryBudget(ratio=1, min_per_second=0, initial_tokens=1)
+        with StubServer(first_call_slow()) as server:
+            client = Client(API_KEY, base_url=server.url, metrics=metrics,
+                            hedge=warm_policy(budget=budget))
+            start = time.monotonic()
+            self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+            self.assertLess(time.monotonic() - start, 0.8)
+            self.assertEqual(len(server.queries), 2)
+            client.close()
+
+        self.assertEqual(metrics.hedges.get('sent'), 1)
+        self.assertEqual(metrics.hedges.get('won'), 1)
+        self.assertEqual(metrics.errors.samples(), [])
+
+    def test_error_status(self):
+        with StubServer(lambda query: (403, {}, b'Forbidden')) as server:
+            client = Client(API_KEY, base_url=server.url,
+                            hedge=warm_policy())
+            with self.assertRaises(ApiAuthError) as context:
+                client.get_raw(url='example.com')
+            client.close()
+        self.assertEqual(context.exception.status_code, 403)
+
+    def test_budget(self):
+        def handler(method, query):
+            time.sleep(0.2)
+            return 200, {}, IMAGE
+
+        metrics = Metrics()
+        budget = RetryBudget(ratio=0, min_per_second=0, initial_tokens=0)
+        transport = FakeTransport(handler)
+        client = Client(API_KEY, transport=transport, metrics=metrics,
+                        hedge=warm_policy(budget=budget))
+        self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(metrics.hedges.get('denied'), 1)
+        self.assertEqual(metrics.hedges.get('sent'), 0)
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async(self):
+        metrics = Metrics()
+        budget = RetryBudget(ratio=1, min_per_second=0, initial_tokens=1)
+
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url, metrics=metrics,
+                                   hedge=warm_policy(budget=budget)) \
+                    as client:
+                return await client.get_raw(url='example.com')
+
+        with StubServer(first_call_slow()) as server:
+            start = time.monotonic()
+            self.assertEqual(run_async(run(server.url)), IMAGE)
+            self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(metrics.hedges.get('won'), 1)
+        # The cancelled loser is not an error
+        self.assertEqual(metrics.errors.samples(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
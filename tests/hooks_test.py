@@ -0,0 +1,135 @@
+import threading
+import unittest
+
+from screenshotapi import ApiAuthError, Client, Hooks, HttpApiError, \
+    RetryPolicy
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def hooks(self) -> Hooks:
+        return Hooks(**{name: self for name in Hooks.EVENTS})
+
+    def names(self) -> list:
+        return [event.name for event in self.events]
+
+
+class TestHooks(unittest.TestCase):
+
+    def test_sync_lifecycle(self):
+        recorder = Recorder()
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url,
+                            hooks=recorder.hooks(), chunk_size=512)
+            client.get_raw(url='example.com')
+
+        self.assertEqual(recorder.names(), [
+            'on_validate', 'on_request_start', 'on_connection_acquired',
+            'on_response_headers', 'on_chunk', 'on_chunk', 'on_complete'])
+
+        complete = recorder.events[-1]
+        self.assertEqual(complete.status_code, 200)
+        self.assertEqual(complete.size, len(IMAGE))
+        self.assertEqual(complete.attempt, 1)
+        self.assertGreater(complete.elapsed, 0)
+        for event in recorder.events:
+            self.assertEqual(event.payload['apiKey'], '***')
+            self.assertEqual(event.payload['url'], 'example.com')
+        self.assertEqual(len({e.call_id for e in recorder.events[1:]}), 1)
+
+    def test_retries_and_errors(self):
+        recorder = Recorder()
+        statuses = iter([503, 200])
+
+        def flaky(query):
+            status = next(statuses)
+            return status, {}, IMAGE if status == 200 else b'Busy'
+
+        with StubServer(flaky) as server:
+            retry = RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+            client = Client(API_KEY, base_url=server.url, retry=retry,
+                            hooks=Hooks(on_error=recorder,
+                                        on_complete=recorder))
+            client.get_raw(url='example.com')
+
+        error, complete = recorder.events
+        self.assertEqual(error.name, 'on_error')
+        self.assertEqual(error.attempt, 1)
+        self.assertEqual(error.error.status_code, 503)
+        self.assertEqual(complete.attempt, 2)
+
+    def test_chunk_hook_errors(self):
+        recorder = Recorder()
+        for status, error_class in ((403, ApiAuthError),
+                                    (503, HttpApiError)):
+            with StubServer(lambda query: (status, {}, b'Denied')) \
+                    as server:
+                client = Client(API_KEY, base_url=server.url,
+                                hooks=Hooks(on_chunk=recorder))
+                with self.assertRaises(error_class) as context:
+                    client.get_raw(url='example.com')
+            self.assertEqual(context.exception.status_code, status)
+            self.assertEqual(context.exception.message, 'Denied')
+        self.assertEqual(len(recorder.events), 2)
+
+    def test_failing_hook_ignored(self):
+        def broken(event):
+            raise RuntimeError('broken hook')
+
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url,
+                            hooks=Hooks(on_chunk=broken))
+            with self.assertLogs('screenshotapi-hooks'):
+                self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+        with self.assertRaises(ValueError):
+            Hooks(on_nothing=broken)
+
+    def test_batch(self):
+        recorder = Recorder()
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url,
+                            hooks=Hooks(on_complete=recorder))
+            urls = ['example.com/{}'.format(i) for i in range(6)]
+            results = list(client.get_many(urls, workers=3))
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(sorted(e.payload['url'] for e in recorder.events),
+                         sorted(urls))
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async_lifecycle(self):
+        recorder = Recorder()
+
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url,
+                                   hooks=recorder.hooks(),
+                                   chunk_size=512) as client:
+                return await client.get_raw(url='example.com')
+
+        with StubServer() as server:
+            self.assertEqual(run_async(run(server.url)), IMAGE)
+
+        names = recorder.names()
+        self.assertEqual(names[:4], [
+            'on_validate', 'on_request_start', 'on_connection_acquired',
+            'on_response_headers'])
+        self.assertIn('on_chunk', names)
+        self.assertEqual(names[-1], 'on_complete')
+        self.assertEqual(recorder.events[-1].size, len(IMAGE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from screenshotapi import Client, HttpApiError, RetryPolicy
+from screenshotapi.net import http2
+from tests.server import API_KEY, IMAGE, H2StubServer
+
+if http2.h2 is not None:
+    from screenshotapi import Http2Transport
+
+LARGE = bytes(range(256)) * (12 * 1024)
+
+
+def handler(query):
+    if query['url'].startswith('large'):
+        return 200, {'Content-Type': 'image/jpeg'}, LARGE
+    if query['url'].startswith('slow'):
+        time.sleep(0.5)
+    return 200, {'Content-Type': 'image/jpeg'}, IMAGE
+
+
+@unittest.skipIf(http2.h2 is None, 'h2 is not installed')
+class TestHttp2Transport(unittest.TestCase):
+
+    def test_multiplexing(self):
+        with H2StubServer(handler) as server:
+            transport = Http2Transport(max_connections=1)
+            client = Client(API_KEY, base_url=server.url, transport=transport)
+            urls = ['example{}.com'.format(i) for i in range(40)]
+            with ThreadPoolExecutor(20) as executor:
+                bodies = list(executor.map(
+                    lambda url: client.get_raw(url=url), urls))
+            transport.close()
+
+        self.assertEqual(bodies, [IMAGE] * 40)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(sorted(q['url'] for q in server.queries),
+                         sorted(urls))
+
+    def test_flow_control(self):
+        with H2StubServer(handler) as server, \
+                tempfile.TemporaryDirectory() as tmp:
+            # Minimal windows: the body arrives as the client reads it
+            transport = Http2Transport(window_size=65535,
+                                       connection_window=65535)
+            client = Client(API_KEY, base_url=server.url, transport=transport)
+            self.assertEqual(client.get_raw(url='large.com'), LARGE)
+
+            filename = os.path.join(tmp, 'large.jpg')
+            client.get(url='large.com', filename=filename)
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), LARGE)
+            transport.close()
+
+    def test_cancel_and_timeout(self):
+        with H2StubServer(handler) as server:
+            transport = Http2Transport(max_connections=1, max_streams=1,
+                                       window_size=65535)
+            url = server.url + '?url=large.com'
+            with transport.stream('GET', url) as response:
+                self.assertEqual(response.status_code, 200)
+                next(response.iter_content(1024))
+
+            # The single stream is free again after the reset
+            with self.assertRaises(TimeoutError):
+                transport.stream('GET', server.url + '?url=slow.com',
+                                 timeout=(5, 0.05))
+            self.assertEqual(
+                transport.send('GET', url, timeout=(5, 5)).content, LARGE)
+            self.assertEqual(transport.connection_count, 1)
+
+            transport.close()
+            with self.assertRaises(RuntimeError):
+                transport.send('GET', url)
+        self.assertEqual(server.connections, 1)
+
+    def test_errors_and_retries(self):
+        statuses = iter([503])
+
+        def flaky(query):
+            for status in statuses:
+                return status, {'Retry-After': '0'}, b'Unavailable'
+            return 200, {}, IMAGE
+
+        retry = RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+        with H2StubServer(flaky) as server:
+            transport = Http2Transport()
+            client = Client(API_KEY, base_url=server.url, transport=transport,
+                            retry=retry)
+            self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+            client.retry = None
+            server.handler = lambda query: (429, {}, b'Too many requests')
+            with self.assertRaises(HttpApiError) as raised:
+                client.get_raw(url='example.com')
+            self.assertEqual(raised.exception.status_code, 429)
+            transport.close()
+
+        transport = Http2Transport()
+        client = Client(API_KEY, base_url=server.url, transport=transport)
+        with self.assertRaises(ConnectionError):
+            client.get_raw(url='example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
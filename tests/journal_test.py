@@ -0,0 +1,121 @@
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from screenshotapi import BatchJournal, Client, FakeTransport, JournalEntry, \
+    cli
+from screenshotapi.batch import job_key
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'journal')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_reload_and_torn_tail(self):
+        output = os.path.join(self.tmp.name, 'a.jpg')
+        with open(output, 'wb') as f:
+            f.write(IMAGE)
+
+        with BatchJournal(self.path, fsync=False) as journal:
+            journal.record(JournalEntry('a', JournalEntry.OK, len(IMAGE),
+                                        'sum', output))
+            journal.record(JournalEntry('b', JournalEntry.ERROR,
+                                        error='Tab\there'))
+        with open(self.path, 'ab') as f:
+            f.write(b'ok\tc\t12')
+
+        with BatchJournal(self.path) as journal:
+            self.assertEqual(len(journal), 2)
+            self.assertTrue(journal.is_done('a'))
+            self.assertFalse(journal.is_done('b'))
+            self.assertFalse(journal.is_done('c'))
+            self.assertEqual(journal.get('b').error, 'Tab\there')
+
+            os.remove(output)
+            self.assertFalse(journal.is_done('a'))
+            self.assertTrue(journal.is_done('a', verify=False))
+            journal.record(JournalEntry('c', JournalEntry.OK))
+
+        with open(self.path, 'rb') as f:
+            self.assertTrue(f.read().endswith(b'\tc\t0\t\t\t\n'))
+
+    def test_get_many_resumes(self):
+        failing = {'example.org'}
+
+        def handler(method, query):
+            if query['url'] in failing:
+                raise ConnectionError('reset')
+            return 200, {}, IMAGE
+
+        transport = FakeTransport(handler)
+        client = Client(API_KEY, transport=transport)
+        specs = ['example.com', 'example.org', {'url': 'example.net'}]
+
+        results = list(client.get_many(specs, workers=2, journal=self.path))
+        self.assertEqual(sum(r.ok for r in results), 2)
+        self.assertFalse(any(r.skipped for r in results))
+
+        failing.clear()
+        results = list(client.get_many(specs, workers=2, journal=self.path))
+        skipped = sorted(r.spec['url'] for r in results if r.skipped)
+        self.assertEqual(skipped, ['example.com', 'example.net'])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(len(transport.requests), 4)
+
+        with BatchJournal(self.path) as journal:
+            self.assertEqual(len(journal), 3)
+
+    def test_files_hashed_once(self):
+        client = Client(API_KEY, transport=FakeTransport(
+            lambda method, query: (200, {}, IMAGE)))
+        specs = [{'url': 'example.com/{}'.format(i), 'filename': os.path.join(
+            self.tmp.name, '{}.jpg'.format(i))} for i in range(3)]
+
+        # Output files are never read back to journal their checksum
+        with mock.patch('screenshotapi.batch.file_digest',
+                        side_effect=AssertionError('file read back')):
+            results = list(client.get_many(specs, workers=2,
+                                           journal=self.path))
+        self.assertTrue(all(r.ok for r in results))
+
+        checksum = hashlib.sha256(IMAGE).hexdigest()
+        self.assertEqual([r.digest for r in results], [checksum] * 3)
+        with BatchJournal(self.path) as journal:
+            for spec in specs:
+                entry = journal.get(job_key(spec))
+                self.assertEqual((entry.size, entry.checksum),
+                                 (len(IMAGE), checksum))
+
+    def test_cli_resume(self):
+        urls = os.path.join(self.tmp.name, 'urls.txt')
+        with open(urls, 'w') as f:
+            f.write('example.com\nexample.org\n')
+        output = os.path.join(self.tmp.name, 'out')
+
+        with StubServer() as server:
+            for expected in ('2 done, 0 errors',
+                             '0 done, 0 errors, 2 skipped'):
+                stderr = io.StringIO()
+                with contextlib.redirect_stderr(stderr):
+                    code = cli.main([urls, '-o', output, '-k', API_KEY,
+                                     '--base-url', server.url])
+                self.assertEqual(code, 0)
+                self.assertIn(expected, stderr.getvalue())
+
+        self.assertEqual(len(server.queries), 2)
+        self.assertTrue(
+            os.path.exists(os.path.join(output, cli.JOURNAL_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from screenshotapi import Client, HttpApiError, Metrics, PrometheusExporter
+from screenshotapi.metrics import Histogram
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_buckets(self):
+        histogram = Histogram('latency', 'Latency', ('phase',), (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, 'ttfb')
+
+        [(labels, buckets, total, count)] = histogram.samples()
+        self.assertEqual(labels, ('ttfb',))
+        self.assertEqual(buckets, [2, 3, 4])
+        self.assertAlmostEqual(total, 2.65)
+        self.assertEqual(count, 4)
+
+        with self.assertRaises(ValueError):
+            Histogram('latency', 'Latency', buckets=(1.0, 0.1))
+
+    def test_prometheus_text(self):
+        metrics = Metrics(buckets=(0.5,))
+        metrics.observe('total', 0.25)
+        metrics.response(200, 1024)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'screenshotapi.prom')
+            text = metrics.export(PrometheusExporter(path))
+            with open(path) as f:
+                self.assertEqual(f.read(), text)
+
+        self.assertIn('# TYPE screenshotapi_phase_seconds histogram', text)
+        self.assertIn(
+            'screenshotapi_phase_seconds_bucket{phase="total",le="0.5"} 1',
+            text)
+        self.assertIn(
+            'screenshotapi_phase_seconds_bucket{phase="total",le="+Inf"} 1',
+            text)
+        self.assertIn(
+            'screenshotapi_phase_seconds_sum{phase="total"} 0.25', text)
+        self.assertIn('screenshotapi_responses_total{status="200"} 1', text)
+        self.assertIn('screenshotapi_response_bytes_total 1024', text)
+
+    def test_client_phases(self):
+        metrics = Metrics()
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url, metrics=metrics)
+            for _ in range(2):
+                client.get_raw(url='example.com')
+            with open(os.devnull, 'wb') as devnull:
+                client.get_to_stream(devnull, url='example.com')
+
+        phases = metrics.phase_seconds
+        for phase in ('validate', 'pool_wait', 'ttfb', 'download', 'total'):
+            self.assertEqual(phases.count(phase), 3, phase)
+        # One keep-alive connection, plain HTTP
+        self.assertEqual(phases.count('connect'), 1)
+        self.assertEqual(phases.count('tls'), 0)
+        self.assertEqual(metrics.responses.get('200'), 3)
+        self.assertEqual(metrics.response_bytes.get(), 3 * len(IMAGE))
+
+    def test_client_errors(self):
+        metrics = Metrics()
+        with StubServer(lambda query: (503, {}, b'Busy')) as server:
+            client = Client(API_KEY, base_url=server.url, metrics=metrics)
+            with self.assertRaises(HttpApiError):
+                client.get_raw(url='example.com')
+
+        self.assertEqual(metrics.responses.get('503'), 1)
+        self.assertEqual(metrics.errors.get('HttpApiError'), 1)
+
+    def test_disabled_by_default(self):
+        client = Client(API_KEY)
+        self.assertFalse(client.api_requester.metrics.enabled)
+        self.assertEqual(client.api_requester.metrics.collect(), [])
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async_client_phases(self):
+        metrics = Metrics()
+
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url,
+                                   metrics=metrics) as client:
+                await client.get_raw(url='example.com')
+                await client.get_raw(url='example.com')
+
+        with StubServer() as server:
+            run_async(run(server.url))
+
+        phases = metrics.phase_seconds
+        for phase in ('validate', 'ttfb', 'download', 'total'):
+            self.assertEqual(phases.count(phase), 2, phase)
+        self.assertEqual(phases.count('connect'), 1)
+        self.assertEqual(metrics.responses.get('200'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from requests import Request
+
+from screenshotapi import CaptureOptions, Client, ConnectionPool, \
+    ImageFormat, ParameterError
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestCaptureOptions(unittest.TestCase):
+
+    params = {
+        'type': ImageFormat.PNG,
+        'width': 1024,
+        'thumb_width': 200,
+        'cookies': {'name': 'value'},
+        'full_page': True,
+    }
+
+    def setUp(self) -> None:
+        self.client = Client(API_KEY)
+
+    def test_same_payload_as_kwargs(self):
+        options = CaptureOptions(**self.params)
+        self.assertEqual(
+            self.client._prepare_payload(
+                dict(url='example.com', **self.params)),
+            self.client._prepare_payload(
+                {'url': 'example.com', 'options': options}))
+
+    def test_hashable_and_immutable(self):
+        first = CaptureOptions(**self.params)
+        second = CaptureOptions(**self.params)
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second}), 1)
+        with self.assertRaises(AttributeError):
+            first.width = 10
+        with self.assertRaises(AttributeError):
+            first.other = 10
+
+    def test_validated_once(self):
+        with self.assertRaises(ParameterError):
+            CaptureOptions(quality=1000)
+        with self.assertRaises(ParameterError):
+            CaptureOptions(url='example.com')
+
+        options = CaptureOptions(width=400)
+        with self.assertRaises(ParameterError):
+            self.client.get_raw(url='aa://example', options=options)
+        with self.assertRaises(ParameterError):
+            self.client.get_raw(url='example.com', options={'width': 400})
+
+    def test_overrides(self):
+        options = CaptureOptions(width=400, output_format=Client.XML_FORMAT)
+        payload = self.client._prepare_payload(
+            {'url': 'example.com', 'options': options, 'height': 300})
+        self.assertEqual(payload['height'], 300)
+        self.assertEqual(payload['width'], 400)
+        self.assertIs(options.merge({'height': 300}),
+                      options.merge({'height': 300}))
+        self.assertEqual(
+            options.replace(response_format=Client.JSON_FORMAT)
+            .as_dict()['errorsOutputFormat'], Client.JSON_FORMAT)
+
+    def test_get_with_options(self):
+        options = CaptureOptions(output_format=Client.XML_FORMAT, width=400)
+        with StubServer() as server, tempfile.TemporaryDirectory() as tmp:
+            client = Client(API_KEY, base_url=server.url)
+            filename = os.path.join(tmp, 'screen.jpg')
+            client.get(filename=filename, url='example.com', options=options)
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), IMAGE)
+
+        query = server.queries[0]
+        self.assertEqual(query['errorsOutputFormat'], Client.JSON_FORMAT)
+        self.assertEqual(query['width'], '400')
+
+    def test_pre_encoded_query(self):
+        url = 'https://example.com/a b?q=1&r=ü#top'
+        payload = self.client._prepare_payload(
+            {'url': url, 'options': CaptureOptions(**self.params)})
+        plain = dict(payload)
+
+        encoded = Request('GET', 'http://api.test/', params=plain).prepare()
+        self.assertEqual(
+            encoded.url, 'http://api.test/?' + payload.query)
+        with ConnectionPool() as pool:
+            prepared = pool.prepare_encoded(
+                'GET', 'http://api.test/?' + payload.query)
+        self.assertEqual(prepared.url, encoded.url)
+
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            client.get_raw(url=url, options=CaptureOptions(**self.params))
+        self.assertEqual(server.queries[0],
+                         {k: str(v) for k, v in plain.items()})
+
+
+if __name__ == '__main__':
+    unittest.main()
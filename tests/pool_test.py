@@ -0,0 +1,52 @@
+import unittest
+
+from screenshotapi import Client, ConnectionPool
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_connections_reused(self):
+        with StubServer() as server:
+            with Client(API_KEY, base_url=server.url) as client:
+                for _ in range(5):
+                    self.assertEqual(
+                        client.get_raw(url='example.com'), IMAGE)
+        self.assertEqual(server.connections, 1)
+
+    def test_keep_alive_disabled(self):
+        with StubServer() as server:
+            with Client(API_KEY, base_url=server.url,
+                        keep_alive=False) as client:
+                for _ in range(3):
+                    client.get_raw(url='example.com')
+        self.assertEqual(server.connections, 3)
+
+    def test_shared_pool(self):
+        with StubServer() as server, ConnectionPool(pool_size=2) as pool:
+            first = Client(API_KEY, base_url=server.url, pool=pool)
+            second = Client(API_KEY, base_url=server.url, pool=pool)
+            first.get_raw(url='example.com')
+            second.get_raw(url='example.com')
+            first.close()
+            self.assertFalse(pool.closed)
+            second.get_raw(url='example.com')
+        self.assertEqual(server.connections, 1)
+
+    def test_idle_eviction(self):
+        with StubServer() as server:
+            pool = ConnectionPool(idle_timeout=1)
+            client = Client(API_KEY, base_url=server.url, pool=pool)
+            client.get_raw(url='example.com')
+            pool._last_used -= 2
+            client.get_raw(url='example.com')
+            pool.close()
+        self.assertEqual(server.connections, 2)
+
+    def test_invalid_pool_size(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(pool_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from screenshotapi import Client, RateLimiter
+from tests.server import API_KEY, StubServer, run_async
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(20, burst=2)
+        start = time.monotonic()
+        for _ in range(2):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.03)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_timeout(self):
+        limiter = RateLimiter(1)
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertFalse(limiter.acquire(timeout=0.1))
+
+    def test_async(self):
+        limiter = RateLimiter(50)
+
+        async def run():
+            await asyncio.gather(*[limiter.acquire_async() for _ in range(6)])
+
+        start = time.monotonic()
+        run_async(run())
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_client_paced(self):
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url, rate_limit=25)
+            start = time.monotonic()
+            with ThreadPoolExecutor(4) as executor:
+                list(executor.map(
+                    lambda _: client.get_raw(url='example.com'), range(6)))
+            self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+        with self.assertRaises(ValueError):
+            RateLimiter(1, burst=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
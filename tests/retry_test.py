@@ -0,0 +1,90 @@
+import io
+import unittest
+from email.utils import formatdate
+
+from screenshotapi import ApiAuthError, Client, HttpApiError, RetryBudget, \
+    RetryPolicy
+from screenshotapi.net.retry import parse_retry_after
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+def failing(statuses, headers=None):
+    statuses = list(statuses)
+
+    def handler(query):
+        if statuses:
+            return statuses.pop(0), headers or {}, b'{"code": 1}'
+        return 200, {}, IMAGE
+
+    return handler
+
+
+def fast_policy(**kwargs):
+    return RetryPolicy(backoff_base=0.001, backoff_max=0.01, **kwargs)
+
+
+class TestRetry(unittest.TestCase):
+
+    def test_transient_errors_retried(self):
+        with StubServer(failing([503, 502])) as server:
+            client = Client(API_KEY, base_url=server.url,
+                            retry=fast_policy())
+            self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+            buffer = io.BytesIO()
+            server.handler = failing([500])
+            client.get_to_stream(buffer, url='example.com')
+            self.assertEqual(buffer.getvalue(), IMAGE)
+        self.assertEqual(len(server.queries), 5)
+
+    def test_retries_exhausted(self):
+        with StubServer(failing([503] * 10)) as server:
+            client = Client(API_KEY, base_url=server.url,
+                            retry=fast_policy(max_retries=2))
+            with self.assertRaises(HttpApiError) as error:
+                client.get_raw(url='example.com')
+        self.assertEqual(error.exception.status_code, 503)
+        self.assertEqual(len(server.queries), 3)
+
+    def test_auth_error_not_retried(self):
+        with StubServer(failing([403])) as server:
+            client = Client(API_KEY, base_url=server.url,
+                            retry=fast_policy())
+            with self.assertRaises(ApiAuthError):
+                client.get_raw(url='example.com')
+        self.assertEqual(len(server.queries), 1)
+
+    def test_retry_after(self):
+        handler = failing([429], {'Retry-After': '120'})
+        with StubServer(handler) as server:
+            client = Client(API_KEY, base_url=server.url,
+                            retry=fast_policy(max_retry_after=60))
+            with self.assertRaises(HttpApiError) as error:
+                client.get_raw(url='example.com')
+        self.assertEqual(error.exception.retry_after, 120)
+        self.assertEqual(len(server.queries), 1)
+
+        policy = fast_policy()
+        self.assertGreaterEqual(policy.retry_delay(0, 429, 0.5), 0.5)
+        self.assertIsNone(policy.retry_delay(0, 400))
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2,
+                             initial_tokens=1)
+        policy = fast_policy(budget=budget)
+        self.assertIsNotNone(policy.retry_delay(0, 503))
+        self.assertIsNone(policy.retry_delay(0, 503))
+        policy.on_request()
+        policy.on_request()
+        self.assertIsNotNone(policy.retry_delay(0, 503))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertAlmostEqual(
+            parse_retry_after(formatdate(usegmt=True)), 0, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
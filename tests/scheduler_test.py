@@ -0,0 +1,114 @@
+import collections
+import threading
+import time
+import unittest
+
+from screenshotapi import Client, DeadlineExceededError, FakeTransport, \
+    JobScheduler
+from screenshotapi.net import async_http
+from tests.server import API_KEY, IMAGE, StubServer, run_async
+
+if async_http.aiohttp is not None:
+    from screenshotapi import AsyncClient
+
+
+def drain(scheduler: JobScheduler) -> list:
+    urls = []
+    while True:
+        job = scheduler.pop()
+        if job is None:
+            return urls
+        urls.append(job.spec['url'])
+        scheduler.done(job)
+
+
+class TestJobScheduler(unittest.TestCase):
+
+    def test_order(self):
+        scheduler = JobScheduler()
+        specs = [
+            {'url': 'a1.com', 'tenant': 'a', 'priority': 1},
+            {'url': 'a2.com', 'tenant': 'a', 'priority': 1},
+            {'url': 'a3.com', 'tenant': 'a', 'priority': 1},
+            {'url': 'b1.com', 'tenant': 'b', 'priority': 1, 'deadline': 60},
+            {'url': 'b2.com', 'tenant': 'b', 'priority': 1, 'deadline': 30},
+            {'url': 'urgent.com', 'tenant': 'b', 'priority': 0},
+        ]
+        for index, spec in enumerate(specs):
+            scheduler.push(index, spec)
+        self.assertEqual(len(scheduler), 6)
+
+        # Priority first, then tenants in turn, earliest deadline first
+        self.assertEqual(drain(scheduler), [
+            'urgent.com', 'a1.com', 'b2.com', 'a2.com', 'b1.com', 'a3.com'])
+        self.assertEqual(len(scheduler), 0)
+
+        with self.assertRaises(ValueError):
+            scheduler.push(0, {'url': 'a.com', 'priority': 'high'})
+        with self.assertRaises(ValueError):
+            JobScheduler(max_per_domain=0)
+
+    def test_domain_cap(self):
+        scheduler = JobScheduler(max_per_domain=1)
+        for index, url in enumerate(['a.com/1', 'www.a.com/2', 'b.com',
+                                     'http://A.com/3']):
+            scheduler.push(index, {'url': url})
+
+        first = scheduler.pop()
+        self.assertEqual(first.domain, 'a.com')
+        self.assertEqual(scheduler.pop().spec['url'], 'b.com')
+        self.assertIsNone(scheduler.pop())
+
+        scheduler.done(first)
+        self.assertEqual(drain(scheduler), ['www.a.com/2', 'http://A.com/3'])
+
+    def test_get_many(self):
+        lock = threading.Lock()
+        running = collections.Counter()
+        peaks = collections.Counter()
+
+        def handler(method, query):
+            domain = query['url'].split('/')[0]
+            with lock:
+                running[domain] += 1
+                peaks[domain] = max(peaks[domain], running[domain])
+            time.sleep(0.01)
+            with lock:
+                running[domain] -= 1
+            return 200, {}, IMAGE
+
+        client = Client(API_KEY, transport=FakeTransport(handler))
+        specs = ['big.com/{}'.format(i) for i in range(12)] + \
+            [{'url': 'small.com', 'priority': -1, 'tenant': 't'},
+             {'url': 'late.com', 'deadline': 0.000001}]
+        results = list(client.get_many(
+            specs, workers=4, scheduler=JobScheduler(max_per_domain=2)))
+
+        self.assertEqual(len(results), 14)
+        self.assertEqual(peaks['big.com'], 2)
+        failed = [r for r in results if not r.ok]
+        self.assertEqual([r.spec['url'] for r in failed], ['late.com'])
+        self.assertIsInstance(failed[0].error, DeadlineExceededError)
+
+        # Specs taken ahead run by priority, without scheduling keys
+        results = list(client.get_many(specs, workers=1, queue_size=20,
+                                       scheduler=JobScheduler()))
+        self.assertEqual(results[0].spec, {'url': 'small.com'})
+
+    @unittest.skipIf(async_http.aiohttp is None, 'aiohttp is not installed')
+    def test_async_get_many(self):
+        async def run(url):
+            async with AsyncClient(API_KEY, base_url=url) as client:
+                scheduler = JobScheduler(max_per_domain=1)
+                return [result async for result in client.get_many(
+                    ['example.com/{}'.format(i) for i in range(4)]
+                    + ['other.com'], workers=2, scheduler=scheduler)]
+
+        with StubServer() as server:
+            results = run_async(run(server.url))
+        self.assertTrue(all(r.ok and r.result == IMAGE for r in results))
+        self.assertEqual(sorted(r.index for r in results), list(range(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
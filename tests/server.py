@@ -0,0 +1,203 @@
+import asyncio
+import base64
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+API_KEY = 'at_' + 'a' * 29
+IMAGE = b'\xff\xd8\xff\xe0' + b'\x00' * 1020
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is Python 3.7+
+    daemon_threads = True
+
+
+def run_async(coroutine):
+    """`asyncio.run`, which is Python 3.7+"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def image_response(query: dict) -> tuple:
+    if query.get('imageOutputFormat') == 'BASE64':
+        body = b'data:image/jpeg;base64,' + base64.b64encode(IMAGE)
+        return 200, {'Content-Type': 'text/plain'}, body
+    return 200, {'Content-Type': 'image/jpeg'}, IMAGE
+
+
+class StubServer:
+    """
+    Local keep-alive HTTP server emulating the Screenshot API endpoint.
+
+    `handler` receives the parsed query string and returns a
+    (status, headers, body) tuple.
+    """
+
+    def __init__(self, handler=image_response):
+        self.handler = handler
+        self.connections = 0
+        self.queries = []
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                query = dict(parse_qsl(urlsplit(self.path).query))
+                with stub._lock:
+                    stub.queries.append(query)
+                status, headers, body = stub.handler(query)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}/api/v1'.format(
+            self._server.server_address[1])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class H2StubServer:
+    """
+    Local HTTP/2 server (prior knowledge, no TLS) emulating the API
+    endpoint, with the same interface as `StubServer`.
+
+    Each request is answered by its own thread; bodies are sent as the
+    client opens its flow control windows.
+    """
+
+    def __init__(self, handler=image_response):
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+
+        self.handler = handler
+        self.connections = 0
+        self.queries = []
+        self._lock = threading.Lock()
+        self._h2 = h2
+        # socket.create_server is not available before Python 3.8
+        self._socket = socket.socket()
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen()
+        self._port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}/api/v1'.format(self._port)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Wakes up the pending accept
+        self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self.connections += 1
+            threading.Thread(
+                target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        h2 = self._h2
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(
+            client_side=False, header_encoding='utf-8'))
+        window_open = threading.Condition()
+        connection.initiate_connection()
+        sock.sendall(connection.data_to_send())
+
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                data = b''
+            with window_open:
+                if not data:
+                    window_open.notify_all()
+                    sock.close()
+                    return
+                events = connection.receive_data(data)
+                sock.sendall(connection.data_to_send())
+                window_open.notify_all()
+
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    threading.Thread(
+                        target=self._respond, daemon=True,
+                        args=(sock, connection, window_open, event)).start()
+
+    def _respond(self, sock, connection, window_open, event):
+        h2 = self._h2
+        path = dict(event.headers)[':path']
+        query = dict(parse_qsl(urlsplit(path).query))
+        with self._lock:
+            self.queries.append(query)
+        status, headers, body = self.handler(query)
+
+        stream_id = event.stream_id
+        with window_open:
+            try:
+                connection.send_headers(stream_id, [
+                    (':status', str(status)),
+                    ('content-length', str(len(body)))] + [
+                    (k.lower(), str(v)) for k, v in headers.items()])
+                while True:
+                    size = min(
+                        len(body), connection.max_outbound_frame_size,
+                        connection.local_flow_control_window(stream_id))
+                    if size > 0 or not body:
+                        connection.send_data(stream_id, body[:size],
+                                             end_stream=size == len(body))
+                        body = body[size:]
+                    sock.sendall(connection.data_to_send())
+                    if not body:
+                        return
+                    if size <= 0:
+                        window_open.wait(1)
+            except (OSError, h2.exceptions.ProtocolError):
+                # Stream reset or connection closed by the client
+                return
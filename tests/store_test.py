@@ -0,0 +1,109 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from screenshotapi import BlobStore, Client, FakeTransport, cli
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+def blob_files(store: BlobStore) -> list:
+    return [name for _, _, names in os.walk(
+        os.path.join(store.root, BlobStore.BLOBS)) for name in names]
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def test_dedup_and_collect(self):
+        # A spill size of 4 bytes writes larger bodies to temporary files
+        for store in (BlobStore(self.path('mem')),
+                      BlobStore(self.path('disk'), spill=4)):
+            first = store.save(self.path('a.jpg'), IMAGE)
+            self.assertEqual(store.save(self.path('b.jpg'), IMAGE), first)
+            store.save(self.path('c.jpg'), b'other')
+            store.save(self.path('c.jpg'), b'other')
+
+            self.assertTrue(os.path.samefile(self.path('a.jpg'),
+                                             self.path('b.jpg')))
+            self.assertEqual(os.stat(store.path(first)).st_nlink, 3)
+            self.assertEqual(len(blob_files(store)), 2)
+
+            writer = store.writer(self.path('d.jpg'))
+            writer.write(b'partial data')
+            writer.discard()
+            self.assertFalse(os.path.exists(self.path('d.jpg')))
+            self.assertEqual(os.listdir(os.path.join(store.root, 'tmp')), [])
+
+            # Blobs still linked, or too recent, are kept
+            for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+                os.remove(self.path(name))
+            self.assertEqual(store.collect(), (0, 0))
+            self.assertEqual(store.collect(min_age=0),
+                             (2, len(IMAGE) + len(b'other')))
+            self.assertEqual(blob_files(store), [])
+
+        with self.assertRaises(ValueError):
+            BlobStore(self.path('store'), spill=-1)
+        with self.assertRaises(ValueError):
+            Client(API_KEY, store=self.path('store'))
+
+    def test_bounded_buffer(self):
+        store = BlobStore(self.path('store'))
+        chunk = os.urandom(64 * 1024)
+        peak = 0
+        with store.writer(self.path('big.jpg')) as writer:
+            for _ in range(32):
+                writer.write(chunk)
+                peak = max(peak, len(writer._buffer))
+        self.assertLessEqual(peak, 2 * len(chunk))
+        self.assertEqual(os.path.getsize(self.path('big.jpg')),
+                         32 * len(chunk))
+
+    def test_client_get(self):
+        store = BlobStore(self.path('store'))
+        client = Client(API_KEY, store=store, transport=FakeTransport(
+            lambda method, query: (200, {}, IMAGE)))
+        for name in ('a.jpg', 'b.jpg'):
+            client.get(url='example.com', filename=self.path(name))
+
+        with open(self.path('b.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), IMAGE)
+        self.assertTrue(os.path.samefile(self.path('a.jpg'),
+                                         self.path('b.jpg')))
+        self.assertEqual(len(blob_files(store)), 1)
+
+    def test_cli(self):
+        urls = self.path('urls.txt')
+        with open(urls, 'w') as f:
+            f.write('example.com/1\nexample.com/2\n')
+        output, store = self.path('out'), self.path('store')
+
+        with StubServer() as server, \
+                contextlib.redirect_stderr(io.StringIO()):
+            code = cli.main([urls, '-o', output, '-k', API_KEY, '-q',
+                             '--base-url', server.url, '--store', store,
+                             '--no-journal'])
+        self.assertEqual(code, 0)
+        self.assertEqual(len(blob_files(BlobStore(store))), 1)
+
+        for directory, _, names in os.walk(output):
+            for name in names:
+                os.remove(os.path.join(directory, name))
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            code = cli.main(['gc', store, '--min-age', '0'])
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout.getvalue(), '1 files removed, {} bytes '
+                         'freed\n'.format(len(IMAGE)))
+
+
+if __name__ == '__main__':
+    unittest.main()
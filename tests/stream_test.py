@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+import unittest
+
+from screenshotapi import BadRequestError, Client, FileError
+from screenshotapi.fileio import AtomicFile
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'screen.jpg')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_get_streams_to_file(self):
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url, chunk_size=100)
+            client.get(filename=self.filename, url='example.com')
+
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), IMAGE)
+        self.assertEqual(os.listdir(self.tmp.name), ['screen.jpg'])
+
+    def test_error_keeps_target(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'old')
+
+        with StubServer(lambda q: (422, {}, b'{}')) as server:
+            client = Client(API_KEY, base_url=server.url)
+            with self.assertRaises(BadRequestError):
+                client.get(filename=self.filename, url='example.com')
+
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+        self.assertEqual(os.listdir(self.tmp.name), ['screen.jpg'])
+
+    def test_get_to_stream(self):
+        buffer = io.BytesIO()
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            size = client.get_to_stream(buffer, url='example.com')
+
+        self.assertEqual(size, len(IMAGE))
+        self.assertEqual(buffer.getvalue(), IMAGE)
+        self.assertEqual(server.queries[0]['imageOutputFormat'], 'IMAGE')
+
+    def test_unwritable_stream(self):
+        with StubServer() as server:
+            client = Client(API_KEY, base_url=server.url)
+            with self.assertRaises(FileError):
+                client.get_to_stream(io.BytesIO(b'').getbuffer(),
+                                     url='example.com')
+
+    def test_atomic_file_discard(self):
+        with AtomicFile(self.filename) as f:
+            f.write(b'data')
+        with self.assertRaises(RuntimeError):
+            with AtomicFile(self.filename) as f:
+                f.write(b'partial')
+                raise RuntimeError()
+
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b'data')
+        self.assertEqual(os.listdir(self.tmp.name), ['screen.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from screenshotapi import ApiAuthError, CaptureOptions, Client, \
+    ConnectionPool, FakeTransport, RequestsTransport, RetryPolicy
+from tests.server import API_KEY, IMAGE, StubServer
+
+
+def image(method, query):
+    return 200, {'Content-Type': 'image/jpeg'}, IMAGE
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_fake_transport(self):
+        transport = FakeTransport(image)
+        client = Client(API_KEY, transport=transport)
+        self.assertEqual(client.get_raw(url='example.com', width=400), IMAGE)
+        self.assertEqual(
+            client.get_raw(url='example.org',
+                           options=CaptureOptions(width=400)), IMAGE)
+
+        queries = [query for _, query in transport.requests]
+        self.assertEqual(queries[0]['url'], 'example.com')
+        self.assertEqual(queries[1]['url'], 'example.org')
+        self.assertEqual(queries[0]['width'], queries[1]['width'])
+
+        client.close()
+        self.assertFalse(transport.closed)
+        self.assertIsNone(client.api_requester.pool)
+
+    def test_errors_and_retries(self):
+        failures = iter([ConnectionError('reset')])
+
+        def flaky(method, query):
+            for failure in failures:
+                raise failure
+            return 200, {}, IMAGE
+
+        retry = RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+        client = Client(API_KEY, transport=FakeTransport(flaky), retry=retry)
+        self.assertEqual(client.get_raw(url='example.com'), IMAGE)
+
+        client = Client(API_KEY, transport=FakeTransport(
+            lambda method, query: (401, {}, b'Invalid key')))
+        with self.assertRaises(ApiAuthError):
+            client.get_raw(url='example.com')
+
+    def test_requests_transport(self):
+        with StubServer() as server, ConnectionPool() as pool:
+            transport = RequestsTransport(pool)
+            client = Client(API_KEY, base_url=server.url, transport=transport)
+            for _ in range(2):
+                client.get_raw(url='example.com')
+            transport.close()
+            self.assertFalse(pool.closed)
+        self.assertEqual(server.connections, 1)
+
+    def test_invalid_transport(self):
+        with self.assertRaises(ValueError):
+            Client(API_KEY, transport=object())
+
+
+if __name__ == '__main__':
+    unittest.main()